@@ -0,0 +1,68 @@
+"""Compare two benchmark result files.
+
+Usage:
+    python -m benchmarks.compare baseline.json candidate.json [--threshold 10]
+
+Exits non-zero if any benchmark's throughput dropped by more than the
+threshold (percent), so it can gate a release.
+"""
+
+import sys
+import json
+import argparse
+from typing import Dict, Any, Tuple
+
+
+def _key(row: Dict[str, Any]) -> Tuple[str, str]:
+    return row['op'], json.dumps(row['params'], sort_keys=True)
+
+
+def _change(old, new) -> str:
+    if not old or new is None:
+        return 'n/a'
+    return f"{(new - old) / old * 100:+.1f}%"
+
+
+def compare(baseline: Dict[str, Any], candidate: Dict[str, Any], threshold: float) -> int:
+    """Print a comparison table and return the number of regressions."""
+    old_rows = {_key(row): row for row in baseline['results']}
+    regressions = 0
+
+    print(f"{'op':22} {'params':60} {'ops/s':>18} {'change':>8} {'p99 ms':>20} {'change':>8}")
+    for row in candidate['results']:
+        old = old_rows.get(_key(row))
+        if old is None:
+            continue
+        ops_change = _change(old['ops_per_sec'], row['ops_per_sec'])
+        flag = ''
+        if old['ops_per_sec'] and row['ops_per_sec'] is not None \
+                and (old['ops_per_sec'] - row['ops_per_sec']) / old['ops_per_sec'] * 100 > threshold:
+            regressions += 1
+            flag = '  << regression'
+        print(f"{row['op']:22} {_key(row)[1]:60} "
+              f"{old['ops_per_sec']:>8} -> {row['ops_per_sec']:>7} {ops_change:>8} "
+              f"{old['p99_ms']:>9} -> {row['p99_ms']:>8} {_change(old['p99_ms'], row['p99_ms']):>8}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare benchmark runs')
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help='Throughput drop (percent) that counts as a regression')
+    args = parser.parse_args(argv)
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    regressions = compare(baseline, candidate, args.threshold)
+    if regressions:
+        print(f"\n{regressions} regression(s) above {args.threshold}%")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,290 @@
+"""HTML-to-text throughput, the old regex strip vs. the streaming converter.
+
+Usage:
+    python -m benchmarks.html_text
+    python -m benchmarks.html_text --corpus ~/Mail/newsletters --output html.json
+
+The corpus is a directory of ``.html`` files or ``.eml`` messages (the
+text/html part is used). Without one, a built-in set of generated mails
+shaped like real ones is used: builder-made newsletters (nested layout
+tables, inline CSS on every tag, MSO conditional comments, tracking
+links), a long-form article, a receipt and a short personal reply.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import email
+import random
+import argparse
+from email.policy import default
+from typing import Dict, Any, List, Optional, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from email_cli.htmltext import html_to_text, iter_html_text
+
+WORDS = ('product', 'launch', 'team', 'update', 'weekly', 'offer', 'customers', 'release', 'new', 'features',
+         'read', 'more', 'today', 'free', 'shipping', 'event', 'webinar', 'guide', 'tips', 'your')
+
+
+def regex_strip(html: str) -> str:
+    """The conversion both clients used before: strip tags, decode &nbsp;."""
+    text = re.sub('<[^<]+?>', '', html)
+    text = text.replace('&nbsp;', ' ')
+    return text.strip()
+
+
+# Inline styles the way email builders write them, on nearly every tag
+TEXT_STYLE = ("font-family:'Helvetica Neue',Helvetica,Arial,Verdana,sans-serif;font-size:16px;line-height:150%;"
+              "color:#202020;text-align:left;mso-line-height-rule:exactly;-ms-text-size-adjust:100%;"
+              "-webkit-text-size-adjust:100%;word-break:break-word;padding-top:0;padding-right:18px;"
+              "padding-bottom:9px;padding-left:18px")
+TABLE_STYLE = ("min-width:100%;border-collapse:collapse;mso-table-lspace:0pt;mso-table-rspace:0pt;"
+               "-ms-text-size-adjust:100%;-webkit-text-size-adjust:100%")
+CELL_STYLE = "padding-top:9px;mso-line-height-rule:exactly;-ms-text-size-adjust:100%;-webkit-text-size-adjust:100%"
+
+
+def _words(rng: random.Random, count: int) -> str:
+    return ' '.join(rng.choice(WORDS) for _ in range(count)).capitalize()
+
+
+def _link(rng: random.Random, text: str) -> str:
+    token = ''.join(rng.choice('abcdef0123456789') for _ in range(40))
+    return (f'<a href="https://example.us1.list-manage.com/track/click?u={token}&amp;id={token[:10]}&amp;e=x" '
+            f'target="_blank" style="mso-line-height-rule:exactly;-ms-text-size-adjust:100%;'
+            f'-webkit-text-size-adjust:100%;color:#007C89;font-weight:normal;text-decoration:underline">{text}</a>')
+
+
+def _block(inner: str, kind: str) -> str:
+    """One builder block: nested layout tables around the content cell."""
+    return (
+        f'\n<table border="0" cellpadding="0" cellspacing="0" width="100%" class="mcn{kind}Block" '
+        f'style="{TABLE_STYLE}">\n    <tbody class="mcn{kind}BlockOuter">\n        <tr>\n'
+        f'            <td valign="top" class="mcn{kind}BlockInner" style="{CELL_STYLE}">\n'
+        '                <!--[if mso]><table align="left" border="0" cellspacing="0" cellpadding="0" width="100%" '
+        'style="width:100%;"><tr><td valign="top" width="600" style="width:600px;"><![endif]-->\n'
+        f'                <table align="left" border="0" cellpadding="0" cellspacing="0" width="100%" '
+        f'class="mcn{kind}ContentContainer" style="max-width:100%;{TABLE_STYLE}">\n'
+        f'                    <tbody><tr>\n                        <td valign="top" class="mcn{kind}Content" '
+        f'style="{TEXT_STYLE}">\n                            {inner}\n                        </td>\n'
+        '                    </tr></tbody>\n                </table>\n'
+        '                <!--[if mso]></td></tr></table><![endif]-->\n'
+        '            </td>\n        </tr>\n    </tbody>\n</table>'
+    )
+
+
+def newsletter(rng: random.Random, stories: int) -> str:
+    """A newsletter as email builders produce them: mostly markup, little text."""
+    style = ''.join(
+        f'.mcnBlock{i}{{padding:{i}px;color:#33{i % 100:02d}33;font-family:Arial,sans-serif;}} '
+        f'@media only screen and (max-width:480px){{.mcnBlock{i}{{width:100% !important;}}}}\n'
+        for i in range(120)
+    )
+    parts = [
+        '<!doctype html>\n<html xmlns="http://www.w3.org/1999/xhtml" xmlns:v="urn:schemas-microsoft-com:vml" '
+        'xmlns:o="urn:schemas-microsoft-com:office:office">\n<head>\n<meta charset="UTF-8">\n'
+        '<meta http-equiv="X-UA-Compatible" content="IE=edge">\n'
+        '<meta name="viewport" content="width=device-width, initial-scale=1">\n<title>Weekly update</title>\n'
+        '<!--[if gte mso 15]><xml><o:OfficeDocumentSettings><o:AllowPNG/><o:PixelsPerInch>96</o:PixelsPerInch>'
+        '</o:OfficeDocumentSettings></xml><![endif]-->\n'
+        f'<style type="text/css">\n{style}</style>\n</head>\n',
+        '<body style="height:100%;margin:0;padding:0;width:100%;background-color:#FAFAFA">\n'
+        '<span class="mcnPreviewText" style="display:none;font-size:0px;line-height:0px;max-height:0px;'
+        f'max-width:0px;opacity:0;overflow:hidden;visibility:hidden;mso-hide:all">{_words(rng, 12)}'
+        + '&nbsp;&zwnj;' * 30 + '</span>\n<center>\n'
+        '<table align="center" border="0" cellpadding="0" cellspacing="0" height="100%" width="100%" '
+        f'id="bodyTable" style="{TABLE_STYLE}">\n<tr>\n<td align="center" valign="top" id="bodyCell">'
+    ]
+    for i in range(stories):
+        image = (f'<img align="center" alt="" src="https://mcusercontent.com/{i:08x}/images/story-{i}.jpg" '
+                 'width="564" style="max-width:1200px;padding-bottom:0;display:inline !important;'
+                 'vertical-align:bottom;border:0;height:auto;outline:none;text-decoration:none;'
+                 '-ms-interpolation-mode:bicubic" class="mcnImage">')
+        text = (f'<h3 style="display:block;margin:0;padding:0;color:#202020;font-family:Helvetica;font-size:20px;'
+                f'font-style:normal;font-weight:bold;line-height:125%;letter-spacing:normal;text-align:left">'
+                f'{_words(rng, 6)}</h3>\n<p style="margin:10px 0;padding:0;mso-line-height-rule:exactly;'
+                f'-ms-text-size-adjust:100%;-webkit-text-size-adjust:100%;color:#202020;font-family:Helvetica;'
+                f'font-size:16px;line-height:150%;text-align:left"><span style="font-size:15px">'
+                f'<span style="color:#5a5a5a">{_words(rng, 30)} &mdash; {_words(rng, 8)}&hellip;</span>'
+                f'</span></p>')
+        button = (f'<table border="0" cellpadding="0" cellspacing="0" class="mcnButtonContentContainer" '
+                  f'style="border-collapse:separate !important;border-radius:3px;background-color:#007C89;'
+                  f'{TABLE_STYLE}"><tbody><tr><td align="center" valign="middle" class="mcnButtonContent" '
+                  f'style="font-family:Arial;font-size:16px;padding:18px">'
+                  f'{_link(rng, "Read more &raquo;")}</td></tr></tbody></table>')
+        parts.append(_block(image, 'Image') + _block(text, 'Text') + _block(button, 'Button'))
+    footer = (f'<em>Copyright &copy; 2026 Example Inc, All rights reserved.</em><br>\n'
+              f'You are receiving this email because you opted in via our website.<br><br>\n'
+              f'<strong>Our mailing address is:</strong><br>1 Main St<br>Springfield<br><br>\n'
+              f'Want to change how you receive these emails?<br>\nYou can {_link(rng, "update your preferences")} '
+              f'or {_link(rng, "unsubscribe from this list")}.<br>')
+    parts.append(_block(footer, 'Footer'))
+    parts.append('\n</td>\n</tr>\n</table>\n</center>\n'
+                 '<script type="application/ld+json">{"@context": "http://schema.org", "@type": "EmailMessage"}'
+                 '</script>\n</body>\n</html>')
+    return ''.join(parts)
+
+
+def article(rng: random.Random, paragraphs: int) -> str:
+    """A long-form post sent as mail: light markup around a lot of text."""
+    body = ''.join(
+        f'<p style="margin:0 0 20px;line-height:26px">{_words(rng, 70)}, {_link(rng, _words(rng, 3))} '
+        f'&ldquo;{_words(rng, 12)}&rdquo; {_words(rng, 40)}.</p>\n'
+        for _ in range(paragraphs)
+    )
+    return ('<html><head><style>body{font-family:Georgia,serif;font-size:18px}</style></head>'
+            f'<body><div class="post"><h1>{_words(rng, 8)}</h1>\n{body}</div></body></html>')
+
+
+def receipt(rng: random.Random, items: int) -> str:
+    """An order confirmation with an item table."""
+    rows = ''.join(
+        f'<tr><td style="padding:4px 8px">{_words(rng, 3)}</td><td align="right">{rng.randint(1, 5)}</td>'
+        f'<td align="right">&euro;{rng.randint(1, 300)}.{rng.randint(0, 99):02d}</td></tr>'
+        for _ in range(items)
+    )
+    return ('<html><head><style>td{font-family:Helvetica}</style></head><body>'
+            f'<h1>Thanks for your order</h1><p>Order <b>#{rng.randint(10000, 99999)}</b> is on its way.</p>'
+            f'<table border="0" cellspacing="0"><tr><th>Item</th><th>Qty</th><th>Price</th></tr>{rows}</table>'
+            f'<p>Track it {_link(rng, "here")}.</p></body></html>')
+
+
+def reply(rng: random.Random) -> str:
+    """A short personal HTML reply with a quoted message."""
+    return (f'<div dir="ltr">{_words(rng, 25)}<br><br>Thanks,<br>Sam</div><br>'
+            f'<div class="gmail_quote"><div dir="ltr" class="gmail_attr">On Mon, someone wrote:<br></div>'
+            f'<blockquote class="gmail_quote" style="margin:0 0 0 .8ex;border-left:1px #ccc solid;padding-left:1ex">'
+            f'<div dir="ltr">{_words(rng, 40)}</div></blockquote></div>')
+
+
+def builtin_corpus() -> List[Tuple[str, str]]:
+    rng = random.Random(42)
+    return [
+        ('newsletter_small', newsletter(rng, 3)),
+        ('newsletter', newsletter(rng, 10)),
+        ('newsletter_large', newsletter(rng, 40)),
+        ('digest_huge', newsletter(rng, 250)),
+        ('article', article(rng, 30)),
+        ('receipt', receipt(rng, 25)),
+        ('reply', reply(rng))
+    ]
+
+
+def edge_cases() -> List[Tuple[str, str]]:
+    """Documents whose open <pre>, links and hidden elements span many chunks."""
+    return [
+        ('pre_oversized', '<p>Intro</p><pre>\n' + 'line  \tindented\r\n' * 20000 + '</pre><p>after</p>'),
+        ('link_oversized', '<p><a href="https://example.com/x">' + 'word ' * 20000 + '</a> tail</p>'),
+        ('link_shows_target', '<a href="https://example.com/x">' + 'word ' * 20000 + 'https://example.com/x</a>'),
+        ('pre_in_link', '<a href="mailto:me@example.com">Mail <pre> me\n  now</pre></a> or not'),
+        ('link_across_pre', '<pre> a\n b<a href="http://h/">in\n  pre</pre>out</a> end&nbsp; <pre>\nkeep'),
+        ('unclosed_hidden', '<p>shown</p><style>' + 'p{color:red}' * 8000 + '</style><li>item <title>x')
+    ]
+
+
+def check(corpus: List[Tuple[str, str]], chunk_sizes: Tuple[int, ...]) -> List[str]:
+    """Names of the documents whose chunked conversion differs from the whole one."""
+    failed = []
+    for name, html in corpus:
+        whole = html_to_text(html)
+        for size in chunk_sizes:
+            if ''.join(iter_html_text(html[i:i + size] for i in range(0, len(html), size))) != whole:
+                failed.append(f'{name} (chunks of {size})')
+    return failed
+
+
+def load_corpus(path: str) -> List[Tuple[str, str]]:
+    """HTML documents from ``.html`` files and the text/html parts of ``.eml`` files."""
+    corpus = []
+    for name in sorted(os.listdir(path)):
+        file_path = os.path.join(path, name)
+        if name.endswith(('.html', '.htm')):
+            with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+                corpus.append((name, f.read()))
+        elif name.endswith('.eml'):
+            with open(file_path, 'rb') as f:
+                part = email.message_from_binary_file(f, policy=default).get_body(('html',))
+            if part is not None:
+                corpus.append((name, part.get_content()))
+    return corpus
+
+
+def _rate(convert, html: str, repeat: int = 5, min_seconds: float = 0.05) -> float:
+    """Seconds per conversion, the best of ``repeat`` timed runs."""
+    best = None
+    for _ in range(repeat):
+        runs = 0
+        start = time.perf_counter()
+        while True:
+            convert(html)
+            runs += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_seconds:
+                break
+        best = elapsed / runs if best is None else min(best, elapsed / runs)
+    return best
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='HTML-to-text throughput')
+    parser.add_argument('--corpus', help='Directory of .html/.eml files (default: built-in generated mails)')
+    parser.add_argument('--chunk-size', type=int, default=8192, help='Chunk size for the streaming run')
+    parser.add_argument('--output', help='Also write results as JSON')
+    args = parser.parse_args(argv)
+
+    corpus = load_corpus(args.corpus) if args.corpus else builtin_corpus()
+
+    def streamed(html: str) -> str:
+        chunks = (html[i:i + args.chunk_size] for i in range(0, len(html), args.chunk_size))
+        return ''.join(iter_html_text(chunks))
+
+    rows: List[Dict[str, Any]] = []
+    print(f"{'message':24} {'bytes':>9} {'regex MB/s':>11} {'new MB/s':>9} {'chunked':>9} {'speedup':>8} "
+          f"{'text out':>9}")
+    totals = {'bytes': 0, 'regex': 0.0, 'converter': 0.0, 'streamed': 0.0}
+    for name, html in corpus:
+        size = len(html.encode('utf-8'))
+        regex = _rate(regex_strip, html)
+        converter = _rate(html_to_text, html)
+        chunked = _rate(streamed, html)
+        row = {
+            'message': name,
+            'bytes': size,
+            'regex_mb_per_sec': round(size / regex / 1048576, 2),
+            'converter_mb_per_sec': round(size / converter / 1048576, 2),
+            'streamed_mb_per_sec': round(size / chunked / 1048576, 2),
+            'speedup': round(regex / converter, 2),
+            'regex_text_bytes': len(regex_strip(html)),
+            'converter_text_bytes': len(html_to_text(html))
+        }
+        rows.append(row)
+        totals['bytes'] += size
+        totals['regex'] += regex
+        totals['converter'] += converter
+        totals['streamed'] += chunked
+        print(f"{name[:24]:24} {size:>9} {row['regex_mb_per_sec']:>11} {row['converter_mb_per_sec']:>9} "
+              f"{row['streamed_mb_per_sec']:>9} {row['speedup']:>7}x {row['converter_text_bytes']:>9}")
+
+    print(f"{'total':24} {totals['bytes']:>9} {totals['bytes'] / totals['regex'] / 1048576:>11.2f} "
+          f"{totals['bytes'] / totals['converter'] / 1048576:>9.2f} "
+          f"{totals['bytes'] / totals['streamed'] / 1048576:>9.2f} "
+          f"{totals['regex'] / totals['converter']:>7.2f}x")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(rows, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    # Streaming must not change the text, whatever the chunk boundaries cut
+    failed = check(corpus + edge_cases(), (13, 4096, args.chunk_size))
+    for name in failed:
+        print(f"chunked output differs: {name}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
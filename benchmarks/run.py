@@ -0,0 +1,320 @@
+"""End-to-end throughput benchmarks against local SMTP/IMAP stand-ins.
+
+Usage:
+    python -m benchmarks.run                 # full matrix
+    python -m benchmarks.run --quick         # small matrix for a smoke run
+    python -m benchmarks.run --output results.json
+
+Results are written as JSON (see ``benchmarks/compare.py`` to diff runs).
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from email_cli.smtp_client import SMTPClient
+from email_cli.imap_client import IMAPClient
+from email_cli.export import Exporter, import_messages
+from email_cli.ingest import Ingester
+from email_cli.threads import ThreadIndex, get_thread, sync_threads
+from email_cli.render import render_spool, send_spool, iter_rows
+from benchmarks.servers import SMTPSink, IMAPStandIn, Mailbox
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of unsorted values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def measure(op: str, call: Callable[[int], Dict[str, Any]], iterations: int,
+            concurrency: int, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Run ``call(i)`` ``iterations`` times over ``concurrency`` threads."""
+    latencies: List[float] = []
+    errors = 0
+
+    def timed(i: int):
+        start = time.perf_counter()
+        result = call(i)
+        elapsed = time.perf_counter() - start
+        failed = bool(result.get('error')) or result.get('success') is False
+        return elapsed, failed
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for elapsed, failed in pool.map(timed, range(iterations)):
+            latencies.append(elapsed)
+            errors += failed
+    wall = time.perf_counter() - start
+
+    row = {
+        'op': op,
+        'params': dict(params, concurrency=concurrency),
+        'iterations': iterations,
+        'errors': errors,
+        'seconds': round(wall, 4),
+        'ops_per_sec': round(iterations / wall, 2) if wall else None,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3)
+    }
+    print(f"{op:22} {json.dumps(row['params']):70} {row['ops_per_sec']:>9} ops/s  "
+          f"p50 {row['p50_ms']:>8} ms  p99 {row['p99_ms']:>8} ms  errors {errors}", flush=True)
+    return row
+
+
+def bench_send(account: Dict[str, Any], sink: SMTPSink, args, workdir: str) -> List[Dict[str, Any]]:
+    """send_email and send_template_email across body/attachment sizes."""
+    rows = []
+    for attachment_size in args.attachment_sizes:
+        attachments = None
+        if attachment_size:
+            path = os.path.join(workdir, f'attachment-{attachment_size}.bin')
+            with open(path, 'wb') as f:
+                f.write(os.urandom(attachment_size))
+            attachments = [path]
+
+        for message_size in args.message_sizes:
+            body = ('Benchmark body line of plain ASCII text.\n' * (message_size // 41 + 1))[:message_size]
+            for concurrency in args.concurrency:
+                smtp = SMTPClient(account)
+                before = sink.stats['bytes']
+                row = measure(
+                    'send_email',
+                    lambda i: smtp.send_email(f'user{i}@example.com', f'Bench {i}', body, attachments=attachments),
+                    args.iterations, concurrency,
+                    {'message_size': message_size, 'attachment_size': attachment_size}
+                )
+                row['bytes_on_wire'] = (sink.stats['bytes'] - before) // max(1, args.iterations)
+                rows.append(row)
+
+        for concurrency in args.concurrency:
+            smtp = SMTPClient(account)
+            context = {'name': 'Bench User', 'company': 'ACME', 'year': 2026}
+            rows.append(measure(
+                'send_template_email',
+                lambda i: smtp.send_template_email(f'user{i}@example.com', 'Welcome', 'welcome', context,
+                                                   attachments=attachments),
+                args.iterations, concurrency, {'template': 'welcome', 'attachment_size': attachment_size}
+            ))
+    return rows
+
+
+def bench_render(account: Dict[str, Any], args, workdir: str) -> List[Dict[str, Any]]:
+    """Mail-merge pre-rendering on one process and on every CPU, then sending the spool."""
+    rows = []
+    count = args.iterations * 10
+    data_file = os.path.join(workdir, 'merge.jsonl')
+    with open(data_file, 'w') as f:
+        for i in range(count):
+            f.write(json.dumps({'email': f'user{i}@example.com', 'name': f'User {i}', 'company': 'ACME',
+                                'year': 2026}) + '\n')
+
+    for workers in sorted({1, os.cpu_count() or 1}):
+        spool = os.path.join(workdir, f'spool-{workers}')
+        result: Dict[str, Any] = {}
+        row = measure('render_spool',
+                      lambda i: result.update(render_spool(account, iter_rows(data_file), spool, 'Welcome {{ name }}',
+                                                           template='welcome', workers=workers)) or result,
+                      1, 1, {'messages': count, 'workers': workers})
+        row['messages_per_sec'] = round(result['rendered'] / row['seconds'], 2)
+        rows.append(row)
+
+    result = {}
+    row = measure('send_spool', lambda i: result.update(send_spool(SMTPClient(account), spool)) or result,
+                  1, 1, {'messages': count})
+    row['messages_per_sec'] = round(result['messages'] / row['seconds'], 2)
+    rows.append(row)
+    return rows
+
+
+def bench_pipelining(account: Dict[str, Any], args) -> List[Dict[str, Any]]:
+    """send_bulk to a 200-address group over a 2 ms link, lockstep vs. PIPELINING/CHUNKING."""
+    rows = []
+    recipients = [f'member{i}@example.com' for i in range(200)]
+    lockstep = ['AUTH PLAIN LOGIN', '8BITMIME', 'SIZE 104857600']
+    for label, extensions in (('lockstep', lockstep), ('pipelined', None)):
+        with SMTPSink(extensions=extensions, latency=0.002) as sink:
+            smtp = SMTPClient(dict(account, smtp_port=sink.port), timings=True)
+            result: Dict[str, Any] = {}
+            row = measure('send_bulk_group',
+                          lambda i: result.update(smtp.send_bulk(recipients, f'Group {i}', 'Hello group.\n',
+                                                                 max_recipients=200)) or result,
+                          max(1, args.iterations // 20), 1, {'recipients': len(recipients), 'mode': label})
+            row['round_trips'] = result.get('timings', {}).get('round_trips')
+            rows.append(row)
+    return rows
+
+
+def bench_imap(account: Dict[str, Any], args) -> List[Dict[str, Any]]:
+    """list_emails, search_emails and read_email across mailbox and message sizes."""
+    rows = []
+    for count in args.mailbox_sizes:
+        folder = f'bench-{count}'
+        for concurrency in args.concurrency:
+            imap = IMAPClient(account)
+            rows.append(measure('list_emails', lambda i: imap.list_emails(folder, limit=10),
+                                args.iterations, concurrency, {'mailbox_size': count, 'limit': 10}))
+            rows.append(measure('search_emails',
+                                lambda i: imap.search_emails(folder, query=f'SUBJECT "topic{i % 13}"', limit=10),
+                                args.iterations, concurrency, {'mailbox_size': count, 'limit': 10}))
+
+    for message_size in args.message_sizes:
+        folder = f'bench-size-{message_size}'
+        for concurrency in args.concurrency:
+            imap = IMAPClient(account)
+            rng = random.Random(message_size)
+            rows.append(measure('read_email', lambda i: imap.read_email(folder, str(rng.randint(1, 100))),
+                                args.iterations, concurrency, {'message_size': message_size}))
+    return rows
+
+
+def bench_threads(account: Dict[str, Any], args, workdir: str) -> List[Dict[str, Any]]:
+    """Thread index build, then whole-conversation lookups against the warm index."""
+    rows = []
+    for count in [count for count in args.mailbox_sizes if count <= 10000]:
+        folder = f'bench-{count}'
+        index = ThreadIndex(os.path.join(workdir, f'threads-{count}.db'))
+        result: Dict[str, Any] = {}
+        row = measure('thread_index', lambda i: result.update(sync_threads(IMAPClient(account), index, 'bench',
+                                                                          [folder])) or result,
+                      1, 1, {'mailbox_size': count})
+        row['messages_per_sec'] = round(result['indexed'] / row['seconds'], 2)
+        rows.append(row)
+
+        imap = IMAPClient(account)
+        rows.append(measure('thread', lambda i: get_thread(imap, index, 'bench', f'msg{i % count + 1}@example.com',
+                                                           folder),
+                            args.iterations, 1, {'mailbox_size': count}))
+        index.close()
+    return rows
+
+
+def bench_export(account: Dict[str, Any], args, workdir: str) -> List[Dict[str, Any]]:
+    """Folder export to mbox over 1 and 4 connections, then import back."""
+    rows = []
+    for count in [count for count in args.mailbox_sizes if count <= 10000]:
+        folder = f'bench-{count}'
+        for workers in (1, 4):
+            path = os.path.join(workdir, f'export-{count}-{workers}.mbox')
+            exporter = Exporter(IMAPClient(account), workers=workers)
+            result: Dict[str, Any] = {}
+            row = measure('export_mbox', lambda i: result.update(exporter.export([folder], path)) or result,
+                          1, 1, {'mailbox_size': count, 'workers': workers})
+            row['mb_per_sec'] = round(result['bytes'] / 1048576 / row['seconds'], 2)
+            rows.append(row)
+
+        result = {}
+        row = measure('import_mbox',
+                      lambda i: result.update(import_messages(IMAPClient(account), path, f'import-{count}')) or result,
+                      1, 1, {'mailbox_size': count})
+        row['mb_per_sec'] = round(result['bytes'] / 1048576 / row['seconds'], 2)
+        rows.append(row)
+    return rows
+
+
+def bench_ingest(account: Dict[str, Any], args) -> List[Dict[str, Any]]:
+    """Fetching and parsing multipart folders with one parsing process and with one per CPU."""
+    rows = []
+    for count in [count for count in args.mailbox_sizes if count <= 10000]:
+        for workers in sorted({1, os.cpu_count() or 1}):
+            ingester = Ingester(IMAPClient(account), workers=workers)
+            result: Dict[str, Any] = {}
+            row = measure('ingest', lambda i: result.update(ingester.ingest(f'bench-mime-{count}', lambda m: None))
+                          or result, 1, 1, {'mailbox_size': count, 'workers': workers})
+            row['messages_per_sec'] = round(result['messages'] / row['seconds'], 2)
+            rows.append(row)
+    return rows
+
+
+def metadata() -> Dict[str, Any]:
+    """Describe the environment a run was made in."""
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                  text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        revision = None
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'git_revision': revision or None,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count()
+    }
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(',') if item]
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='email_cli throughput benchmarks')
+    parser.add_argument('--quick', action='store_true', help='Small matrix for smoke runs')
+    parser.add_argument('--only', choices=['send', 'imap'], help='Run one group only')
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--concurrency', type=_int_list, default=[1, 4, 16])
+    parser.add_argument('--message-sizes', type=_int_list, default=[1024, 65536, 1048576])
+    parser.add_argument('--attachment-sizes', type=_int_list, default=[0, 1048576])
+    parser.add_argument('--mailbox-sizes', type=_int_list, default=[1000, 10000, 100000])
+    parser.add_argument('--output', help='Result file (default benchmarks/results/<timestamp>.json)')
+    args = parser.parse_args(argv)
+
+    if args.quick:
+        args.iterations = min(args.iterations, 20)
+        args.concurrency = [1, 4]
+        args.message_sizes = [1024, 65536]
+        args.attachment_sizes = [0, 65536]
+        args.mailbox_sizes = [1000, 10000]
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    mailboxes = {'INBOX': Mailbox(0)}
+    for count in args.mailbox_sizes:
+        mailboxes[f'bench-{count}'] = Mailbox(count)
+        mailboxes[f'bench-mime-{count}'] = Mailbox(count, mime=True)
+    for size in args.message_sizes:
+        mailboxes[f'bench-size-{size}'] = Mailbox(100, body_size=size)
+
+    rows = []
+    with SMTPSink() as sink, IMAPStandIn(mailboxes) as imap_server, \
+            tempfile.TemporaryDirectory() as workdir:
+        account = {
+            'smtp_host': '127.0.0.1', 'smtp_port': sink.port,
+            'imap_host': '127.0.0.1', 'imap_port': imap_server.port,
+            'username': 'bench@example.com', 'password': 'bench', 'use_ssl': False
+        }
+        if args.only in (None, 'send'):
+            rows.extend(bench_send(account, sink, args, workdir))
+            rows.extend(bench_render(account, args, workdir))
+            rows.extend(bench_pipelining(account, args))
+        if args.only in (None, 'imap'):
+            rows.extend(bench_imap(account, args))
+            rows.extend(bench_threads(account, args, workdir))
+            rows.extend(bench_export(account, args, workdir))
+            rows.extend(bench_ingest(account, args))
+
+    output = args.output or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'results', time.strftime('%Y%m%d-%H%M%S.json')
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({'meta': metadata(), 'results': rows}, f, indent=2)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,686 @@
+"""Local SMTP/IMAP stand-in servers for benchmarks.
+
+Both servers speak just enough of the protocol for email_cli's clients and
+keep everything in memory. Neither does TLS, so point accounts at them with
+``use_ssl: false``.
+"""
+
+import re
+import base64
+import time
+import bisect
+import asyncio
+import threading
+import socketserver
+from typing import Dict, List, Optional, Set
+
+
+class SMTPSink:
+    """An aiosmtpd-style SMTP server that accepts and discards mail."""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, extensions: Optional[List[str]] = None,
+                 latency: float = 0.0):
+        self.host = host
+        self.port = port
+        self.extensions = extensions if extensions is not None else [
+            'AUTH PLAIN LOGIN', '8BITMIME', 'SIZE 104857600', 'PIPELINING', 'CHUNKING'
+        ]
+        # Seconds each reply is held back, to stand in for a network round trip
+        self.latency = latency
+        self.stats = {'connections': 0, 'messages': 0, 'recipients': 0, 'bytes': 0, 'commands': 0}
+        # Most recent message bodies, for inspection by callers
+        self.messages: List[bytes] = []
+        self.keep_messages = 0
+        # Recipients refused with 550 at RCPT TO
+        self.refuse: Set[str] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+
+    def start(self) -> 'SMTPSink':
+        self._thread = threading.Thread(target=self._run, name='smtp-sink', daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._server = self._loop.run_until_complete(
+            asyncio.start_server(self._handle, self.host, self.port, limit=2 ** 26)
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        self._loop.run_forever()
+
+    def stop(self):
+        if self._loop is None:
+            return
+
+        async def shutdown():
+            self._server.close()
+            await self._server.wait_closed()
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _store(self, data: bytes, recipients: int):
+        self.stats['messages'] += 1
+        self.stats['recipients'] += recipients
+        self.stats['bytes'] += len(data)
+        if self.keep_messages:
+            self.messages.append(data)
+            del self.messages[:-self.keep_messages]
+
+    async def _read_data(self, reader: asyncio.StreamReader) -> bytes:
+        data = b''
+        while True:
+            data += await reader.readuntil(b'.\r\n')
+            if data == b'.\r\n' or data.endswith(b'\n.\r\n'):
+                return data[:-3]
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.stats['connections'] += 1
+        loop = asyncio.get_running_loop()
+        replies: asyncio.Queue = asyncio.Queue()
+
+        async def deliver():
+            # Replies keep their order and each arrives ``latency`` after its command
+            while True:
+                due, reply = await replies.get()
+                if due > loop.time():
+                    await asyncio.sleep(due - loop.time())
+                writer.write(reply)
+                await writer.drain()
+                replies.task_done()
+
+        def send(reply: bytes):
+            replies.put_nowait((loop.time() + self.latency, reply))
+
+        delivery = loop.create_task(deliver())
+        send(b'220 localhost ESMTP sink\r\n')
+        recipients = None
+        chunks: List[bytes] = []
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                self.stats['commands'] += 1
+                command = line.decode('utf-8', errors='replace').strip()
+                verb = command.split(' ', 1)[0].upper()
+
+                if verb == 'EHLO':
+                    lines = ['localhost'] + self.extensions
+                    reply = ''.join(f'250-{item}\r\n' for item in lines[:-1]) + f'250 {lines[-1]}\r\n'
+                    send(reply.encode())
+                elif verb == 'HELO':
+                    send(b'250 localhost\r\n')
+                elif verb == 'AUTH':
+                    parts = command.split()
+                    if parts[1].upper() == 'LOGIN':
+                        for prompt in (b'334 VXNlcm5hbWU6\r\n', b'334 UGFzc3dvcmQ6\r\n'):
+                            send(prompt)
+                            await reader.readline()
+                    elif len(parts) == 2:
+                        send(b'334 \r\n')
+                        await reader.readline()
+                    send(b'235 2.7.0 Authentication successful\r\n')
+                elif verb == 'MAIL':
+                    recipients = 0
+                    chunks = []
+                    send(b'250 2.1.0 OK\r\n')
+                elif verb == 'RCPT':
+                    address = command.partition(':')[2].split(' ', 1)[0].strip('<>')
+                    if recipients is None:
+                        send(b'503 5.5.1 MAIL first\r\n')
+                    elif address in self.refuse:
+                        send(b'550 5.1.1 User unknown\r\n')
+                    else:
+                        recipients += 1
+                        send(b'250 2.1.5 OK\r\n')
+                elif verb == 'DATA':
+                    if not recipients:
+                        send(b'554 5.5.1 No valid recipients\r\n')
+                        continue
+                    send(b'354 End data with <CR><LF>.<CR><LF>\r\n')
+                    self._store(await self._read_data(reader), recipients)
+                    recipients = None
+                    send(b'250 2.0.0 Queued\r\n')
+                elif verb == 'BDAT':
+                    parts = command.split()
+                    chunks.append(await reader.readexactly(int(parts[1])))
+                    last = len(parts) > 2 and parts[2].upper() == 'LAST'
+                    if not recipients:
+                        # The chunk is read either way to stay in sync
+                        send(b'554 5.5.1 No valid recipients\r\n')
+                    elif last:
+                        self._store(b''.join(chunks), recipients)
+                        recipients = None
+                        send(b'250 2.0.0 Queued\r\n')
+                    else:
+                        send(f'250 2.0.0 {len(chunks[-1])} octets received\r\n'.encode())
+                elif verb == 'RSET':
+                    recipients = None
+                    send(b'250 OK\r\n')
+                elif verb == 'NOOP':
+                    send(b'250 OK\r\n')
+                elif verb == 'QUIT':
+                    send(b'221 Bye\r\n')
+                    break
+                else:
+                    send(b'502 5.5.2 Command not implemented\r\n')
+            await replies.join()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            delivery.cancel()
+            writer.close()
+
+
+class Mailbox:
+    """An IMAP folder of synthetic messages generated on demand.
+
+    Messages are derived from their UID, so even 100k-message folders cost
+    no memory beyond flags. Appended messages are kept verbatim. With
+    ``mime`` they are multipart like real mail: an encoded subject, a
+    quoted-printable text part, its HTML alternative and a base64
+    attachment.
+    """
+
+    def __init__(self, count: int = 0, body_size: int = 2048, uidvalidity: int = 1, mime: bool = False):
+        self.count = count
+        self.body_size = body_size
+        self.mime = mime
+        self.uidvalidity = uidvalidity
+        self.uids: List[int] = list(range(1, count + 1))
+        self.flags: Dict[int, Set[str]] = {
+            uid: set() if uid % 3 == 0 else {'\\Seen'} for uid in self.uids
+        }
+        self.appended: Dict[int, bytes] = {}
+        self.special_use: Optional[str] = None
+        self.lock = threading.RLock()
+
+    @property
+    def uidnext(self) -> int:
+        return (self.uids[-1] if self.uids else 0) + 1
+
+    def headers(self, uid: int) -> Dict[str, str]:
+        thread = uid // 5
+        headers = {
+            'From': f'Sender {uid % 97} <sender{uid % 97}@example.com>',
+            'To': 'me@example.com',
+            'Subject': f'Synthetic message {uid} topic{uid % 13}',
+            'Date': time.strftime('%a, %d %b %Y %H:%M:%S +0000', time.gmtime(1_700_000_000 + uid * 60)),
+            'Message-ID': f'<msg{uid}@example.com>'
+        }
+        if uid % 5:
+            # Every five consecutive messages form one reply chain
+            headers['In-Reply-To'] = f'<msg{uid - 1}@example.com>'
+            headers['References'] = ' '.join(f'<msg{ref}@example.com>' for ref in range(thread * 5 or 1, uid))
+        return headers
+
+    def message(self, uid: int) -> bytes:
+        if uid in self.appended:
+            return self.appended[uid]
+
+        head = ''.join(f'{key}: {value}\r\n' for key, value in self.headers(uid).items())
+        line = f'Line of synthetic body text for message {uid}.'.ljust(76, '.') + '\r\n'
+        body = (line * (self.body_size // len(line) + 1))[:self.body_size]
+        if self.mime:
+            return self._multipart(uid, head, body)
+        return (head + 'MIME-Version: 1.0\r\nContent-Type: text/plain; charset=utf-8\r\n\r\n' + body).encode()
+
+    def _multipart(self, uid: int, head: str, body: str) -> bytes:
+        head = head.replace('Subject: Synthetic', 'Subject: =?utf-8?q?Synthetic_=C3=BCber?=', 1)
+        text = body.replace('text', 'te=C3=A9xt').replace('\r\n', '=\r\n', 1)
+        html = ''.join(f'<p style="margin:0">{line}</p>\r\n' for line in body.split('\r\n') if line)
+        attachment = base64.encodebytes(bytes(range(256)) * (self.body_size // 512 + 1)).decode()
+        boundary, alternative = f'mixed{uid}', f'alt{uid}'
+        return (
+            f'{head}MIME-Version: 1.0\r\nContent-Type: multipart/mixed; boundary="{boundary}"\r\n\r\n'
+            f'--{boundary}\r\nContent-Type: multipart/alternative; boundary="{alternative}"\r\n\r\n'
+            f'--{alternative}\r\nContent-Type: text/plain; charset=utf-8\r\n'
+            f'Content-Transfer-Encoding: quoted-printable\r\n\r\n{text}\r\n'
+            f'--{alternative}\r\nContent-Type: text/html; charset=utf-8\r\n\r\n{html}\r\n'
+            f'--{alternative}--\r\n'
+            f'--{boundary}\r\nContent-Type: application/octet-stream\r\n'
+            f'Content-Disposition: attachment; filename="data{uid}.bin"\r\n'
+            f'Content-Transfer-Encoding: base64\r\n\r\n{attachment.replace(chr(10), chr(13) + chr(10))}'
+            f'--{boundary}--\r\n'
+        ).encode()
+
+    def header_value(self, uid: int, name: str) -> str:
+        if uid in self.appended:
+            match = re.search(rb'(?im)^' + re.escape(name.encode()) + rb':[ \t]*(.*)$', self.appended[uid])
+            return match.group(1).decode(errors='ignore').strip() if match else ''
+        name = name.lower()
+        # Cheap paths for the headers SEARCH usually asks about
+        if name == 'subject':
+            return f'Synthetic message {uid} topic{uid % 13}'
+        if name == 'from':
+            return f'Sender {uid % 97} <sender{uid % 97}@example.com>'
+        return next((v for k, v in self.headers(uid).items() if k.lower() == name), '')
+
+    def append(self, data: bytes, flags: Optional[Set[str]] = None) -> int:
+        with self.lock:
+            uid = self.uidnext
+            self.uids.append(uid)
+            self.appended[uid] = data
+            self.flags[uid] = set(flags or ())
+            return uid
+
+    def expunge(self, only: Optional[Set[int]] = None) -> List[int]:
+        """Remove \\Deleted messages; returns the removed sequence numbers."""
+        with self.lock:
+            removed = []
+            for seq in range(len(self.uids), 0, -1):
+                uid = self.uids[seq - 1]
+                if '\\Deleted' in self.flags[uid] and (only is None or uid in only):
+                    removed.append(seq)
+                    del self.uids[seq - 1]
+                    self.flags.pop(uid, None)
+                    self.appended.pop(uid, None)
+            return removed
+
+
+_TOKEN_RE = re.compile(r'"((?:[^"\\]|\\.)*)"|\(|\)|\[[^\]]*\]|[^\s()"\[]+(?:\[[^\]]*\](?:<[\d.]+>)?)?')
+
+
+_HEADER_RE = re.compile(rb'(?m)^([^\s:]+):.*\r\n(?:[ \t].*\r\n)*')
+
+
+def _tokenize(text: str) -> List[str]:
+    tokens = []
+    for match in _TOKEN_RE.finditer(text):
+        if match.group(1) is not None:
+            tokens.append(match.group(1).replace('\\"', '"').replace('\\\\', '\\'))
+        else:
+            tokens.append(match.group(0))
+    return tokens
+
+
+def _parse_set(spec: str, values, top: Optional[int] = None) -> List[int]:
+    """Resolve an IMAP sequence set against sorted candidate numbers.
+
+    ``top`` is what ``*`` stands for; it defaults to the largest value.
+    """
+    if not len(values):
+        return []
+    top = values[-1] if top is None else top
+    found: Set[int] = set()
+    for part in spec.split(','):
+        lo, _, hi = part.partition(':')
+        lo = top if lo == '*' else int(lo)
+        hi = lo if not hi else (top if hi == '*' else int(hi))
+        lo, hi = min(lo, hi), max(lo, hi)
+        found.update(values[bisect.bisect_left(values, lo):bisect.bisect_right(values, hi)])
+    return sorted(found)
+
+
+class IMAPStandIn(socketserver.ThreadingTCPServer):
+    """A small threaded IMAP4rev1 server over in-memory mailboxes."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, mailboxes: Optional[Dict[str, Mailbox]] = None, host: str = '127.0.0.1',
+                 port: int = 0, capabilities: Optional[List[str]] = None):
+        self.mailboxes = mailboxes if mailboxes is not None else {'INBOX': Mailbox(0)}
+        self.capabilities = capabilities if capabilities is not None else [
+            'IMAP4rev1', 'UIDPLUS', 'SPECIAL-USE', 'LITERAL+', 'MULTIAPPEND', 'MOVE'
+        ]
+        self.stats = {'connections': 0, 'commands': 0, 'bytes_sent': 0}
+        self._thread: Optional[threading.Thread] = None
+        super().__init__((host, port), _IMAPHandler)
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def start(self) -> 'IMAPStandIn':
+        self._thread = threading.Thread(target=self.serve_forever, name='imap-stand-in', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class _IMAPHandler(socketserver.StreamRequestHandler):
+    server: IMAPStandIn
+    # Buffer each response and flush once per command, without Nagle delays
+    wbufsize = 65536
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.selected: Optional[Mailbox] = None
+        self.readonly = False
+        self.server.stats['connections'] += 1
+
+    def send(self, data: bytes):
+        self.server.stats['bytes_sent'] += len(data)
+        self.wfile.write(data)
+
+    def read_command(self) -> Optional[str]:
+        """Read one command line, inlining any literals as quoted bytes."""
+        line = self.rfile.readline()
+        if not line:
+            return None
+        text = b''
+        self.literals: List[bytes] = []
+        while True:
+            match = re.search(rb'\{(\d+)(\+?)\}\r\n$', line)
+            if not match:
+                text += line
+                break
+            text += line[:match.start()] + b'\x00LIT%d\x00' % len(self.literals)
+            if not match.group(2):
+                self.send(b'+ Ready\r\n')
+                self.wfile.flush()
+            self.literals.append(self.rfile.read(int(match.group(1))))
+            line = self.rfile.readline()
+        return text.decode('utf-8', errors='replace').rstrip('\r\n')
+
+    def handle(self):
+        self.send(b'* OK IMAP4rev1 stand-in ready\r\n')
+        self.wfile.flush()
+        while True:
+            command = self.read_command()
+            if command is None:
+                return
+            self.server.stats['commands'] += 1
+            tag, _, rest = command.partition(' ')
+            name, _, args = rest.partition(' ')
+            name = name.upper()
+            uid_mode = False
+            if name == 'UID':
+                uid_mode = True
+                name, _, args = args.partition(' ')
+                name = name.upper()
+
+            handler = getattr(self, f'cmd_{name.lower()}', None)
+            try:
+                if handler is None:
+                    self.send(f'{tag} BAD Unknown command {name}\r\n'.encode())
+                else:
+                    status = handler(args, uid_mode) or 'OK'
+                    self.send(f'{tag} {status} {name} completed\r\n'.encode())
+            except Exception as e:
+                self.send(f'{tag} BAD {e}\r\n'.encode())
+            self.wfile.flush()
+            if name == 'LOGOUT':
+                return
+
+    # -- commands ---------------------------------------------------------
+
+    def cmd_capability(self, args, uid_mode):
+        self.send(('* CAPABILITY ' + ' '.join(self.server.capabilities) + '\r\n').encode())
+
+    def cmd_login(self, args, uid_mode):
+        pass
+
+    def cmd_logout(self, args, uid_mode):
+        self.send(b'* BYE logging out\r\n')
+
+    def cmd_noop(self, args, uid_mode):
+        pass
+
+    def _mailbox(self, name: str) -> Mailbox:
+        name = name.strip('"')
+        if name.upper() == 'INBOX':
+            name = 'INBOX'
+        if name not in self.server.mailboxes:
+            raise ValueError(f'No such mailbox {name}')
+        return self.server.mailboxes[name]
+
+    def cmd_select(self, args, uid_mode, readonly=False):
+        box = self._mailbox(_tokenize(args)[0])
+        self.selected, self.readonly = box, readonly
+        with box.lock:
+            self.send(f'* {len(box.uids)} EXISTS\r\n* 0 RECENT\r\n'.encode())
+            self.send(f'* OK [UIDVALIDITY {box.uidvalidity}] UIDs valid\r\n'.encode())
+            self.send(f'* OK [UIDNEXT {box.uidnext}] Predicted next UID\r\n'.encode())
+            self.send(b'* FLAGS (\\Answered \\Flagged \\Deleted \\Seen \\Draft)\r\n')
+        return f'OK [{"READ-ONLY" if readonly else "READ-WRITE"}]'
+
+    def cmd_examine(self, args, uid_mode):
+        return self.cmd_select(args, uid_mode, readonly=True)
+
+    def cmd_close(self, args, uid_mode):
+        if self.selected is not None and not self.readonly:
+            self.selected.expunge()
+        self.selected = None
+
+    def cmd_create(self, args, uid_mode):
+        name = _tokenize(args)[0]
+        self.server.mailboxes.setdefault(name, Mailbox(0))
+
+    def cmd_list(self, args, uid_mode):
+        for name, box in self.server.mailboxes.items():
+            flags = '\\HasNoChildren' + (f' {box.special_use}' if box.special_use else '')
+            self.send(f'* LIST ({flags}) "/" "{name}"\r\n'.encode())
+
+    def cmd_status(self, args, uid_mode):
+        tokens = _tokenize(args)
+        box = self._mailbox(tokens[0])
+        with box.lock:
+            values = {
+                'MESSAGES': len(box.uids),
+                'RECENT': 0,
+                'UIDNEXT': box.uidnext,
+                'UIDVALIDITY': box.uidvalidity,
+                'UNSEEN': sum(1 for uid in box.uids if '\\Seen' not in box.flags[uid])
+            }
+        items = [t.upper() for t in tokens[1:] if t not in '()']
+        body = ' '.join(f'{item} {values[item]}' for item in items if item in values)
+        self.send(f'* STATUS "{tokens[0]}" ({body})\r\n'.encode())
+
+    def cmd_append(self, args, uid_mode):
+        # One or more "[(flags)] [date] literal" groups (MULTIAPPEND)
+        tokens = _tokenize(args)
+        box = self._mailbox(tokens[0])
+        flags: Set[str] = set()
+        uids = []
+        index = 1
+        while index < len(tokens):
+            token = tokens[index]
+            if token == '(':
+                end = tokens.index(')', index)
+                flags = set(tokens[index + 1:end])
+                index = end
+            elif token.startswith('\x00LIT'):
+                uids.append(box.append(self.literals[int(token[4:-1])], flags))
+                flags = set()
+            index += 1
+        return f'OK [APPENDUID {box.uidvalidity} {",".join(map(str, uids))}]'
+
+    def _resolve(self, spec: str, uid_mode: bool) -> List[int]:
+        box = self.selected
+        if uid_mode:
+            return _parse_set(spec, box.uids)
+        seqs = _parse_set(spec, range(1, len(box.uids) + 1))
+        return [box.uids[seq - 1] for seq in seqs]
+
+    def _seq(self, box: Mailbox, uid: int) -> int:
+        return bisect.bisect_left(box.uids, uid) + 1
+
+    def _matches(self, box: Mailbox, uid: int, seq: int, tokens: List[str]) -> bool:
+        i = 0
+        while i < len(tokens):
+            key = tokens[i].upper()
+            i += 1
+            if key in ('ALL', '(', ')', 'CHARSET'):
+                if key == 'CHARSET':
+                    i += 1
+                continue
+            if key in ('UNSEEN', 'SEEN', 'DELETED', 'FLAGGED'):
+                flag = '\\' + key.replace('UN', '', 1).capitalize()
+                has = flag in box.flags[uid]
+                if has == key.startswith('UN'):
+                    return False
+            elif key == 'UID':
+                if not _parse_set(tokens[i], [uid], top=box.uids[-1]):
+                    return False
+                i += 1
+            elif key in ('FROM', 'TO', 'SUBJECT'):
+                if tokens[i].lower() not in box.header_value(uid, key.capitalize()).lower():
+                    return False
+                i += 1
+            elif key == 'HEADER':
+                if tokens[i + 1].lower() not in box.header_value(uid, tokens[i]).lower():
+                    return False
+                i += 2
+            elif re.match(r'^[\d*:,]+$', key):
+                if not _parse_set(key, [seq], top=len(box.uids)):
+                    return False
+        return True
+
+    def cmd_search(self, args, uid_mode):
+        box = self.selected
+        tokens = _tokenize(args)
+        with box.lock:
+            hits = [
+                str(uid if uid_mode else seq)
+                for seq, uid in enumerate(box.uids, 1)
+                if self._matches(box, uid, seq, tokens)
+            ]
+        self.send(('* SEARCH' + ''.join(' ' + h for h in hits) + '\r\n').encode())
+
+    def cmd_thread(self, args, uid_mode):
+        # REFERENCES threading by In-Reply-To only; enough for benchmarks
+        box = self.selected
+        with box.lock:
+            numbers = {uid: uid if uid_mode else seq for seq, uid in enumerate(box.uids, 1)}
+            by_id = {box.header_value(uid, 'Message-ID'): uid for uid in box.uids}
+            children: Dict[Optional[int], List[int]] = {}
+            for uid in box.uids:
+                parent = by_id.get(box.header_value(uid, 'In-Reply-To'))
+                children.setdefault(parent if parent != uid else None, []).append(uid)
+
+        def branch(uid: int) -> str:
+            chain = [str(numbers[uid])]
+            while len(children.get(uid, [])) == 1:
+                uid = children[uid][0]
+                chain.append(str(numbers[uid]))
+            branches = ''.join(f'({branch(child)})' for child in children.get(uid, []))
+            return ' '.join(chain) + (' ' + branches if branches else '')
+
+        threads = ''.join(f'({branch(root)})' for root in children.get(None, []))
+        self.send(f'* THREAD {threads}\r\n'.encode())
+
+    def _fetch_items(self, spec: str) -> List[str]:
+        spec = spec.strip()
+        if spec.startswith('(') and spec.endswith(')'):
+            spec = spec[1:-1]
+        macros = {'ALL': ['FLAGS', 'RFC822.SIZE'], 'FAST': ['FLAGS', 'RFC822.SIZE']}
+        items = []
+        for token in re.findall(r'[\w.]+(?:\[[^\]]*\])?(?:<[\d.]+>)?', spec):
+            items.extend(macros.get(token.upper(), [token]))
+        return items
+
+    def cmd_fetch(self, args, uid_mode):
+        box = self.selected
+        spec, _, item_spec = args.partition(' ')
+        items = self._fetch_items(item_spec)
+        if uid_mode and not any(item.upper() == 'UID' for item in items):
+            items.insert(0, 'UID')
+
+        with box.lock:
+            targets = [(self._seq(box, uid), uid) for uid in self._resolve(spec, uid_mode)]
+
+        for seq, uid in targets:
+            parts = []
+            for item in items:
+                upper = item.upper()
+                if upper == 'UID':
+                    parts.append(f'UID {uid}'.encode())
+                elif upper == 'FLAGS':
+                    parts.append(f'FLAGS ({" ".join(sorted(box.flags.get(uid, ())))})'.encode())
+                elif upper == 'RFC822.SIZE':
+                    parts.append(f'RFC822.SIZE {len(box.message(uid))}'.encode())
+                elif upper == 'INTERNALDATE':
+                    parts.append(b'INTERNALDATE "01-Jan-2024 00:00:00 +0000"')
+                else:
+                    name, data = self._section(box, uid, item)
+                    parts.append(name + b' {%d}\r\n' % len(data) + data)
+                    if not upper.startswith('BODY.PEEK') and 'HEADER' not in upper and not self.readonly:
+                        box.flags[uid].add('\\Seen')
+            self.send(b'* %d FETCH (' % seq + b' '.join(parts) + b')\r\n')
+
+    def _section(self, box: Mailbox, uid: int, item: str):
+        raw = box.message(uid)
+        upper = item.upper()
+        name = upper.replace('.PEEK', '')
+        if upper in ('RFC822', 'BODY[]', 'BODY.PEEK[]'):
+            return name.encode(), raw
+        head, _, _ = raw.partition(b'\r\n\r\n')
+        if 'HEADER.FIELDS' in upper:
+            wanted = re.search(r'\(([^)]*)\)', item).group(1).lower().split()
+            chunks = [m for m in _HEADER_RE.finditer(head + b'\r\n') if m.group(1).decode().lower() in wanted]
+            return name.encode(), b''.join(m.group(0) for m in chunks) + b'\r\n'
+        if upper in ('RFC822.HEADER', 'BODY[HEADER]', 'BODY.PEEK[HEADER]'):
+            return name.encode(), head + b'\r\n\r\n'
+        if upper in ('BODY[TEXT]', 'BODY.PEEK[TEXT]', 'RFC822.TEXT'):
+            return name.encode(), raw.partition(b'\r\n\r\n')[2]
+        raise ValueError(f'Unsupported fetch item {item}')
+
+    def cmd_store(self, args, uid_mode):
+        box = self.selected
+        spec, mode, flag_spec = args.split(' ', 2)
+        flags = set(flag_spec.strip('()').split())
+        silent = mode.upper().endswith('.SILENT')
+        mode = mode.upper().replace('.SILENT', '')
+        with box.lock:
+            for uid in self._resolve(spec, uid_mode):
+                if mode.startswith('+'):
+                    box.flags[uid] |= flags
+                elif mode.startswith('-'):
+                    box.flags[uid] -= flags
+                else:
+                    box.flags[uid] = set(flags)
+                if not silent:
+                    seq = self._seq(box, uid)
+                    self.send(f'* {seq} FETCH (UID {uid} FLAGS ({" ".join(sorted(box.flags[uid]))}))\r\n'.encode())
+
+    def cmd_copy(self, args, uid_mode):
+        box = self.selected
+        spec, _, target = args.partition(' ')
+        dest = self._mailbox(_tokenize(target)[0])
+        with box.lock:
+            for uid in self._resolve(spec, uid_mode):
+                dest.append(box.message(uid), box.flags[uid] - {'\\Deleted'})
+
+    def cmd_move(self, args, uid_mode):
+        box = self.selected
+        spec, _, target = args.partition(' ')
+        dest = self._mailbox(_tokenize(target)[0])
+        with box.lock:
+            uids = self._resolve(spec, uid_mode)
+            for uid in uids:
+                dest.append(box.message(uid), box.flags[uid] - {'\\Deleted'})
+                box.flags[uid].add('\\Deleted')
+        for seq in box.expunge(set(uids)):
+            self.send(f'* {seq} EXPUNGE\r\n'.encode())
+
+    def cmd_expunge(self, args, uid_mode):
+        only = set(self._resolve(args.strip(), True)) if uid_mode and args.strip() else None
+        for seq in self.selected.expunge(only):
+            self.send(f'* {seq} EXPUNGE\r\n'.encode())
@@ -0,0 +1,165 @@
+"""Bytes on the wire per message, legacy encodings vs. size-aware encodings.
+
+Usage:
+    python -m benchmarks.wire_size
+    python -m benchmarks.wire_size --output wire.json
+
+Each representative message is sent to the local SMTP sink three ways: as
+the client used to build it (MIMEText defaults, base64 attachments), and
+with size-aware encodings against a server with and without 8BITMIME.
+"""
+
+import os
+import sys
+import json
+import random
+import smtplib
+import argparse
+import tempfile
+from email import encoders
+from email.mime.base import MIMEBase
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+from email.utils import formatdate, make_msgid
+from typing import Dict, Any, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from email_cli.smtp_client import SMTPClient
+from benchmarks.servers import SMTPSink
+
+WORDS = ('status', 'report', 'account', 'delivery', 'update', 'invoice', 'meeting', 'server', 'project')
+ACCENTED = ('déjà', 'été', 'naïve', 'façade', 'über', 'größe', 'señor', 'año', 'crème')
+
+
+def _prose(rng: random.Random, size: int, words=WORDS) -> str:
+    lines, line = [], []
+    while sum(len(item) + 1 for item in lines) < size:
+        line.append(rng.choice(words))
+        if len(line) == 12:
+            lines.append(' '.join(line).capitalize() + '.')
+            line = []
+    return '\n'.join(lines)[:size]
+
+
+def build_cases(workdir: str) -> List[Dict[str, Any]]:
+    """Representative messages: (name, body, html, attachment paths)."""
+    rng = random.Random(34)
+
+    csv_path = os.path.join(workdir, 'export.csv')
+    with open(csv_path, 'w') as f:
+        f.write('id,email,plan,amount\n')
+        for i in range(2000):
+            f.write(f'{i},user{i}@example.com,{rng.choice(WORDS)},{rng.randint(1, 999)}.00\n')
+
+    log_path = os.path.join(workdir, 'events.json')
+    with open(log_path, 'w') as f:
+        json.dump([{'id': i, 'event': rng.choice(WORDS), 'ok': i % 7 != 0} for i in range(1500)], f, indent=1)
+
+    binary_path = os.path.join(workdir, 'scan.pdf')
+    with open(binary_path, 'wb') as f:
+        f.write(rng.randbytes(65536))
+
+    ascii_body = _prose(rng, 4000)
+    accented_body = _prose(rng, 4000, WORDS + ACCENTED)
+    cjk_body = '\n'.join('今日は会議の議事録を送ります。ご確認ください。' * 3 for _ in range(60))
+    newsletter = '<html><body>' + ''.join(
+        f'<h2>{rng.choice(WORDS)}</h2><p>{_prose(rng, 600)}</p>' for _ in range(20)
+    ) + '</body></html>'
+
+    return [
+        {'name': 'ascii_text', 'body': ascii_body, 'html': None, 'attachments': []},
+        {'name': 'latin_text', 'body': accented_body, 'html': None, 'attachments': []},
+        {'name': 'cjk_text', 'body': cjk_body, 'html': None, 'attachments': []},
+        {'name': 'ascii_newsletter', 'body': ascii_body, 'html': newsletter, 'attachments': []},
+        {'name': 'csv_attachment', 'body': ascii_body, 'html': None, 'attachments': [csv_path]},
+        {'name': 'json_attachment', 'body': accented_body, 'html': None, 'attachments': [log_path]},
+        {'name': 'binary_attachment', 'body': ascii_body, 'html': None, 'attachments': [binary_path]},
+    ]
+
+
+def legacy_message(sender: str, to: str, case: Dict[str, Any]) -> MIMEMultipart:
+    """The message as the client built it before size-aware encodings."""
+    msg = MIMEMultipart('alternative')
+    msg['From'] = sender
+    msg['To'] = to
+    msg['Subject'] = case['name']
+    # Same headers the client adds today, so only body encodings differ
+    msg['Date'] = formatdate(localtime=True)
+    msg['Message-ID'] = make_msgid(domain='example.com')
+    msg.attach(MIMEText(case['body'], 'plain'))
+    if case['html']:
+        msg.attach(MIMEText(case['html'], 'html'))
+    for path in case['attachments']:
+        with open(path, 'rb') as f:
+            part = MIMEBase('application', 'octet-stream')
+            part.set_payload(f.read())
+        encoders.encode_base64(part)
+        part.add_header('Content-Disposition', f'attachment; filename= {os.path.basename(path)}')
+        msg.attach(part)
+    return msg
+
+
+def _wire_bytes(sink: SMTPSink, send) -> int:
+    before = sink.stats['bytes']
+    send()
+    return sink.stats['bytes'] - before
+
+
+def measure(cases: List[Dict[str, Any]], eight_bit: bool) -> Dict[str, Dict[str, int]]:
+    extensions = ['AUTH PLAIN LOGIN', 'SIZE 104857600'] + (['8BITMIME'] if eight_bit else [])
+    sizes = {}
+    with SMTPSink(extensions=extensions) as sink:
+        account = {
+            'smtp_host': '127.0.0.1', 'smtp_port': sink.port,
+            'username': 'bench@example.com', 'password': 'bench', 'use_ssl': False
+        }
+        smtp = SMTPClient(account)
+        for case in cases:
+            def legacy():
+                with smtplib.SMTP('127.0.0.1', sink.port) as server:
+                    server.send_message(legacy_message(account['username'], 'to@example.com', case))
+
+            def current():
+                result = smtp.send_email('to@example.com', case['name'], case['body'], html=case['html'],
+                                         attachments=case['attachments'] or None)
+                if not result['success']:
+                    raise RuntimeError(result['error'])
+
+            sizes[case['name']] = {'legacy': _wire_bytes(sink, legacy), 'current': _wire_bytes(sink, current)}
+    return sizes
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Bytes on the wire per message')
+    parser.add_argument('--output', help='Also write results as JSON')
+    args = parser.parse_args(argv)
+
+    rows = []
+    with tempfile.TemporaryDirectory() as workdir:
+        cases = build_cases(workdir)
+        seven_bit = measure(cases, eight_bit=False)
+        eight_bit = measure(cases, eight_bit=True)
+
+    print(f"{'message':20} {'legacy':>10} {'7bit srv':>10} {'change':>8} {'8BITMIME':>10} {'change':>8}")
+    for case in cases:
+        name = case['name']
+        legacy = seven_bit[name]['legacy']
+        row = {
+            'message': name,
+            'legacy_bytes': legacy,
+            'bytes_7bit_server': seven_bit[name]['current'],
+            'bytes_8bitmime_server': eight_bit[name]['current']
+        }
+        rows.append(row)
+        print(f"{name:20} {legacy:>10} {row['bytes_7bit_server']:>10} "
+              f"{(row['bytes_7bit_server'] - legacy) / legacy * 100:>+7.1f}% "
+              f"{row['bytes_8bitmime_server']:>10} {(row['bytes_8bitmime_server'] - legacy) / legacy * 100:>+7.1f}%")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'results': rows}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
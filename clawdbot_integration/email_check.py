@@ -1,37 +1,61 @@
 #!/usr/bin/env python3
 """
 Email checker for Clawdbot cron integration.
-Checks for unread emails and sends notification summary.
+Checks for newly arrived emails and prints a notification summary.
+
+The last notified UID is remembered per account and folder, so each run only
+reports mail that arrived since the previous one. Nothing is printed when
+there is no new mail, which keeps cron pipelines from re-posting old mail.
 """
 
-import subprocess
-import json
 import os
 import sys
-
-
-def check_emails(limit: int = 10, folder: str = 'INBOX') -> dict:
-    """Check for unread emails."""
-    # Change to email_cli directory
-    email_cli_dir = os.path.join(os.path.dirname(__file__), '..')
-    os.chdir(email_cli_dir)
-
-    # Run list command for unread emails
-    result = subprocess.run([
-        'python', '-m', 'email_cli', 'list',
-        '--folder', folder,
-        '--unread',
-        '--limit', str(limit),
-        '--json'
-    ], capture_output=True, text=True, timeout=30)
-
-    if result.returncode != 0:
-        return {
-            'success': False,
-            'error': result.stderr
-        }
-
-    return json.loads(result.stdout)
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from email_cli.config import Config
+from email_cli.imap_client import IMAPClient
+from email_cli.state import StateStore, watermark_key
+from email_cli.notifier import build_notifier
+from email_cli import metrics
+
+
+def check_emails(
+    limit: int = 10,
+    folder: str = 'INBOX',
+    account: str = None,
+    config: Config = None,
+    state: StateStore = None
+) -> dict:
+    """Check for emails that arrived since the last run."""
+    config = config or Config()
+    account = account or config.config.get('default_account', 'primary')
+    state = state or StateStore.from_settings(config.get_settings())
+    key = watermark_key(account, folder)
+    mark = state.get(key, {})
+
+    imap = IMAPClient(config.get_account(account))
+    result = imap.check_new(
+        folder=folder,
+        last_uid=mark.get('last_uid'),
+        uidvalidity=mark.get('uidvalidity'),
+        limit=limit
+    )
+
+    if result.get('error'):
+        result['success'] = False
+        return result
+
+    if result['last_uid'] != mark.get('last_uid') or result['uidvalidity'] != mark.get('uidvalidity'):
+        state.set(key, {
+            'uidvalidity': result['uidvalidity'],
+            'last_uid': result['last_uid']
+        })
+        state.save()
+
+    return result
 
 
 def format_summary(emails: dict) -> str:
@@ -39,9 +63,9 @@ def format_summary(emails: dict) -> str:
     total = emails.get('total', 0)
 
     if total == 0:
-        return "📬 No new unread emails."
+        return "📬 No new emails."
 
-    summary = f"📬 You have **{total} unread email(s)** in {emails['folder']}:\n\n"
+    summary = f"📬 You have **{total} new email(s)** in {emails['folder']}:\n\n"
 
     for idx, email in enumerate(emails['emails'], 1):
         from_name = email.get('from', 'Unknown').split('<')[0].strip()
@@ -55,32 +79,77 @@ def format_summary(emails: dict) -> str:
         summary += f"   Subject: {subject}\n"
         summary += f"   Date: {email.get('date', 'Unknown')}\n\n"
 
+    if total > len(emails['emails']):
+        summary += f"...and {total - len(emails['emails'])} more.\n"
+
     return summary
 
 
-def main():
-    """Main function."""
-    try:
-        # Parse arguments
-        limit = int(sys.argv[1]) if len(sys.argv) > 1 else 10
-        folder = sys.argv[2] if len(sys.argv) > 2 else 'INBOX'
+def parse_args(argv=None) -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description='Report newly arrived emails.')
+    parser.add_argument('limit', nargs='?', type=int, default=10, help='Max emails to list')
+    parser.add_argument('folder', nargs='?', default='INBOX', help='Folder name')
+    parser.add_argument('account', nargs='?', default=None, help='Account name from config')
+    parser.add_argument('--notify', action='store_true',
+                        help='Post digests to settings.notification_channel instead of stdout')
+    parser.add_argument('--watch', type=float, metavar='SECONDS',
+                        help='Keep running and check every SECONDS')
+    parser.add_argument('--metrics-port', type=int, metavar='PORT',
+                        help='Serve Prometheus metrics on PORT at /metrics')
+    parser.add_argument('--metrics-textfile', metavar='PATH',
+                        help='Rewrite Prometheus metrics to PATH after every check')
+    return parser.parse_args(argv)
 
-        # Check emails
-        emails = check_emails(limit=limit, folder=folder)
 
-        if not emails.get('success', True):
-            print(f"Error checking emails: {emails.get('error', 'Unknown error')}", file=sys.stderr)
-            sys.exit(1)
+def main():
+    """Main function."""
+    args = parse_args()
+    notifier = None
 
-        # Format and output summary
-        summary = format_summary(emails)
-        print(summary)
+    try:
+        config = Config()
+        settings = config.get_settings()
+        metrics.configure(settings, textfile=args.metrics_textfile, port=args.metrics_port)
+        textfile = args.metrics_textfile or (settings.get('metrics') or {}).get('textfile')
+        if args.notify:
+            notifier = build_notifier(settings)
+            if notifier is None:
+                print("Error: no notification channel configured", file=sys.stderr)
+                sys.exit(1)
+            notifier.start()
+
+        while True:
+            # Check emails
+            emails = check_emails(limit=args.limit, folder=args.folder, account=args.account, config=config)
+
+            if not emails.get('success', True):
+                print(f"Error checking emails: {emails.get('error', 'Unknown error')}", file=sys.stderr)
+                if not args.watch:
+                    sys.exit(1)
+            elif emails.get('total', 0) > 0:
+                # Only notify about newly arrived mail
+                if notifier:
+                    notifier.add(args.folder, emails['emails'], total=emails['total'])
+                else:
+                    print(format_summary(emails), flush=True)
+
+            if textfile:
+                metrics.REGISTRY.write_textfile(textfile)
+            if not args.watch:
+                break
+            time.sleep(args.watch)
 
     except KeyboardInterrupt:
-        sys.exit(0)
+        pass
     except Exception as e:
         print(f"Error: {e}", file=sys.stderr)
         sys.exit(1)
+    finally:
+        if notifier:
+            for result in notifier.close():
+                if not result['success']:
+                    print(f"Error notifying {result['channel']}: {result['error']}", file=sys.stderr)
 
 
 if __name__ == '__main__':
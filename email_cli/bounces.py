@@ -0,0 +1,134 @@
+"""Bounce (DSN) processing into the suppression list."""
+
+import re
+import email
+from email.message import Message
+from typing import List, Dict, Any, Optional
+
+from .imap_client import IMAPClient, quote_folder
+from .state import StateStore, watermark_key
+from .suppression import SuppressionList
+
+
+_ADDRESS_TYPE_RE = re.compile(r'^\s*[\w-]+\s*;\s*', re.ASCII)
+
+
+def _strip_address(value: Optional[str]) -> Optional[str]:
+    """Turn ``rfc822; <user@example.com>`` into ``user@example.com``."""
+    if not value:
+        return None
+    address = _ADDRESS_TYPE_RE.sub('', value).strip().strip('<>').strip()
+    return address if '@' in address else None
+
+
+def _delivery_status_blocks(part: Message) -> List[Message]:
+    """Get the header blocks of a message/delivery-status part."""
+    payload = part.get_payload()
+    if isinstance(payload, list):
+        return payload
+
+    # Some generators leave the body unparsed; blocks are blank-line separated
+    text = payload if isinstance(payload, str) else ''
+    return [email.message_from_string(block) for block in re.split(r'\r?\n\s*\r?\n', text) if block.strip()]
+
+
+def parse_dsn(raw: bytes) -> List[Dict[str, Any]]:
+    """Extract per-recipient results from a delivery status notification.
+
+    Only RFC 3464 ``multipart/report; report-type=delivery-status`` messages
+    are understood. Returns one dict per recipient block with the recipient,
+    action, status code and diagnostic text.
+    """
+    message = email.message_from_bytes(raw)
+    if message.get_content_type() != 'multipart/report':
+        return []
+    if (message.get_param('report-type') or '').lower() != 'delivery-status':
+        return []
+
+    results = []
+    for part in message.walk():
+        if part.get_content_type() not in ('message/delivery-status', 'message/global-delivery-status'):
+            continue
+
+        blocks = _delivery_status_blocks(part)
+        # The first block holds per-message fields, the rest one recipient each
+        for block in blocks[1:]:
+            recipient = _strip_address(block.get('Final-Recipient')) or _strip_address(block.get('Original-Recipient'))
+            if not recipient:
+                continue
+            results.append({
+                'address': recipient,
+                'action': (block.get('Action') or '').strip().lower(),
+                'status': (block.get('Status') or '').strip().split(' ')[0],
+                'reason': ' '.join((block.get('Diagnostic-Code') or '').split())
+            })
+    return results
+
+
+def is_permanent_failure(result: Dict[str, Any]) -> bool:
+    """Whether a DSN recipient result means the address is dead."""
+    return result['action'] == 'failed' and result['status'].startswith('5')
+
+
+def process_bounces(
+    imap: IMAPClient,
+    suppression: SuppressionList,
+    state: StateStore,
+    account: str,
+    folder: str = 'INBOX',
+    batch_size: int = 50
+) -> Dict[str, Any]:
+    """Scan new mail in a folder for DSNs and suppress hard-bounced addresses.
+
+    Only UIDs above the folder's bounce watermark are searched, and the server
+    is asked to narrow them to ``multipart/report`` messages first, so a run
+    downloads just the new bounces. Soft failures (4.x.x) are counted but not
+    suppressed.
+    """
+    key = f'bounces:{watermark_key(account, folder)}'
+    mark = state.get(key, {})
+    result = {
+        'success': False,
+        'folder': folder,
+        'scanned': 0,
+        'bounces': 0,
+        'suppressed': [],
+        'soft_failures': 0,
+        'last_uid': mark.get('last_uid', 0),
+        'error': None
+    }
+
+    try:
+        with imap.connect() as server:
+            status = imap.folder_status(server, folder)
+            last_uid = mark.get('last_uid', 0)
+            if status.get('uidvalidity') != mark.get('uidvalidity'):
+                # UIDs were renumbered; rescan (suppression upserts are idempotent)
+                last_uid = 0
+
+            uidnext = status.get('uidnext', 1)
+            if uidnext - 1 > last_uid:
+                server.select(quote_folder(folder), readonly=True)
+                uids = imap.uid_search(server, f'UID {last_uid + 1}:* HEADER Content-Type "multipart/report"')
+                uids = [uid for uid in uids if uid > last_uid]
+
+                for uid, raw in imap.uid_fetch_raw(server, uids, batch_size=batch_size):
+                    result['scanned'] += 1
+                    recipients = parse_dsn(raw)
+                    if recipients:
+                        result['bounces'] += 1
+
+                    hard = [r for r in recipients if is_permanent_failure(r)]
+                    result['soft_failures'] += len(recipients) - len(hard)
+                    suppression.add_many(dict(r, source=f'{account}:{folder}:{uid}') for r in hard)
+                    result['suppressed'].extend(r['address'] for r in hard)
+
+            state.set(key, {'uidvalidity': status.get('uidvalidity'), 'last_uid': max(last_uid, uidnext - 1)})
+            state.save()
+            result['last_uid'] = max(last_uid, uidnext - 1)
+            result['success'] = True
+
+    except Exception as e:
+        result['error'] = str(e)
+
+    return result
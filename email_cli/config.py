@@ -3,7 +3,7 @@
 import os
 import json
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from dotenv import load_dotenv
 
 # Load .env file if exists
@@ -97,8 +97,34 @@ class Config:
 
     def get_recipients(self, group_name: str) -> Optional[List[str]]:
         """Get recipients group by name."""
-        recipients = self.config.get('recipients', {})
-        return recipients.get(group_name)
+        group = self.get_recipient_group(group_name)
+        return list(group) if group is not None else None
+
+    def get_recipient_group(self, group_name: str):
+        """Get a lazily iterated recipient group (inline, CSV or SQLite)."""
+        from .recipients import open_group
+
+        spec = self.config.get('recipients', {}).get(group_name)
+        if spec is None:
+            return None
+        return open_group(spec, base_dir=self.base_dir)
+
+    def get_all_recipient_groups(self) -> Dict[str, Any]:
+        """Get all recipient group definitions."""
+        return self.config.get('recipients', {})
+
+    def get_route(self, route_name: str) -> Optional[Dict[str, Any]]:
+        """Get a routing group (accounts with weights) by name."""
+        return self.config.get('routes', {}).get(route_name)
+
+    def get_all_routes(self) -> Dict[str, Any]:
+        """Get all routing group definitions."""
+        return self.config.get('routes', {})
+
+    @property
+    def base_dir(self) -> str:
+        """Directory that relative paths in the config are resolved against."""
+        return os.path.dirname(os.path.abspath(self.config_path)) if self.config_path else os.getcwd()
 
     def get_settings(self) -> Dict[str, Any]:
         """Get global settings."""
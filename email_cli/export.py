@@ -0,0 +1,447 @@
+"""Folder export to mbox/Maildir and import back over IMAP."""
+
+import os
+import re
+import time
+import queue
+import bisect
+import calendar
+import socket
+import imaplib
+import threading
+from typing import Dict, Any, Callable, Iterator, List, Optional, Tuple
+
+from .imap_client import IMAPClient, parse_fetch_response, quote_folder, parse_list_response, uid_set
+from .state import StateStore
+
+FORMATS = ('mbox', 'maildir')
+
+# mboxrd: quote "From " lines, including already quoted ones
+_FROM_RE = re.compile(rb'^(>*From )', re.M)
+_UNQUOTE_RE = re.compile(rb'^>(>*From )', re.M)
+_MBOX_SEPARATOR_RE = re.compile(rb'^From ', re.M)
+_MAILDIR_INFO_RE = re.compile(r':2,([A-Za-z]*)$')
+
+MAILDIR_FLAGS = {'\\Draft': 'D', '\\Flagged': 'F', '\\Answered': 'R', '\\Seen': 'S', '\\Deleted': 'T'}
+IMAP_FLAGS = {letter: flag for flag, letter in MAILDIR_FLAGS.items()}
+
+Progress = Callable[[Dict[str, Any]], None]
+
+
+def _merge_spans(spans: List[List[int]]) -> List[List[int]]:
+    merged: List[List[int]] = []
+    for low, high in sorted(spans):
+        if merged and low <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], high)
+        else:
+            merged.append([low, high])
+    return merged
+
+
+def _in_spans(uid: int, spans: List[List[int]], starts: List[int]) -> bool:
+    """Whether a UID falls in merged, sorted spans (``starts`` are their lows)."""
+    index = bisect.bisect_right(starts, uid) - 1
+    return index >= 0 and uid <= spans[index][1]
+
+
+def _internaldate(value: Optional[str]) -> float:
+    if not value:
+        return time.time()
+    parsed = imaplib.Internaldate2tuple(f'INTERNALDATE "{value}"'.encode())
+    return time.mktime(parsed) if parsed else time.time()
+
+
+def safe_folder_name(folder: str) -> str:
+    """File name for a folder: path separators become dots."""
+    return re.sub(r'[/\\:]', '.', folder).strip('.') or 'INBOX'
+
+
+class MboxWriter:
+    """Append messages to an mboxrd file.
+
+    ``offset`` is the file size after the last complete batch; a resumed
+    export truncates back to it, dropping any half-written batch.
+    """
+
+    def __init__(self, path: str, offset: int = 0):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.file = open(path, 'r+b' if os.path.exists(path) else 'w+b')
+        self.file.truncate(offset)
+        self.file.seek(offset)
+        self.offset = offset
+
+    def write(self, items: List[Dict[str, Any]]) -> int:
+        chunks = []
+        for item in items:
+            date = time.asctime(time.gmtime(_internaldate(item['internaldate'])))
+            data = item['literal'].replace(b'\r\n', b'\n')
+            if b'From ' in data:
+                # Rare (header lines are "From:"), so skip the regex otherwise
+                data = _FROM_RE.sub(rb'>\1', data)
+            chunks.append(f'From MAILER-DAEMON {date}\n'.encode())
+            chunks.append(data)
+            chunks.append(b'\n' if data.endswith(b'\n') else b'\n\n')
+        self.file.writelines(chunks)
+        self.file.flush()
+        self.offset = self.file.tell()
+        return sum(len(item['literal']) for item in items)
+
+    def close(self):
+        self.file.close()
+
+
+class MaildirWriter:
+    """Write messages into a Maildir, one file each, flags in the name.
+
+    File names are derived from UIDVALIDITY and UID, so rewriting a batch
+    after an interruption replaces files instead of duplicating them.
+    """
+
+    def __init__(self, path: str, uidvalidity: int):
+        self.path = path
+        self.uidvalidity = uidvalidity
+        self.hostname = socket.gethostname().replace('/', '\\057').replace(':', '\\072')
+        for sub in ('tmp', 'new', 'cur'):
+            os.makedirs(os.path.join(path, sub), exist_ok=True)
+        self.offset = 0
+
+    def write(self, items: List[Dict[str, Any]]) -> int:
+        total = 0
+        for item in items:
+            stamp = _internaldate(item['internaldate'])
+            info = ''.join(sorted(MAILDIR_FLAGS[flag] for flag in item['flags'] if flag in MAILDIR_FLAGS))
+            name = f"{int(stamp)}.U{self.uidvalidity}_{item['uid']}.{self.hostname}"
+            tmp_path = os.path.join(self.path, 'tmp', name)
+            with open(tmp_path, 'wb') as f:
+                f.write(item['literal'].replace(b'\r\n', b'\n'))
+            os.utime(tmp_path, (stamp, stamp))
+            os.replace(tmp_path, os.path.join(self.path, 'cur', f'{name}:2,{info}'))
+            total += len(item['literal'])
+        return total
+
+    def close(self):
+        pass
+
+
+class Exporter:
+    """Export folders over several IMAP connections at once.
+
+    The folder's UIDs and sizes are listed first and split into batches of
+    at most ``batch_size`` messages or ``batch_bytes`` bytes. Worker
+    connections fetch batches with BODY.PEEK[] (read flags are untouched)
+    and hand the raw bytes to the writer unparsed. Finished UID ranges are
+    checkpointed after every batch, so an interrupted export picks up where
+    it stopped, and re-running a finished one fetches only new mail.
+    """
+
+    def __init__(
+        self,
+        client: IMAPClient,
+        workers: int = 4,
+        batch_size: int = 500,
+        batch_bytes: int = 8 * 1024 * 1024,
+        progress: Optional[Progress] = None
+    ):
+        self.client = client
+        self.workers = max(1, workers)
+        self.batch_size = batch_size
+        self.batch_bytes = batch_bytes
+        self.progress = progress
+
+    def list_folders(self) -> List[str]:
+        """Selectable folders on the server."""
+        with self.client.connect() as server:
+            status, data = server.list()
+        if status != 'OK':
+            raise imaplib.IMAP4.error(f"LIST failed: {status}")
+        folders = []
+        for line in data:
+            item = parse_list_response(line) if isinstance(line, bytes) else None
+            if item and '\\noselect' not in (flag.lower() for flag in item['flags']):
+                folders.append(item['name'])
+        return folders
+
+    def _examine(self, server: imaplib.IMAP4, folder: str) -> Tuple[int, int]:
+        """EXAMINE a folder; returns (message count, UIDVALIDITY)."""
+        status, data = server.select(quote_folder(folder), readonly=True)
+        if status != 'OK':
+            raise imaplib.IMAP4.error(f"Cannot open folder {folder}: {data}")
+        uidvalidity = server.untagged_responses.get('UIDVALIDITY', [b'0'])[-1]
+        return int(data[0] or 0), int(uidvalidity)
+
+    def _plan(self, server: imaplib.IMAP4, count: int, done: List[List[int]]) -> Tuple[List[List[int]], int, int]:
+        """Split the UIDs not yet exported into batches."""
+        if not count:
+            return [], 0, 0
+        status, data = server.uid('FETCH', '1:*', '(UID RFC822.SIZE)')
+        if status != 'OK':
+            raise imaplib.IMAP4.error(f"Fetch failed: {status}")
+
+        sizes = sorted((item['uid'], item['size'] or 0) for item in parse_fetch_response(data) if item['uid'])
+        done = _merge_spans(done)
+        starts = [low for low, _ in done]
+        batches, batch, batch_bytes = [], [], 0
+        remaining = remaining_bytes = 0
+        for uid, size in sizes:
+            if _in_spans(uid, done, starts):
+                continue
+            if batch and (len(batch) >= self.batch_size or batch_bytes + size > self.batch_bytes):
+                batches.append(batch)
+                batch, batch_bytes = [], 0
+            batch.append(uid)
+            batch_bytes += size
+            remaining += 1
+            remaining_bytes += size
+        if batch:
+            batches.append(batch)
+        return batches, remaining, remaining_bytes
+
+    def _fetch(self, server: imaplib.IMAP4, batch: List[int]) -> List[Dict[str, Any]]:
+        status, data = server.uid('FETCH', uid_set(batch), '(UID FLAGS INTERNALDATE BODY.PEEK[])')
+        if status != 'OK':
+            raise imaplib.IMAP4.error(f"Fetch failed: {status}")
+        return [item for item in parse_fetch_response(data) if item['uid'] and item['literal'] is not None]
+
+    def export_folder(self, folder: str, target: str, fmt: str = 'mbox') -> Dict[str, Any]:
+        """Export one folder to an mbox file or Maildir directory."""
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown export format '{fmt}' (expected one of {', '.join(FORMATS)})")
+
+        result = {
+            'folder': folder,
+            'path': target,
+            'format': fmt,
+            'messages': 0,
+            'bytes': 0,
+            'skipped': 0,
+            'error': None
+        }
+        checkpoint = StateStore(
+            f'{target}.export-state.json' if fmt == 'mbox' else os.path.join(target, '.export-state.json')
+        )
+        state = checkpoint.get(folder) or {}
+        start = time.perf_counter()
+
+        try:
+            with self.client.connect() as server:
+                count, uidvalidity = self._examine(server, folder)
+                if state and state.get('uidvalidity') != uidvalidity:
+                    if fmt == 'mbox':
+                        raise ValueError(
+                            f"UIDVALIDITY of {folder} changed since {target} was started; export to a new file"
+                        )
+                    state = {}
+                if not state and fmt == 'mbox' and os.path.exists(target) and os.path.getsize(target):
+                    raise ValueError(f"{target} already exists and has no export checkpoint")
+                done = state.get('done', [])
+                batches, remaining, remaining_bytes = self._plan(server, count, done)
+                result['skipped'] = count - remaining
+
+            writer = MboxWriter(target, state.get('offset', 0)) if fmt == 'mbox' else MaildirWriter(target, uidvalidity)
+            state = {'uidvalidity': uidvalidity, 'done': done, 'offset': writer.offset}
+            try:
+                self._run(folder, uidvalidity, batches, writer, checkpoint, state, result, remaining, remaining_bytes)
+            finally:
+                writer.close()
+        except Exception as e:
+            result['error'] = str(e)
+
+        result['seconds'] = round(time.perf_counter() - start, 3)
+        return result
+
+    def _run(self, folder, uidvalidity, batches, writer, checkpoint, state, result, total, total_bytes):
+        """Fetch batches on worker connections and write them as they arrive."""
+        pending: 'queue.Queue[List[int]]' = queue.Queue()
+        for batch in batches:
+            pending.put(batch)
+        lock = threading.Lock()
+        errors: List[str] = []
+        last_report = [0.0]
+
+        def write(batch: List[int], items: List[Dict[str, Any]]):
+            with lock:
+                result['bytes'] += writer.write(items)
+                result['messages'] += len(items)
+                state['done'] = _merge_spans(state['done'] + [[batch[0], batch[-1]]])
+                state['offset'] = writer.offset
+                checkpoint.set(folder, state)
+                checkpoint.save()
+                if self.progress and time.monotonic() - last_report[0] >= 1.0:
+                    last_report[0] = time.monotonic()
+                    self.progress({'folder': folder, 'messages': result['messages'], 'total': total,
+                                   'bytes': result['bytes'], 'total_bytes': total_bytes})
+
+        def work():
+            server = None
+            try:
+                while not errors:
+                    try:
+                        batch = pending.get_nowait()
+                    except queue.Empty:
+                        return
+                    # Retry once on a fresh connection if this one dropped
+                    for attempt in (1, 2):
+                        try:
+                            if server is None:
+                                server = self.client.connect()
+                                if self._examine(server, folder)[1] != uidvalidity:
+                                    raise ValueError(f"UIDVALIDITY of {folder} changed during export")
+                            items = self._fetch(server, batch)
+                            break
+                        except (imaplib.IMAP4.abort, OSError):
+                            server = None
+                            if attempt == 2:
+                                raise
+                    write(batch, items)
+            except Exception as e:
+                errors.append(str(e))
+            finally:
+                if server is not None:
+                    try:
+                        server.logout()
+                    except Exception:
+                        pass
+
+        threads = [threading.Thread(target=work, daemon=True) for _ in range(min(self.workers, len(batches)))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise RuntimeError(errors[0])
+
+    def export(self, folders: List[str], output: str, fmt: str = 'mbox', nested: bool = False) -> Dict[str, Any]:
+        """Export folders; with ``nested``, each goes to its own file or directory under ``output``."""
+        result = {'format': fmt, 'path': output, 'folders': [], 'messages': 0, 'bytes': 0, 'error': None}
+        start = time.perf_counter()
+        for folder in folders:
+            if nested:
+                target = os.path.join(output, safe_folder_name(folder) + ('.mbox' if fmt == 'mbox' else ''))
+            else:
+                target = output
+            outcome = self.export_folder(folder, target, fmt)
+            result['folders'].append(outcome)
+            result['messages'] += outcome['messages']
+            result['bytes'] += outcome['bytes']
+            if outcome['error']:
+                result['error'] = f"{folder}: {outcome['error']}"
+                break
+        result['seconds'] = round(time.perf_counter() - start, 3)
+        return result
+
+
+def iter_mbox(path: str, chunk_size: int = 8 * 1024 * 1024) -> Iterator[Tuple[bytes, Optional[str], Optional[float]]]:
+    """Yield ``(data, flags, date)`` for each message of an mboxrd file."""
+    def message(block: bytes):
+        head, _, data = block.partition(b'\n')
+        date = None
+        try:
+            date = calendar.timegm(time.strptime(head.split(None, 2)[2].decode().strip(), '%a %b %d %H:%M:%S %Y'))
+        except (IndexError, ValueError, UnicodeDecodeError):
+            pass
+        if data.endswith(b'\n\n'):
+            data = data[:-1]
+        return _UNQUOTE_RE.sub(rb'\1', data), None, date
+
+    with open(path, 'rb') as f:
+        buffer = b''
+        while True:
+            chunk = f.read(chunk_size)
+            buffer += chunk
+            # Every separator but the last is known to end a message
+            starts = [match.start() for match in _MBOX_SEPARATOR_RE.finditer(buffer)]
+            for begin, end in zip(starts, starts[1:]):
+                yield message(buffer[begin:end])
+            if starts:
+                buffer = buffer[starts[-1]:]
+            if not chunk:
+                break
+        if buffer.startswith(b'From '):
+            yield message(buffer)
+
+
+def iter_maildir(path: str) -> Iterator[Tuple[bytes, Optional[str], Optional[float]]]:
+    """Yield ``(data, flags, date)`` for each message of a Maildir."""
+    for sub in ('cur', 'new'):
+        directory = os.path.join(path, sub)
+        if not os.path.isdir(directory):
+            continue
+        for name in sorted(os.listdir(directory)):
+            file_path = os.path.join(directory, name)
+            match = _MAILDIR_INFO_RE.search(name)
+            flags = ' '.join(IMAP_FLAGS[letter] for letter in match.group(1) if letter in IMAP_FLAGS) if match else ''
+            with open(file_path, 'rb') as f:
+                data = f.read()
+            yield data, f'({flags})', os.path.getmtime(file_path)
+
+
+def detect_format(path: str) -> str:
+    """Whether a path is a Maildir or an mbox file."""
+    return 'maildir' if os.path.isdir(os.path.join(path, 'cur')) else 'mbox'
+
+
+def import_messages(
+    client: IMAPClient,
+    source: str,
+    folder: str,
+    fmt: Optional[str] = None,
+    batch_size: int = 100,
+    batch_bytes: int = 8 * 1024 * 1024,
+    create: bool = True,
+    progress: Optional[Progress] = None
+) -> Dict[str, Any]:
+    """APPEND every message of an mbox file or Maildir to a folder.
+
+    Batches go through ``IMAPClient.append_messages``, so servers with
+    LITERAL+ receive them pipelined. The number of messages appended is
+    checkpointed per batch, so re-running an interrupted import skips what
+    was already stored.
+    """
+    fmt = fmt or detect_format(source)
+    result = {'folder': folder, 'path': source, 'format': fmt, 'messages': 0, 'bytes': 0, 'skipped': 0,
+              'error': None}
+    checkpoint = StateStore(
+        f'{source}.import-state.json' if fmt == 'mbox' else os.path.join(source, '.import-state.json')
+    )
+    key = f'{client.username}@{client.host}:{folder}'
+    already = checkpoint.get(key, 0)
+    start = time.perf_counter()
+    last_report = 0.0
+
+    try:
+        messages = iter_mbox(source) if fmt == 'mbox' else iter_maildir(source)
+        with client.connect() as server:
+            if create:
+                # Fails harmlessly when the folder already exists
+                server.create(quote_folder(folder))
+
+            batch, size = [], 0
+
+            def flush():
+                client.append_messages(server, folder, batch)
+                result['messages'] += len(batch)
+                result['bytes'] += size
+                checkpoint.set(key, already + result['messages'])
+                checkpoint.save()
+
+            for index, message in enumerate(messages):
+                if index < already:
+                    result['skipped'] += 1
+                    continue
+                batch.append(message)
+                size += len(message[0])
+                if len(batch) >= batch_size or size >= batch_bytes:
+                    flush()
+                    batch, size = [], 0
+                    if progress and time.monotonic() - last_report >= 1.0:
+                        last_report = time.monotonic()
+                        progress({'folder': folder, 'messages': result['messages'], 'bytes': result['bytes']})
+            if batch:
+                flush()
+    except Exception as e:
+        result['error'] = str(e)
+
+    result['seconds'] = round(time.perf_counter() - start, 3)
+    return result
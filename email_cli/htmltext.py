@@ -0,0 +1,376 @@
+"""Streaming HTML-to-text conversion for message bodies."""
+
+import re
+from html import unescape
+from html.entities import html5
+from itertools import compress, count, islice, repeat
+from typing import Iterable, Iterator
+
+# Conversion works on whole regions of a document at a time, in a few
+# passes that run in C rather than Python code per character or tag.
+# Tags become marker characters, resolved into newlines at the end; all
+# of them start with the same character, since runs that start with one
+# known character are found far faster than runs of any of several.
+_LINE = '\x01'
+_PARAGRAPH = '\x01\x02'
+_BR = '\x01\x03'
+# Whitespace inside <pre>, hidden from whitespace collapsing
+_PRE_SPACE, _PRE_NEWLINE, _PRE_TAB = '\x04', '\x05', '\x06'
+_MARKERS = '\x01\x02\x03\x04\x05\x06'
+_STRIP_MARKERS = str.maketrans('', '', _MARKERS)
+_PRE_RESTORE = str.maketrans({_PRE_SPACE: ' ', _PRE_NEWLINE: '\n', _PRE_TAB: '\t'})
+_BREAKS = ' \x01\x02\x03'
+
+# Every tag, split into the target of a link or the name of any other tag;
+# comments and declarations have neither
+_TAG = re.compile(
+    r'''<(?:[aA]\s[^>]*?\b[hH][rR][eE][fF]\s*=\s*["']?([^"'\s>]*)[^>]*>'''
+    r'|(/?[A-Za-z][A-Za-z0-9]*)[^>]*>|[!?/][^>]*>)'
+)
+# Scripts are the one place a '<' may not start a tag
+_SCRIPT = re.compile(r'<script\b.*?</script\s*>', re.I | re.S)
+# Entities that end in ';', the way nearly all are written; anything else
+# is left as it stands
+_ENTITY = re.compile(r'&(#?[A-Za-z0-9]+;)')
+_BREAK_RUN = re.compile(r'\x01[ \x01\x02\x03]*')
+_LINK_SCHEMES = ('http:', 'https:', 'ftp:', 'mailto:')
+
+
+def _spellings(*names: str) -> tuple:
+    # Tags are matched by name as written, so cover the usual spellings
+    spellings = []
+    for name in names:
+        bare = name.lstrip('/')
+        for spelling in (bare, bare.upper(), bare.capitalize()):
+            spelling = name[:-len(bare)] + spelling
+            if spelling not in spellings:
+                spellings.append(spelling)
+    return tuple(spellings)
+
+
+def _tag_table():
+    table = {'br': _BR, 'td': ' ', 'th': ' ', 'li': f'{_LINE}* ', '/li': _LINE}
+    for name in ('p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'blockquote', 'hr', 'pre'):
+        table[name] = table[f'/{name}'] = _PARAGRAPH
+    for name in ('div', 'table', 'tr', 'ul', 'ol', 'dl', 'dt', 'dd', 'section', 'article', 'header', 'footer',
+                 'nav', 'main', 'aside', 'figure', 'figcaption', 'form', 'center', 'address', 'caption'):
+        table[name] = table[f'/{name}'] = _LINE
+    return {spelling: value for name, value in table.items() for spelling in _spellings(name)}
+
+
+# What each tag is replaced with; any other tag is dropped
+_TAGS = _tag_table()
+
+# Elements whose content is dropped, and the tags that can end each one
+_HIDDEN = {name: _spellings(f'/{name}') for name in ('script', 'style', 'title', 'template', 'noembed')}
+_HIDDEN['head'] = _spellings('/head', 'body')
+_PRE_OPEN = frozenset(_spellings('pre'))
+_PRE_CLOSE = frozenset(_spellings('/pre'))
+_LINK_CLOSE = frozenset(_spellings('/a'))
+_SCRIPT_NAMES = frozenset(_spellings('script'))
+# Opening tags that need more than a marker; links are found by their target
+_ELEMENTS = frozenset(_spellings(*_HIDDEN)) | _PRE_OPEN
+# Tags that open or close a hidden element, <pre> or a link
+_EVENTS = _ELEMENTS | _PRE_CLOSE | _LINK_CLOSE
+
+
+class _Entities(dict):
+    """Named entities by name; numeric ones are worked out when asked for."""
+
+    def __missing__(self, name: str) -> str:
+        return unescape(f'&{name}')
+
+
+_ENTITY_TEXT = _Entities(html5)
+
+# Text held back between chunks: a hidden element that has not been closed
+# yet, or a run of text with no tags. Past this, it is cut short.
+_MAX_PENDING = 65536
+
+
+def _drop_comments(region: str) -> tuple:
+    """Drop complete comments; return the rest and a comment left open."""
+    start = region.find('<!--')
+    if start == -1:
+        return region, ''
+    kept = []
+    position = 0
+    while start != -1:
+        kept.append(region[position:start])
+        end = region.find('-->', start + 4)
+        if end == -1:
+            return ''.join(kept), region[start:]
+        position = end + 3
+        start = region.find('<!--', position)
+    kept.append(region[position:])
+    return ''.join(kept), ''
+
+
+def _end(names: list, name: str, start: int):
+    """Index of the tag ending the hidden element opened at ``start``, or None."""
+    end = len(names)
+    for closer in _HIDDEN[name]:
+        # Once one spelling is found, only the short stretch before it is
+        # searched for the others
+        if end == len(names) or closer in names[start + 1:end]:
+            try:
+                end = names.index(closer, start + 1, end)
+            except ValueError:
+                pass
+    return end if end < len(names) else None
+
+
+def _plain_scripts(names: list) -> bool:
+    """Whether no script held a '<', so splitting them into tags was safe."""
+    for index in compress(count(), map(_SCRIPT_NAMES.__contains__, names)):
+        if names[index + 1:index + 2] != [f'/{names[index]}']:
+            return False
+    return True
+
+
+def _pre(text: str, fresh: bool) -> str:
+    """Keep the whitespace of text inside <pre> through collapsing."""
+    text = text.replace('\r\n', '\n').replace('\r', '\n')
+    if fresh and text.startswith('\n'):
+        # A newline right after <pre> is not part of the content
+        text = text[1:]
+    text = text.replace('&nbsp;', ' ').replace(' ', _PRE_SPACE)
+    return text.replace('\n', _PRE_NEWLINE).replace('\t', _PRE_TAB)
+
+
+class _Link:
+    """An open link: what its text has shown so far, in bounded memory."""
+
+    def __init__(self, href: str):
+        self.href = href
+        target = _unescape(href)
+        self.followed = target.lower().startswith(_LINK_SCHEMES)
+        if target.lower().startswith('mailto:'):
+            target, self.href = target[7:], href[7:]
+        self.target = target
+        # Whether the text shows the target, and the end of the text that
+        # could still begin it
+        self.shown = not target
+        self.tail = ''
+        self.visible = False
+
+    def add(self, text: str):
+        if not text or not self.followed:
+            return
+        text = _unescape(text)
+        if not self.visible and text.strip():
+            self.visible = True
+        if not self.shown:
+            window = self.tail + text
+            self.shown = self.target in window
+            self.tail = window[len(window) - len(self.target) + 1:]
+
+    def suffix(self) -> str:
+        """What follows the link's text: its target, unless the text already shows it."""
+        # Image-only links add nothing readable
+        if not self.followed or not self.visible or self.shown:
+            return ''
+        return f' ({self.href})'
+
+
+def _unescape(text: str) -> str:
+    """Decode entities, looking the usual named ones up by table."""
+    if '&' not in text:
+        return text
+    parts = _ENTITY.split(text)
+    parts[1::2] = map(_ENTITY_TEXT.__getitem__, parts[1::2])
+    return ''.join(parts)
+
+
+def _break_run(match: re.Match) -> str:
+    run = match.group(0)
+    return '\n\n' if _PARAGRAPH[1] in run or run.count(_BR[1]) > 1 else '\n'
+
+
+class HTMLToText:
+    """Incremental HTML-to-text converter.
+
+    Feed HTML in chunks of any size and collect the text as it becomes
+    final; memory stays bounded however large the document is.
+    Whitespace is collapsed outside ``<pre>``, block elements start new
+    lines, list items are bulleted, entities are decoded, link targets
+    follow their text in parentheses, and comments, script, style and
+    head content are dropped.
+    """
+
+    def __init__(self):
+        self._rest = ''
+        # Trailing whitespace and breaks, settled once more text follows
+        self._carry = ''
+        self._started = False
+        self._pre_open = self._pre_fresh = False
+        self._link = None
+
+    def feed(self, html: str) -> str:
+        """Convert another chunk; return the text completed so far."""
+        if any(marker in html for marker in _MARKERS):
+            html = html.translate(_STRIP_MARKERS)
+        data = self._rest + html if self._rest else html
+        # Convert up to the last complete tag; the text after it may end
+        # in a cut-off tag or entity
+        cut = data.rfind('>') + 1
+        tail = data[cut:]
+        if len(tail) > _MAX_PENDING and '<' not in tail:
+            split = max(tail.rfind(' '), tail.rfind('\n'))
+            if tail[split - 1:split + 1] == '\r\n':
+                split -= 1
+            cut += split if split > 0 else len(tail)
+        self._rest = data[cut:]
+        return self._convert(data[:cut], final=False)
+
+    def close(self) -> str:
+        """Finish the document; return the remaining text."""
+        data, self._rest = self._rest, ''
+        return self._convert(data, final=True)
+
+    def _elements(self, region: str, texts: list, names: list, hrefs: list, markers: list, final: bool):
+        """Resolve hidden elements, <pre> and links, in document order.
+
+        An open <pre> or link carries over to the next region as state,
+        so chunked and whole conversion agree. A hidden element left open
+        is held back until its end tag arrives.
+        """
+        events = list(compress(count(), map(_EVENTS.__contains__, names)))
+        if hrefs.count(None) != len(hrefs):
+            events += compress(count(), hrefs)
+            events.sort()
+        # Texts before this index are already in the open <pre> or link
+        done = 0
+        hidden_end = -1
+        for index in events:
+            if index <= hidden_end:
+                continue
+            if self._pre_open or self._link is not None:
+                self._take(texts, done, index + 1)
+            done = index + 1
+            name = names[index]
+            if hrefs[index]:
+                self._link = _Link(hrefs[index])
+            elif name in _LINK_CLOSE:
+                if self._link is not None:
+                    markers[index] = self._link.suffix()
+                    self._link = None
+            elif name in _PRE_OPEN:
+                if not self._pre_open:
+                    self._pre_open = self._pre_fresh = True
+            elif name in _PRE_CLOSE:
+                self._pre_open = False
+            else:
+                end = _end(names, name.lower(), index)
+                if end is None:
+                    if not final:
+                        offset = next(islice(_TAG.finditer(region), index, None)).start()
+                        pending = region[offset:]
+                        if len(pending) > _MAX_PENDING:
+                            # Only the opening tag and a possible end tag still matter
+                            pending = pending[:pending.find('>') + 1] + pending[-64:]
+                        self._rest = pending + self._rest
+                    # Content that never ends is hidden to the end
+                    del texts[index + 1:], markers[index:]
+                    return
+                texts[index + 1:end + 1] = [''] * (end - index)
+                markers[index:end + 1] = [''] * (end - index + 1)
+                hidden_end = end
+                done = end + 1
+        if self._pre_open or self._link is not None:
+            self._take(texts, done, len(texts))
+
+    def _take(self, texts: list, start: int, end: int):
+        """Add ``texts[start:end]`` to the open link and <pre>."""
+        if self._link is not None:
+            self._link.add(''.join(texts[start:end]))
+        if self._pre_open:
+            for index in range(start, end):
+                if texts[index]:
+                    texts[index] = _pre(texts[index], self._pre_fresh)
+                    self._pre_fresh = False
+
+    def _convert(self, region: str, final: bool) -> str:
+        if not region:
+            # Breaks still carried would only trail the text
+            if final:
+                self._carry = ''
+            return ''
+
+        region, pending = _drop_comments(region)
+        if pending and not final:
+            # A comment left open is dropped in full once it is complete
+            self._rest = (pending if len(pending) <= _MAX_PENDING else '<!--' + pending[-64:]) + self._rest
+
+        # Swap every tag for its marker in one pass over the names, after
+        # dealing with the few elements that need more than that
+        parts = _TAG.split(region)
+        if not _SCRIPT_NAMES.isdisjoint(parts[2::3]) and not _plain_scripts(parts[2::3]):
+            # Drop scripts before telling their content from tags
+            region = _SCRIPT.sub('', region)
+            parts = _TAG.split(region)
+        texts = parts[0::3]
+        hrefs = parts[1::3]
+        names = parts[2::3]
+        markers = list(map(_TAGS.get, names, repeat('')))
+        if (self._pre_open or self._link is not None or not _ELEMENTS.isdisjoint(names)
+                or hrefs.count(None) != len(hrefs)):
+            self._elements(region, texts, names, hrefs, markers, final)
+        parts = [''] * (len(texts) + len(markers))
+        parts[0::2] = texts
+        parts[1::2] = markers
+        region = ''.join(parts)
+        # Entities are decoded last, on the short text: they hold no
+        # whitespace or markers, and the characters they decode to tend to
+        # make every pass over a string slower
+        entities = '&' in region
+        if entities:
+            region = region.replace('&nbsp;', ' ')
+
+        # Collapse whitespace, keeping a single space at either end
+        text = ' '.join(region.split())
+        if region[:1].isspace() and not self._carry:
+            text = ' ' + text
+        if region[-1:].isspace() and text.strip():
+            text += ' '
+        text = self._carry + text
+        if not self._started:
+            text = text.lstrip(_BREAKS)
+        settled = text.rstrip(_BREAKS)
+        carry = text[len(settled):]
+        # Only what a run of breaks resolves to matters, so keep it short
+        if final or not carry:
+            self._carry = ''
+        elif _LINE not in carry:
+            self._carry = ' '
+        else:
+            run = _PARAGRAPH if _PARAGRAPH[1] in carry else _LINE
+            self._carry = run + _BR * min(2, carry.count(_BR[1])) + ' '
+        if not settled:
+            return ''
+
+        self._started = True
+        text = _BREAK_RUN.sub(_break_run, settled).replace(' \n', '\n')
+        if entities:
+            text = _unescape(text)
+        if _PRE_SPACE in text or _PRE_NEWLINE in text or _PRE_TAB in text:
+            text = text.translate(_PRE_RESTORE)
+        return text
+
+
+def iter_html_text(chunks: Iterable[str]) -> Iterator[str]:
+    """Convert a stream of HTML chunks, yielding text as it is completed."""
+    converter = HTMLToText()
+    for chunk in chunks:
+        text = converter.feed(chunk)
+        if text:
+            yield text
+    text = converter.close()
+    if text:
+        yield text
+
+
+def html_to_text(html: str) -> str:
+    """Convert a whole HTML document to plain text."""
+    converter = HTMLToText()
+    return converter.feed(html) + converter.close()
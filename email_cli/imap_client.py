@@ -2,29 +2,268 @@
 
 import imaplib
 import email
+import re
 from email.header import decode_header
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Set, Tuple, Union
 import json
 
+from .metrics import NO_TIMINGS, Timings, start_timings
+from .htmltext import html_to_text
+
+
+# Headers needed for summaries; fetched with BODY.PEEK so \Seen is untouched
+SUMMARY_HEADERS = 'FROM TO SUBJECT DATE MESSAGE-ID'
+
+_FETCH_START_RE = re.compile(rb'^\d+ \(')
+_UID_RE = re.compile(rb'\bUID (\d+)')
+_FLAGS_RE = re.compile(rb'\bFLAGS \(([^)]*)\)')
+_SIZE_RE = re.compile(rb'\bRFC822\.SIZE (\d+)')
+_INTERNALDATE_RE = re.compile(rb'\bINTERNALDATE "([^"]+)"')
+_STATUS_RE = re.compile(r'(MESSAGES|RECENT|UIDNEXT|UIDVALIDITY|UNSEEN) (\d+)')
+_THREAD_TOKEN_RE = re.compile(rb'\(|\)|\d+')
+_LIST_RE = re.compile(r'^\((?P<flags>[^)]*)\) (?P<delimiter>"(?:[^"\\]|\\.)*"|NIL) (?P<name>.+)$')
+
+# Common Sent folder names for servers without SPECIAL-USE
+SENT_FOLDER_NAMES = ('Sent', 'Sent Items', 'Sent Messages', 'Sent Mail', 'INBOX.Sent', '[Gmail]/Sent Mail')
+
+
+def quote_folder(folder: str) -> str:
+    """Quote a folder name for use as an IMAP astring."""
+    if folder.startswith('"') or not re.search(r'[\s"(){}%*\\]', folder):
+        return folder
+    return '"' + folder.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def uid_set(uids: List[int]) -> str:
+    """Compress UIDs into an IMAP sequence set like ``1:5,9,12:14``."""
+    uids = sorted(uids)
+    ranges = []
+    start = prev = uids[0]
+    for uid in uids[1:]:
+        if uid != prev + 1:
+            ranges.append(f'{start}:{prev}' if prev != start else str(start))
+            start = uid
+        prev = uid
+    ranges.append(f'{start}:{prev}' if prev != start else str(start))
+    return ','.join(ranges)
+
+
+def parse_list_response(line: bytes) -> Optional[Dict[str, Any]]:
+    """Parse one LIST response line into flags, delimiter and folder name."""
+    match = _LIST_RE.match(line.decode('utf-8', errors='replace'))
+    if not match:
+        return None
+    name = match.group('name')
+    if name.startswith('"'):
+        name = name[1:-1].replace('\\"', '"').replace('\\\\', '\\')
+    delimiter = match.group('delimiter')
+    return {
+        'flags': match.group('flags').split(),
+        'delimiter': None if delimiter == 'NIL' else delimiter[1:-1],
+        'name': name
+    }
+
+
+def parse_thread_response(data: List[Any]) -> List[List[Tuple[int, int, Optional[int]]]]:
+    """Parse a THREAD response into threads of ``(uid, depth, parent_uid)``.
+
+    In ``(3 6 (4 23)(44 7 96))`` each number is the child of the one before
+    it, and the parenthesized lists at the end are sibling branches.
+    """
+    threads = []
+    for line in data:
+        if not line:
+            continue
+        # Nested lists of ints, one per top-level thread
+        stack: List[list] = [[]]
+        for token in _THREAD_TOKEN_RE.findall(line):
+            if token == b'(':
+                stack.append([])
+            elif token == b')':
+                branch = stack.pop()
+                stack[-1].append(branch)
+            else:
+                stack[-1].append(int(token))
+
+        for tree in stack[0]:
+            members: List[Tuple[int, int, Optional[int]]] = []
+
+            def walk(items: list, depth: int, parent: Optional[int]):
+                for item in items:
+                    if isinstance(item, list):
+                        walk(item, depth, parent)
+                    else:
+                        members.append((item, depth, parent))
+                        parent, depth = item, depth + 1
+
+            walk(tree, 0, None)
+            threads.append(members)
+    return threads
+
+
+def parse_fetch_response(data: List[Any]) -> List[Dict[str, Any]]:
+    """Parse imaplib FETCH response data into per-message items.
+
+    imaplib returns a literal as a ``(meta, bytes)`` tuple and any attributes
+    after the literal as a separate bytes item, so those are stitched back
+    onto the preceding message before extracting UID, FLAGS, size and
+    INTERNALDATE.
+    """
+    pieces = []
+    for part in data:
+        if isinstance(part, tuple):
+            pieces.append([part[0], part[1]])
+        elif part and pieces and not _FETCH_START_RE.match(part):
+            pieces[-1][0] += part
+        elif part:
+            pieces.append([part, None])
+
+    items = []
+    for meta, literal in pieces:
+        uid = _UID_RE.search(meta)
+        flags = _FLAGS_RE.search(meta)
+        size = _SIZE_RE.search(meta)
+        internaldate = _INTERNALDATE_RE.search(meta)
+        items.append({
+            'uid': int(uid.group(1)) if uid else None,
+            'flags': flags.group(1).decode().split() if flags else [],
+            'size': int(size.group(1)) if size else None,
+            'internaldate': internaldate.group(1).decode() if internaldate else None,
+            'literal': literal
+        })
+    return items
+
+
+def decode_header_value(header: Optional[str]) -> str:
+    """Decode an RFC 2047 encoded header into text."""
+    if not header:
+        return ''
+
+    decoded = []
+    for part, encoding in decode_header(header):
+        if isinstance(part, bytes):
+            try:
+                decoded.append(part.decode(encoding or 'utf-8', errors='ignore'))
+            except:
+                decoded.append(part.decode('utf-8', errors='ignore'))
+        else:
+            decoded.append(part)
+
+    return ''.join(decoded)
+
+
+def parse_email(email_id: str, raw_email: bytes) -> Dict[str, Any]:
+    """Parse a raw RFC 822 message into an email dict."""
+    email_message = email.message_from_bytes(raw_email)
+
+    # Extract email data
+    email_data = {
+        'id': email_id,
+        'from': decode_header_value(email_message['From']),
+        'to': decode_header_value(email_message['To']),
+        'subject': decode_header_value(email_message['Subject']),
+        'date': email_message['Date'],
+        'body': '',
+        'attachments': []
+    }
+
+    # Extract body and attachments
+    if email_message.is_multipart():
+        for part in email_message.walk():
+            content_type = part.get_content_type()
+            content_disposition = str(part.get("Content-Disposition"))
+
+            if "attachment" in content_disposition:
+                # It's an attachment
+                filename = part.get_filename()
+                if filename:
+                    email_data['attachments'].append(decode_header_value(filename))
+            elif content_type == "text/plain":
+                # Plain text body
+                try:
+                    body = part.get_payload(decode=True)
+                    email_data['body'] = body.decode('utf-8', errors='ignore')
+                except:
+                    pass
+            elif content_type == "text/html":
+                # HTML body (if no plain text found)
+                if not email_data['body']:
+                    try:
+                        body = part.get_payload(decode=True)
+                        email_data['body'] = html_to_text(body.decode('utf-8', errors='ignore'))
+                    except:
+                        pass
+    else:
+        # Single part message
+        try:
+            body = email_message.get_payload(decode=True)
+            email_data['body'] = body.decode('utf-8', errors='ignore')
+        except:
+            pass
+
+    return email_data
+
+
+class _Instrumented:
+    """Mixin counting IMAP commands and bytes on the wire."""
+
+    def __init__(self, timings: Timings, *args, **kwargs):
+        self.timings = timings
+        super().__init__(*args, **kwargs)
+
+    def _command(self, name, *args):
+        self.timings.count('round_trips')
+        return super()._command(name, *args)
+
+    def send(self, data):
+        self.timings.count('bytes_sent', len(data))
+        super().send(data)
+
+    def read(self, size):
+        data = super().read(size)
+        self.timings.count('bytes_received', len(data))
+        return data
+
+    def readline(self):
+        line = super().readline()
+        self.timings.count('bytes_received', len(line))
+        return line
+
+
+class _InstrumentedIMAP4(_Instrumented, imaplib.IMAP4):
+    pass
+
+
+class _InstrumentedIMAP4_SSL(_Instrumented, imaplib.IMAP4_SSL):
+    pass
+
 
 class IMAPClient:
     """IMAP client for managing emails."""
 
-    def __init__(self, account: Dict[str, Any]):
+    def __init__(self, account: Dict[str, Any], timings: bool = False):
         self.host = account['imap_host']
         self.port = account['imap_port']
         self.username = account['username']
         self.password = account['password']
         self.use_ssl = account.get('use_ssl', True)
+        # Add a per-phase breakdown to each result
+        self.timings = timings
 
-    def connect(self):
+    def connect(self, timings: Timings = NO_TIMINGS):
         """Connect to IMAP server."""
-        if self.use_ssl:
-            server = imaplib.IMAP4_SSL(self.host, self.port)
-        else:
-            server = imaplib.IMAP4(self.host, self.port)
+        # With implicit TLS the handshake is part of the connect phase
+        with timings.phase('connect'):
+            if timings.enabled:
+                cls = _InstrumentedIMAP4_SSL if self.use_ssl else _InstrumentedIMAP4
+                server = cls(timings, self.host, self.port)
+            elif self.use_ssl:
+                server = imaplib.IMAP4_SSL(self.host, self.port)
+            else:
+                server = imaplib.IMAP4(self.host, self.port)
 
-        server.login(self.username, self.password)
+        with timings.phase('login'):
+            server.login(self.username, self.password)
         return server
 
     def list_emails(
@@ -34,6 +273,7 @@ class IMAPClient:
         unread_only: bool = False
     ) -> Dict[str, Any]:
         """List emails in folder."""
+        t = start_timings('list_emails', self.timings)
         result = {
             'folder': folder,
             'total': 0,
@@ -41,18 +281,20 @@ class IMAPClient:
         }
 
         try:
-            with self.connect() as server:
-                server.select(folder)
+            with self.connect(t) as server:
+                with t.phase('select'):
+                    server.select(folder)
 
                 # Build search criteria
                 criteria = 'UNSEEN' if unread_only else 'ALL'
 
                 # Search for emails
-                status, messages = server.search(None, criteria)
+                with t.phase('search'):
+                    status, messages = server.search(None, criteria)
 
                 if status != 'OK':
                     result['error'] = f"Search failed: {status}"
-                    return result
+                    return t.finish(result)
 
                 # Get message IDs
                 email_ids = messages[0].split()
@@ -60,16 +302,283 @@ class IMAPClient:
 
                 # Fetch limited emails
                 for idx, email_id in enumerate(email_ids[-limit:]):
-                    email_data = self._fetch_email(server, email_id)
+                    email_data = self._fetch_email(server, email_id, t)
                     result['emails'].append(email_data)
 
         except Exception as e:
             result['error'] = str(e)
 
-        return result
+        return t.finish(result)
+
+    def folder_status(self, server: imaplib.IMAP4, folder: str) -> Dict[str, int]:
+        """Get STATUS counters for a folder without selecting it."""
+        status, data = server.status(
+            quote_folder(folder), '(MESSAGES UIDNEXT UIDVALIDITY UNSEEN)'
+        )
+        if status != 'OK':
+            raise imaplib.IMAP4.error(f"STATUS failed: {status}")
+
+        text = data[0].decode(errors='ignore')
+        return {key.lower(): int(value) for key, value in _STATUS_RE.findall(text)}
+
+    def check_new(
+        self,
+        folder: str = 'INBOX',
+        last_uid: Optional[int] = None,
+        uidvalidity: Optional[int] = None,
+        limit: int = 10
+    ) -> Dict[str, Any]:
+        """Check for mail that arrived after a UID high-water mark.
+
+        Uses STATUS first, so a tick with nothing new costs a single round
+        trip after LOGIN. Only when UIDNEXT moved is the folder EXAMINEd and
+        the new UID range fetched, headers only. Without a usable mark (first
+        run or UIDVALIDITY changed) the current UIDNEXT becomes the baseline
+        and nothing is reported.
+        """
+        t = start_timings('check_new', self.timings)
+        result = {
+            'folder': folder,
+            'uidvalidity': uidvalidity,
+            'last_uid': last_uid,
+            'unseen': 0,
+            'total': 0,
+            'emails': [],
+            'baseline': False,
+            'error': None
+        }
+
+        try:
+            with self.connect(t) as server:
+                with t.phase('status'):
+                    status = self.folder_status(server, folder)
+                uidnext = status.get('uidnext', 1)
+                result['unseen'] = status.get('unseen', 0)
+
+                if last_uid is None or status.get('uidvalidity') != uidvalidity:
+                    result['uidvalidity'] = status.get('uidvalidity')
+                    result['last_uid'] = uidnext - 1
+                    result['baseline'] = True
+                    return t.finish(result)
+
+                if uidnext - 1 <= last_uid:
+                    # The watermark answered the tick without a fetch
+                    t.count('cache_hits')
+                    return t.finish(result)
+
+                with t.phase('select'):
+                    server.select(quote_folder(folder), readonly=True)
+                with t.phase('fetch'):
+                    status, data = server.uid(
+                        'FETCH', f'{last_uid + 1}:*',
+                        f'(UID FLAGS RFC822.SIZE BODY.PEEK[HEADER.FIELDS ({SUMMARY_HEADERS})])'
+                    )
+                if status != 'OK':
+                    result['error'] = f"Fetch failed: {status}"
+                    return t.finish(result)
+
+                with t.phase('parse'):
+                    # "n:*" always matches the highest UID, even when it is below n
+                    new = [
+                        item for item in parse_fetch_response(data)
+                        if item['uid'] is not None and item['uid'] > last_uid
+                    ]
+                    if not new:
+                        return t.finish(result)
+
+                    result['last_uid'] = max(item['uid'] for item in new)
+                    unread = [item for item in new if '\\Seen' not in item['flags']]
+                    result['total'] = len(unread)
+                    for item in unread[-limit:]:
+                        result['emails'].append(self._summarize_headers(item))
+
+        except Exception as e:
+            result['error'] = str(e)
+
+        return t.finish(result)
+
+    def uid_search(self, server: imaplib.IMAP4, criteria: str) -> List[int]:
+        """Run UID SEARCH on the selected folder."""
+        status, data = server.uid('SEARCH', criteria)
+        if status != 'OK':
+            raise imaplib.IMAP4.error(f"Search failed: {status}")
+        return [int(uid) for uid in (data[0] or b'').split()]
+
+    def uid_fetch_raw(self, server: imaplib.IMAP4, uids: List[int], batch_size: int = 50):
+        """Yield ``(uid, raw_bytes)`` for UIDs, fetching in batches.
+
+        Uses BODY.PEEK[] so fetching does not mark messages as read.
+        """
+        for start in range(0, len(uids), batch_size):
+            batch = uids[start:start + batch_size]
+            status, data = server.uid('FETCH', ','.join(str(uid) for uid in batch), '(UID BODY.PEEK[])')
+            if status != 'OK':
+                raise imaplib.IMAP4.error(f"Fetch failed: {status}")
+            for item in parse_fetch_response(data):
+                if item['uid'] is not None and item['literal'] is not None:
+                    yield item['uid'], item['literal']
+
+    def store_flags(self, server: imaplib.IMAP4, uids: List[int], flags: str, mode: str = '+FLAGS.SILENT',
+                    batch_size: int = 1000):
+        """UID STORE flags on many messages, a batch of UIDs per command."""
+        for start in range(0, len(uids), batch_size):
+            status, data = server.uid('STORE', uid_set(uids[start:start + batch_size]), mode, flags)
+            if status != 'OK':
+                raise imaplib.IMAP4.error(f"STORE failed: {data}")
+
+    def expunge_uids(self, server: imaplib.IMAP4, uids: List[int], capabilities: Optional[Set[str]] = None):
+        """Expunge \\Deleted messages, only the given UIDs when UIDPLUS allows."""
+        capabilities = capabilities if capabilities is not None else self.server_capabilities(server)
+        if 'UIDPLUS' in capabilities:
+            for start in range(0, len(uids), 1000):
+                status, data = server.uid('EXPUNGE', uid_set(uids[start:start + 1000]))
+                if status != 'OK':
+                    raise imaplib.IMAP4.error(f"EXPUNGE failed: {data}")
+        else:
+            server.expunge()
+
+    def copy_messages(self, server: imaplib.IMAP4, uids: List[int], folder: str, batch_size: int = 1000):
+        """UID COPY messages to a folder, a batch of UIDs per command."""
+        for start in range(0, len(uids), batch_size):
+            status, data = server.uid('COPY', uid_set(uids[start:start + batch_size]), quote_folder(folder))
+            if status != 'OK':
+                raise imaplib.IMAP4.error(f"COPY to {folder} failed: {data}")
+
+    def move_messages(
+        self,
+        server: imaplib.IMAP4,
+        uids: List[int],
+        folder: str,
+        capabilities: Optional[Set[str]] = None,
+        batch_size: int = 1000
+    ):
+        """Move messages to a folder with UID MOVE (RFC 6851).
+
+        Servers without MOVE get UID COPY, then \\Deleted and an expunge.
+        """
+        capabilities = capabilities if capabilities is not None else self.server_capabilities(server)
+        if 'MOVE' not in capabilities:
+            self.copy_messages(server, uids, folder, batch_size)
+            self.store_flags(server, uids, '(\\Deleted)', batch_size=batch_size)
+            self.expunge_uids(server, uids, capabilities)
+            return
+        for start in range(0, len(uids), batch_size):
+            status, data = server.uid('MOVE', uid_set(uids[start:start + batch_size]), quote_folder(folder))
+            if status != 'OK':
+                raise imaplib.IMAP4.error(f"MOVE to {folder} failed: {data}")
+
+    def uid_thread(self, server: imaplib.IMAP4, criteria: str = 'ALL',
+                   algorithm: str = 'REFERENCES') -> List[List[Tuple[int, int, Optional[int]]]]:
+        """Have the server thread the selected folder (RFC 5256 UID THREAD)."""
+        status, data = server.uid('THREAD', algorithm, 'UTF-8', criteria)
+        if status != 'OK':
+            raise imaplib.IMAP4.error(f"THREAD failed: {data}")
+        return parse_thread_response(data)
+
+    def server_capabilities(self, server: imaplib.IMAP4) -> Set[str]:
+        """Capabilities, including any the server announced at LOGIN."""
+        capabilities = set(server.capabilities)
+        # Servers often send the post-login list as a [CAPABILITY ...] response code
+        announced = server.untagged_responses.get('CAPABILITY')
+        if announced:
+            capabilities.update(announced[-1].decode(errors='ignore').upper().split())
+        return capabilities
+
+    def find_special_folder(
+        self,
+        server: imaplib.IMAP4,
+        use: str = '\\Sent',
+        names: tuple = SENT_FOLDER_NAMES
+    ) -> Optional[str]:
+        """Find a folder by SPECIAL-USE flag (RFC 6154), falling back to common names."""
+        status, data = server.list()
+        if status != 'OK':
+            raise imaplib.IMAP4.error(f"LIST failed: {status}")
+
+        folders = [item for item in (parse_list_response(line) for line in data if isinstance(line, bytes)) if item]
+        for folder in folders:
+            if use.lower() in (flag.lower() for flag in folder['flags']):
+                return folder['name']
+
+        by_name = {folder['name'].lower(): folder['name'] for folder in folders}
+        for name in names:
+            if name.lower() in by_name:
+                return by_name[name.lower()]
+        return None
+
+    def append_messages(
+        self,
+        server: imaplib.IMAP4,
+        folder: str,
+        messages: List[Union[bytes, Tuple[bytes, Optional[str], Optional[float]]]],
+        flags: str = '(\\Seen)'
+    ) -> int:
+        """APPEND a batch of raw messages to a folder in as few round trips as possible.
+
+        Each message is raw bytes, or ``(data, flags, internaldate)`` to set
+        its own flags and INTERNALDATE (a timestamp). With LITERAL+ the
+        literals are sent without waiting for continuations: as one
+        MULTIAPPEND command (RFC 3502) when supported, otherwise as pipelined
+        APPENDs whose replies are collected afterwards. Servers with neither
+        get one APPEND at a time over the same connection.
+        """
+        if not messages:
+            return 0
+
+        mailbox = quote_folder(folder)
+        entries = []
+        for message in messages:
+            data, own_flags, date = (message, None, None) if isinstance(message, bytes) else message
+            date = imaplib.Time2Internaldate(date) if date is not None else None
+            entries.append((imaplib.MapCRLF.sub(imaplib.CRLF, data), own_flags or flags, date))
+        capabilities = self.server_capabilities(server)
+
+        if 'LITERAL+' not in capabilities or len(entries) == 1:
+            for data, own_flags, date in entries:
+                status, response = server.append(mailbox, own_flags, date, data)
+                if status != 'OK':
+                    raise imaplib.IMAP4.error(f"APPEND failed: {response}")
+            return len(entries)
+
+        def literal(entry) -> bytes:
+            data, own_flags, date = entry
+            return f' {own_flags}{" " + date if date else ""} {{{len(data)}+}}\r\n'.encode() + data
+
+        if 'MULTIAPPEND' in capabilities:
+            tags = [server._new_tag()]
+            payload = tags[0] + f' APPEND {mailbox}'.encode() + b''.join(literal(entry) for entry in entries) + b'\r\n'
+        else:
+            tags = [server._new_tag() for _ in entries]
+            payload = b''.join(
+                tag + f' APPEND {mailbox}'.encode() + literal(entry) + b'\r\n'
+                for tag, entry in zip(tags, entries)
+            )
+        server.send(payload)
+
+        for tag in tags:
+            status, response = server._command_complete('APPEND', tag)
+            if status != 'OK':
+                raise imaplib.IMAP4.error(f"APPEND failed: {response}")
+        return len(entries)
+
+    def _summarize_headers(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        """Build an email summary from a header-only FETCH item."""
+        headers = email.message_from_bytes(item['literal'] or b'')
+        return {
+            'id': str(item['uid']),
+            'uid': item['uid'],
+            'from': self._decode_header(headers['From']),
+            'to': self._decode_header(headers['To']),
+            'subject': self._decode_header(headers['Subject']),
+            'date': headers['Date'],
+            'message_id': headers['Message-ID'],
+            'size': item['size'],
+            'flags': item['flags']
+        }
 
     def read_email(self, folder: str, email_id: str) -> Dict[str, Any]:
         """Read a specific email."""
+        t = start_timings('read_email', self.timings)
         result = {
             'folder': folder,
             'email_id': email_id,
@@ -78,16 +587,17 @@ class IMAPClient:
         }
 
         try:
-            with self.connect() as server:
-                server.select(folder)
-                email_data = self._fetch_email(server, email_id)
+            with self.connect(t) as server:
+                with t.phase('select'):
+                    server.select(folder)
+                email_data = self._fetch_email(server, email_id, t)
                 result['email'] = email_data
                 result['success'] = True
 
         except Exception as e:
             result['error'] = str(e)
 
-        return result
+        return t.finish(result)
 
     def search_emails(
         self,
@@ -96,6 +606,7 @@ class IMAPClient:
         limit: int = 10
     ) -> Dict[str, Any]:
         """Search emails with IMAP query."""
+        t = start_timings('search_emails', self.timings)
         result = {
             'folder': folder,
             'query': query,
@@ -104,28 +615,30 @@ class IMAPClient:
         }
 
         try:
-            with self.connect() as server:
-                server.select(folder)
+            with self.connect(t) as server:
+                with t.phase('select'):
+                    server.select(folder)
 
                 # Search with query
-                status, messages = server.search(None, query)
+                with t.phase('search'):
+                    status, messages = server.search(None, query)
 
                 if status != 'OK':
                     result['error'] = f"Search failed: {status}"
-                    return result
+                    return t.finish(result)
 
                 email_ids = messages[0].split()
                 result['total'] = len(email_ids)
 
                 # Fetch limited emails
                 for idx, email_id in enumerate(email_ids[-limit:]):
-                    email_data = self._fetch_email(server, email_id)
+                    email_data = self._fetch_email(server, email_id, t)
                     result['emails'].append(email_data)
 
         except Exception as e:
             result['error'] = str(e)
 
-        return result
+        return t.finish(result)
 
     def delete_email(self, folder: str, email_id: str) -> Dict[str, Any]:
         """Delete an email."""
@@ -196,10 +709,16 @@ class IMAPClient:
 
         return result
 
-    def _fetch_email(self, server: imaplib.IMAP4, email_id: str) -> Dict[str, Any]:
+    def _fetch_email(
+        self,
+        server: imaplib.IMAP4,
+        email_id: str,
+        timings: Timings = NO_TIMINGS
+    ) -> Dict[str, Any]:
         """Fetch and parse an email."""
         # Fetch email
-        status, msg_data = server.fetch(email_id, '(RFC822)')
+        with timings.phase('fetch'):
+            status, msg_data = server.fetch(email_id, '(RFC822)')
 
         if status != 'OK':
             return {
@@ -207,72 +726,13 @@ class IMAPClient:
                 'error': f"Fetch failed: {status}"
             }
 
-        # Parse email
-        raw_email = msg_data[0][1]
-        email_message = email.message_from_bytes(raw_email)
-
-        # Extract email data
-        email_data = {
-            'id': email_id,
-            'from': self._decode_header(email_message['From']),
-            'to': self._decode_header(email_message['To']),
-            'subject': self._decode_header(email_message['Subject']),
-            'date': email_message['Date'],
-            'body': '',
-            'attachments': []
-        }
-
-        # Extract body and attachments
-        if email_message.is_multipart():
-            for part in email_message.walk():
-                content_type = part.get_content_type()
-                content_disposition = str(part.get("Content-Disposition"))
-
-                if "attachment" in content_disposition:
-                    # It's an attachment
-                    filename = part.get_filename()
-                    if filename:
-                        email_data['attachments'].append(self._decode_header(filename))
-                elif content_type == "text/plain":
-                    # Plain text body
-                    try:
-                        body = part.get_payload(decode=True)
-                        email_data['body'] = body.decode('utf-8', errors='ignore')
-                    except:
-                        pass
-                elif content_type == "text/html":
-                    # HTML body (if no plain text found)
-                    if not email_data['body']:
-                        try:
-                            body = part.get_payload(decode=True)
-                            import re
-                            text = re.sub('<[^<]+?>', '', body.decode('utf-8', errors='ignore'))
-                            email_data['body'] = text.strip()
-                        except:
-                            pass
-        else:
-            # Single part message
-            try:
-                body = email_message.get_payload(decode=True)
-                email_data['body'] = body.decode('utf-8', errors='ignore')
-            except:
-                pass
+        with timings.phase('parse'):
+            return self._parse_email(email_id, msg_data[0][1])
 
-        return email_data
+    def _parse_email(self, email_id: str, raw_email: bytes) -> Dict[str, Any]:
+        """Parse a raw RFC 822 message into an email dict."""
+        return parse_email(email_id, raw_email)
 
     def _decode_header(self, header: Optional[str]) -> str:
         """Decode email header."""
-        if not header:
-            return ''
-
-        decoded = []
-        for part, encoding in decode_header(header):
-            if isinstance(part, bytes):
-                try:
-                    decoded.append(part.decode(encoding or 'utf-8', errors='ignore'))
-                except:
-                    decoded.append(part.decode('utf-8', errors='ignore'))
-            else:
-                decoded.append(part)
-
-        return ''.join(decoded)
+        return decode_header_value(header)
@@ -0,0 +1,286 @@
+"""Folder ingest: fetch, parse across processes, and deliver in order."""
+
+import os
+import mmap
+import time
+import queue
+import imaplib
+import tempfile
+import threading
+import concurrent.futures
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+from .imap_client import IMAPClient, parse_email, parse_fetch_response, quote_folder, uid_set
+
+Progress = Callable[[Dict[str, Any]], None]
+Sink = Callable[[Dict[str, Any]], None]
+
+# Fetched batches are spooled here for the parsers to map; memory-backed
+# where the system has one, so they never reach a disk
+SPOOL_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+# (uid, flags, internaldate, start, end) of one message in a spool file
+Entry = Tuple[int, List[str], Optional[str], int, int]
+
+
+def _parse_batch(path: str, entries: List[Entry]) -> List[Dict[str, Any]]:
+    """Parse the messages of one spool file; runs in a worker process.
+
+    The file is mapped rather than read, so each message is copied once,
+    from the shared pages straight into the parser.
+    """
+    messages = []
+    with open(path, 'rb') as f:
+        view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b''
+        try:
+            for uid, flags, internaldate, start, end in entries:
+                message = {'uid': uid, 'flags': flags, 'internaldate': internaldate, 'size': end - start}
+                try:
+                    message.update(parse_email(str(uid), view[start:end]))
+                except Exception as e:
+                    message['error'] = str(e)
+                messages.append(message)
+        finally:
+            if isinstance(view, mmap.mmap):
+                view.close()
+    return messages
+
+
+def _remove(path: str):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+class Ingester:
+    """Fetch and parse a whole folder, scaling the parsing with cores.
+
+    Work runs in three stages. Connection threads fetch batches of
+    messages with BODY.PEEK[] (read flags are untouched) and spool each
+    batch's raw bytes to a file in ``spool_dir``. A process pool parses
+    the batches, mapping the file instead of having the bytes pickled
+    across. Parsed messages reach the sink in UID order, on the calling
+    thread.
+
+    At most ``window`` batches are between fetched and delivered at once.
+    Fetching waits for the sink when it gets that far ahead, so memory
+    stays around ``window * batch_bytes`` however large the folder is.
+    """
+
+    def __init__(
+        self,
+        client: IMAPClient,
+        connections: int = 2,
+        workers: Optional[int] = None,
+        batch_size: int = 200,
+        batch_bytes: int = 4 * 1024 * 1024,
+        window: Optional[int] = None,
+        spool_dir: Optional[str] = SPOOL_DIR,
+        progress: Optional[Progress] = None
+    ):
+        self.client = client
+        self.connections = max(1, connections)
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.batch_size = batch_size
+        self.batch_bytes = batch_bytes
+        # Enough batches to keep every connection and worker busy
+        self.window = max(1, window or self.workers * 2 + self.connections)
+        self.spool_dir = spool_dir
+        self.progress = progress
+
+    def _examine(self, server: imaplib.IMAP4, folder: str) -> Tuple[int, int]:
+        """EXAMINE a folder; returns (message count, UIDVALIDITY)."""
+        status, data = server.select(quote_folder(folder), readonly=True)
+        if status != 'OK':
+            raise imaplib.IMAP4.error(f"Cannot open folder {folder}: {data}")
+        uidvalidity = server.untagged_responses.get('UIDVALIDITY', [b'0'])[-1]
+        return int(data[0] or 0), int(uidvalidity)
+
+    def _plan(self, server: imaplib.IMAP4, count: int, since_uid: int) -> Tuple[List[List[int]], int, int]:
+        """Split the UIDs above ``since_uid`` into batches."""
+        if not count:
+            return [], 0, 0
+        status, data = server.uid('FETCH', f'{since_uid + 1}:*', '(UID RFC822.SIZE)')
+        if status != 'OK':
+            raise imaplib.IMAP4.error(f"Fetch failed: {status}")
+
+        # "n:*" always matches the last message, even below n
+        sizes = sorted((item['uid'], item['size'] or 0) for item in parse_fetch_response(data)
+                       if item['uid'] and item['uid'] > since_uid)
+        batches, batch, batch_bytes = [], [], 0
+        for uid, size in sizes:
+            if batch and (len(batch) >= self.batch_size or batch_bytes + size > self.batch_bytes):
+                batches.append(batch)
+                batch, batch_bytes = [], 0
+            batch.append(uid)
+            batch_bytes += size
+        if batch:
+            batches.append(batch)
+        return batches, len(sizes), sum(size for _, size in sizes)
+
+    def _fetch(self, server: imaplib.IMAP4, batch: List[int]) -> Tuple[str, List[Entry]]:
+        """Fetch a batch and spool its messages, in UID order, to one file."""
+        status, data = server.uid('FETCH', uid_set(batch), '(UID FLAGS INTERNALDATE BODY.PEEK[])')
+        if status != 'OK':
+            raise imaplib.IMAP4.error(f"Fetch failed: {status}")
+        items = sorted((item for item in parse_fetch_response(data) if item['uid'] and item['literal'] is not None),
+                       key=lambda item: item['uid'])
+
+        fd, path = tempfile.mkstemp(prefix='email-cli-ingest-', dir=self.spool_dir)
+        entries = []
+        offset = 0
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for item in items:
+                    f.write(item['literal'])
+                    entries.append((item['uid'], item['flags'], item['internaldate'],
+                                    offset, offset + len(item['literal'])))
+                    offset += len(item['literal'])
+        except BaseException:
+            _remove(path)
+            raise
+        return path, entries
+
+    def ingest(self, folder: str, sink: Sink, since_uid: int = 0) -> Dict[str, Any]:
+        """Deliver every message above ``since_uid`` to ``sink``, parsed and in UID order.
+
+        Each message is the dict ``read`` returns plus its ``uid``,
+        ``flags``, ``internaldate`` and ``size``. Messages that fail to
+        parse are listed in ``errors`` and skipped. ``last_uid`` and
+        ``uidvalidity`` tell the next run where to continue.
+        """
+        result = {
+            'folder': folder,
+            'messages': 0,
+            'bytes': 0,
+            'failed': 0,
+            'errors': [],
+            'uidvalidity': None,
+            'last_uid': since_uid,
+            'workers': self.workers,
+            'connections': self.connections,
+            'error': None
+        }
+        start = time.perf_counter()
+        pool = None
+
+        try:
+            with self.client.connect() as server:
+                count, uidvalidity = self._examine(server, folder)
+                batches, total, total_bytes = self._plan(server, count, since_uid)
+            result['uidvalidity'] = uidvalidity
+            if batches:
+                if self.workers > 1:
+                    pool = concurrent.futures.ProcessPoolExecutor(min(self.workers, len(batches)))
+                self._run(folder, uidvalidity, batches, sink, pool, result, total, total_bytes)
+        except Exception as e:
+            result['error'] = str(e)
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+
+        result['seconds'] = round(time.perf_counter() - start, 3)
+        return result
+
+    def _run(self, folder, uidvalidity, batches, sink, pool, result, total, total_bytes):
+        """Fetch on connection threads, parse on the pool, deliver here in order."""
+        pending = iter(enumerate(batches))
+        lock = threading.Lock()
+        # One slot per batch between fetched and delivered
+        slots = threading.Semaphore(self.window)
+        fetched: 'queue.Queue[Tuple[Optional[int], Any]]' = queue.Queue()
+        stop = threading.Event()
+
+        def work():
+            server = None
+            try:
+                while not stop.is_set():
+                    if not slots.acquire(timeout=0.2):
+                        continue
+                    with lock:
+                        index, batch = next(pending, (None, None))
+                    if batch is None:
+                        return
+                    # Retry once on a fresh connection if this one dropped
+                    for attempt in (1, 2):
+                        try:
+                            if server is None:
+                                server = self.client.connect()
+                                if self._examine(server, folder)[1] != uidvalidity:
+                                    raise ValueError(f"UIDVALIDITY of {folder} changed during ingest")
+                            spool = self._fetch(server, batch)
+                            break
+                        except (imaplib.IMAP4.abort, OSError):
+                            server = None
+                            if attempt == 2:
+                                raise
+                    fetched.put((index, spool))
+            except Exception as e:
+                fetched.put((None, e))
+            finally:
+                if server is not None:
+                    try:
+                        server.logout()
+                    except Exception:
+                        pass
+
+        def parse(path: str, entries: List[Entry]):
+            if pool is None:
+                return _parse_batch(path, entries)
+            return pool.submit(_parse_batch, path, entries)
+
+        threads = [threading.Thread(target=work, daemon=True)
+                   for _ in range(min(self.connections, len(batches)))]
+        for thread in threads:
+            thread.start()
+
+        parsing: Dict[int, Any] = {}
+        spools: Dict[int, str] = {}
+        last_report = 0.0
+        try:
+            for index, batch in enumerate(batches):
+                # Hand every batch fetched so far to the parsers, waiting
+                # only while the next one to deliver is still being fetched
+                while True:
+                    try:
+                        done, spool = fetched.get(block=index not in parsing)
+                    except queue.Empty:
+                        break
+                    if done is None:
+                        raise spool
+                    spools[done] = spool[0]
+                    parsing[done] = parse(*spool)
+
+                messages = parsing.pop(index)
+                if pool is not None:
+                    messages = messages.result()
+                _remove(spools.pop(index))
+                for message in messages:
+                    if 'error' in message:
+                        result['failed'] += 1
+                        result['errors'].append({'uid': message['uid'], 'error': message['error']})
+                    else:
+                        sink(message)
+                        result['messages'] += 1
+                        result['bytes'] += message['size']
+                    result['last_uid'] = message['uid']
+                # Also past UIDs expunged since planning
+                result['last_uid'] = batch[-1]
+                slots.release()
+
+                if self.progress and time.monotonic() - last_report >= 1.0:
+                    last_report = time.monotonic()
+                    self.progress({'folder': folder, 'messages': result['messages'], 'total': total,
+                                   'bytes': result['bytes'], 'total_bytes': total_bytes})
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+            # Spools of batches fetched but never delivered
+            while not fetched.empty():
+                done, spool = fetched.get_nowait()
+                if done is not None:
+                    spools[done] = spool[0]
+            for path in spools.values():
+                _remove(path)
@@ -2,17 +2,34 @@
 
 import click
 import json
+import time
 from .config import Config
 from .smtp_client import SMTPClient
 from .imap_client import IMAPClient
-from .utils import render_template, parse_context, format_json_output, format_table_output
+from .recipients import address_group, describe_group
+from .suppression import SuppressionList
+from .sent_copy import SentCopier
+from .routing import Router
+from .export import Exporter, import_messages, FORMATS as EXPORT_FORMATS
+from .ingest import Ingester
+from .render import render_spool, send_spool, iter_rows, FORMATS as RENDER_FORMATS
+from .scheduler import ScheduleStore, Scheduler, parse_send_time, format_send_time
+from .state import StateStore
+from .threads import ThreadIndex, get_thread, sync_threads
+from . import metrics
+from .utils import render_template, parse_context, format_json_output, format_table_output, format_timings
 
 
 @click.group()
 @click.version_option(version='1.0.0')
-def cli():
+@click.option('--metrics-textfile', type=click.Path(dir_okay=False), envvar='EMAIL_METRICS_TEXTFILE',
+              help='Write Prometheus metrics to this file on exit')
+@click.pass_context
+def cli(ctx, metrics_textfile):
     """Clawdbot SMTP/IMAP CLI Tool - Manage emails with templates."""
-    pass
+    if metrics_textfile:
+        metrics.configure({}, textfile=metrics_textfile)
+        ctx.call_on_close(lambda: metrics.REGISTRY.write_textfile(metrics_textfile))
 
 
 @cli.command()
@@ -27,13 +44,44 @@ def cli():
 @click.option('--cc', multiple=True, help='CC recipients (can use multiple times)')
 @click.option('--bcc', multiple=True, help='BCC recipients (can use multiple times)')
 @click.option('--attach', multiple=True, help='Attachments (can use multiple times)')
+@click.option('--per-recipient', is_flag=True, help='Send a separate message to each group member')
+@click.option('--route', '-r', help='Send through a routing group of accounts instead of one account')
+@click.option('--at', 'send_at', help='Schedule instead of sending now (HH:MM, ISO date/time or +30m)')
+@click.option('--tz', help='Time zone for --at, e.g. Europe/Berlin (default: settings.timezone or local)')
+@click.option('--timings', is_flag=True, help='Include a per-phase timing breakdown')
 @click.option('--json', 'as_json', is_flag=True, help='Output as JSON')
-def send(account, to, subject, body, html, template, preset, context, cc, bcc, attach, as_json):
+def send(account, to, subject, body, html, template, preset, context, cc, bcc, attach, per_recipient, route,
+         send_at, tz, timings, as_json):
     """Send an email."""
     config = Config()
-    account_config = config.get_account(account)
-    smtp = SMTPClient(account_config)
     settings = config.get_settings()
+    if route and account:
+        click.echo("Error: Cannot specify both --route and --account", err=True)
+        return
+
+    scheduled = None
+    if send_at:
+        tz = tz or settings.get('timezone')
+        try:
+            due = parse_send_time(send_at, tz)
+        except ValueError as e:
+            click.echo(f"Error: {e}", err=True)
+            return
+        # Groups are stored by name and resolved when the send fires
+        scheduled = {'to': to, 'per_recipient': per_recipient, 'attachments': list(attach) if attach else None}
+
+    suppression = SuppressionList.for_sending(settings)
+    sent_copy = None
+    if route:
+        try:
+            smtp = Router.from_config(config, route, suppression=suppression, timings=timings)
+        except ValueError as e:
+            click.echo(f"Error: {e}", err=True)
+            return
+    else:
+        account_config = config.get_account(account)
+        sent_copy = SentCopier.for_sending(settings, account_config)
+        smtp = SMTPClient(account_config, suppression=suppression, timings=timings, sent_copy=sent_copy)
 
     # Load defaults from settings
     default_cc = settings.get('default_cc', [])
@@ -42,20 +90,20 @@ def send(account, to, subject, body, html, template, preset, context, cc, bcc, a
     # Merge CC/BCC with defaults
     final_cc = list(set(list(cc) + default_cc))
     final_bcc = list(set(list(bcc) + default_bcc))
+    if scheduled is not None:
+        scheduled.update(cc=list(final_cc), bcc=list(final_bcc))
 
     # Resolve recipient groups
+    max_recipients = settings.get('max_recipients_per_message', 100)
+    bulk = None
     if to and '@' not in to:
         # It's a group name, not an email address
-        recipients = config.get_recipients(to)
-        if recipients:
-            if len(recipients) == 1:
-                to = recipients[0]
-            else:
-                # Multiple recipients, use first as TO, rest as CC
-                to = recipients[0]
-                final_cc.extend(recipients[1:])
-        else:
+        group = config.get_recipient_group(to)
+        if group is None:
             click.echo(f"Warning: Recipient group '{to}' not found", err=True)
+        else:
+            # Large groups stream in chunked envelopes instead of one CC header
+            to, final_cc, bulk = address_group(to, group, final_cc, final_bcc, max_recipients, per_recipient)
 
     # Handle preset
     if preset:
@@ -82,15 +130,28 @@ def send(account, to, subject, body, html, template, preset, context, cc, bcc, a
             return
         try:
             ctx = parse_context(context)
-            result = smtp.send_template_email(
-                to=to,
-                subject=subject,
-                template_name=template,
-                context=ctx,
-                cc=final_cc,
-                bcc=final_bcc,
-                attachments=list(attach) if attach else None
-            )
+            if scheduled is not None:
+                scheduled.update(subject=subject, template=template, context=ctx)
+            elif bulk is not None:
+                result = smtp.send_bulk(
+                    bulk,
+                    subject=subject,
+                    body=None,
+                    html=render_template(template, ctx),
+                    attachments=list(attach) if attach else None,
+                    max_recipients=max_recipients,
+                    per_recipient=per_recipient
+                )
+            else:
+                result = smtp.send_template_email(
+                    to=to,
+                    subject=subject,
+                    template_name=template,
+                    context=ctx,
+                    cc=final_cc,
+                    bcc=final_bcc,
+                    attachments=list(attach) if attach else None
+                )
         except Exception as e:
             result = {'success': False, 'error': str(e)}
     else:
@@ -114,15 +175,49 @@ def send(account, to, subject, body, html, template, preset, context, cc, bcc, a
         # Regular email
         if not body and not html:
             body = ''  # Empty body allowed
-        result = smtp.send_email(
-            to=to,
-            subject=subject,
-            body=body,
-            html=html,
-            cc=final_cc,
-            bcc=final_bcc,
-            attachments=list(attach) if attach else None
-        )
+        if scheduled is not None:
+            scheduled.update(subject=subject, body=body, html=html)
+        elif bulk is not None:
+            result = smtp.send_bulk(
+                bulk,
+                subject=subject,
+                body=body,
+                html=html,
+                attachments=list(attach) if attach else None,
+                max_recipients=max_recipients,
+                per_recipient=per_recipient
+            )
+        else:
+            result = smtp.send_email(
+                to=to,
+                subject=subject,
+                body=body,
+                html=html,
+                cc=final_cc,
+                bcc=final_bcc,
+                attachments=list(attach) if attach else None
+            )
+
+    if scheduled is not None and 'subject' in scheduled:
+        store = ScheduleStore.from_settings(settings)
+        item_id = store.add(due, scheduled, account=account, route=route, tz=tz)
+        store.close()
+        result = {
+            'success': True,
+            'scheduled': item_id,
+            'to': scheduled['to'],
+            'subject': subject,
+            'due': format_send_time(due, tz)
+        }
+
+    if suppression is not None:
+        suppression.close()
+    if sent_copy is not None:
+        result['sent_copy'] = sent_copy.close()
+    elif route:
+        copies = smtp.close()
+        if copies:
+            result['sent_copy'] = copies
 
     # Output
     if as_json:
@@ -130,6 +225,15 @@ def send(account, to, subject, body, html, template, preset, context, cc, bcc, a
     else:
         output = format_table_output(result)
         click.echo(output)
+        if 'scheduled' in result:
+            click.echo(f"Scheduled send {result['scheduled']} for {result['due']}")
+        if 'route' in result:
+            attempts = ' -> '.join(attempt['account'] for attempt in result['route']['attempts'])
+            click.echo(f"Route {result['route']['group']}: {attempts}")
+        elif 'routes' in result:
+            click.echo(', '.join(f"{name}: {count} recipients" for name, count in result['routes'].items()))
+        if 'timings' in result:
+            click.echo(format_timings(result['timings']))
 
 
 @cli.command()
@@ -137,12 +241,13 @@ def send(account, to, subject, body, html, template, preset, context, cc, bcc, a
 @click.option('--folder', '-f', default='INBOX', help='Folder name')
 @click.option('--limit', '-l', default=10, help='Number of emails to list')
 @click.option('--unread', is_flag=True, help='Only show unread emails')
+@click.option('--timings', is_flag=True, help='Include a per-phase timing breakdown')
 @click.option('--json', 'as_json', is_flag=True, help='Output as JSON')
-def list_emails(account, folder, limit, unread, as_json):
+def list_emails(account, folder, limit, unread, timings, as_json):
     """List emails in a folder."""
     config = Config()
     account_config = config.get_account(account)
-    imap = IMAPClient(account_config)
+    imap = IMAPClient(account_config, timings=timings)
 
     result = imap.list_emails(folder=folder, limit=limit, unread_only=unread)
 
@@ -151,18 +256,21 @@ def list_emails(account, folder, limit, unread, as_json):
     else:
         output = format_table_output(result)
         click.echo(output)
+        if 'timings' in result:
+            click.echo(format_timings(result['timings']))
 
 
 @cli.command()
 @click.option('--account', '-a', help='Account name from config')
 @click.option('--folder', '-f', default='INBOX', help='Folder name')
 @click.option('--id', 'email_id', required=True, help='Email ID')
+@click.option('--timings', is_flag=True, help='Include a per-phase timing breakdown')
 @click.option('--json', 'as_json', is_flag=True, help='Output as JSON')
-def read(account, folder, email_id, as_json):
+def read(account, folder, email_id, timings, as_json):
     """Read a specific email."""
     config = Config()
     account_config = config.get_account(account)
-    imap = IMAPClient(account_config)
+    imap = IMAPClient(account_config, timings=timings)
 
     result = imap.read_email(folder=folder, email_id=email_id)
 
@@ -182,6 +290,8 @@ def read(account, folder, email_id, as_json):
             click.echo(output)
         else:
             click.echo(format_table_output(result))
+        if 'timings' in result:
+            click.echo(format_timings(result['timings']))
 
 
 @cli.command()
@@ -189,12 +299,13 @@ def read(account, folder, email_id, as_json):
 @click.option('--folder', '-f', default='INBOX', help='Folder name')
 @click.option('--query', '-q', required=True, help='IMAP search query')
 @click.option('--limit', '-l', default=10, help='Number of emails to return')
+@click.option('--timings', is_flag=True, help='Include a per-phase timing breakdown')
 @click.option('--json', 'as_json', is_flag=True, help='Output as JSON')
-def search(account, folder, query, limit, as_json):
+def search(account, folder, query, limit, timings, as_json):
     """Search emails with IMAP query."""
     config = Config()
     account_config = config.get_account(account)
-    imap = IMAPClient(account_config)
+    imap = IMAPClient(account_config, timings=timings)
 
     result = imap.search_emails(folder=folder, query=query, limit=limit)
 
@@ -203,6 +314,8 @@ def search(account, folder, query, limit, as_json):
     else:
         output = format_table_output(result)
         click.echo(output)
+        if 'timings' in result:
+            click.echo(format_timings(result['timings']))
 
 
 @cli.command()
@@ -229,16 +342,254 @@ def delete(account, folder, email_id, as_json, yes):
         click.echo(output)
 
 
+def _echo_progress(progress):
+    """Print export/import progress to stderr."""
+    line = f"{progress['folder']}: {progress['messages']}"
+    if progress.get('total'):
+        line += f"/{progress['total']} messages, {progress['bytes'] / 1048576:.1f}/"
+        line += f"{progress['total_bytes'] / 1048576:.1f} MB"
+    else:
+        line += f" messages, {progress['bytes'] / 1048576:.1f} MB"
+    click.echo(line, err=True)
+
+
+@cli.command()
+@click.option('--account', '-a', help='Account name from config')
+@click.option('--id', 'email_id', help='Message-ID, or the email ID shown by list for --folder')
+@click.option('--folder', '-f', default='INBOX', help='Folder the email ID refers to')
+@click.option('--also', multiple=True, help='More folders to thread across (default: settings.threads.folders)')
+@click.option('--bodies', is_flag=True, help='Include message bodies')
+@click.option('--sync', 'sync_only', is_flag=True, help='Only update the thread index')
+@click.option('--timings', is_flag=True, help='Include a per-phase timing breakdown')
+@click.option('--json', 'as_json', is_flag=True, help='Output as JSON')
+def thread(account, email_id, folder, also, bodies, sync_only, timings, as_json):
+    """Show the whole conversation an email belongs to."""
+    config = Config()
+    settings = config.get_settings()
+    account = account or config.config.get('default_account', 'primary')
+    imap = IMAPClient(config.get_account(account), timings=timings)
+    folders = list(also) or (settings.get('threads', {}) or {}).get('folders', [])
+    if not sync_only and not email_id:
+        click.echo("Error: --id is required unless --sync is given", err=True)
+        return
+
+    index = ThreadIndex.from_settings(settings)
+    if sync_only:
+        result = sync_threads(imap, index, account, list(dict.fromkeys([folder] + folders)), timings=timings)
+    else:
+        result = get_thread(imap, index, account, email_id, folder, folders, bodies=bodies, timings=timings)
+    index.close()
+
+    if as_json:
+        click.echo(format_json_output(result))
+    else:
+        if sync_only:
+            counts = result['index']
+            click.echo(f"Indexed {result['indexed']} new message(s); {counts['messages']} messages in "
+                       f"{counts['threads']} threads across {counts['folders']} folder(s)")
+            if result['error']:
+                click.echo(f"Error: {result['error']}", err=True)
+        elif result['error']:
+            click.echo(f"Error: {result['error']}", err=True)
+        else:
+            from colorama import Fore, Style
+
+            output = f"\n{Fore.CYAN}Thread of {result['message_id']}: {result['total']} message(s){Style.RESET_ALL}\n"
+            for message in result['messages']:
+                indent = '  ' * message['depth']
+                output += f"{indent}{Fore.GREEN}•{Style.RESET_ALL} {message['subject']} "
+                output += f"{Fore.YELLOW}{message['from']}{Style.RESET_ALL} ({message['folder']} {message['uid']}, "
+                output += f"{message['date']})\n"
+                if message.get('body'):
+                    output += ''.join(f"{indent}    {line}\n" for line in message['body'].strip().splitlines())
+            click.echo(output)
+        if 'timings' in result:
+            click.echo(format_timings(result['timings']))
+
+
+@cli.command()
+@click.option('--account', '-a', help='Account name from config')
+@click.option('--folder', '-f', multiple=True, help='Folder to export (can use multiple times, default INBOX)')
+@click.option('--all', 'all_folders', is_flag=True, help='Export every folder of the account')
+@click.option('--output', '-o', required=True, type=click.Path(), help='mbox file or Maildir directory to write')
+@click.option('--format', 'fmt', type=click.Choice(EXPORT_FORMATS), default='mbox', help='Output format')
+@click.option('--workers', '-w', default=4, type=click.IntRange(min=1), help='Parallel IMAP connections')
+@click.option('--batch-size', default=500, type=click.IntRange(min=1), help='Messages per FETCH')
+@click.option('--json', 'as_json', is_flag=True, help='Output as JSON')
+def export(account, folder, all_folders, output, fmt, workers, batch_size, as_json):
+    """Export folders to mbox or Maildir (resumable)."""
+    config = Config()
+    account_config = config.get_account(account)
+    exporter = Exporter(IMAPClient(account_config), workers=workers, batch_size=batch_size,
+                        progress=None if as_json else _echo_progress)
+
+    try:
+        folder_list = exporter.list_folders() if all_folders else list(folder) or ['INBOX']
+    except Exception as e:
+        click.echo(f"Error: {e}", err=True)
+        return
+    # Several folders get one mbox file or Maildir each under the output directory
+    result = exporter.export(folder_list, output, fmt, nested=len(folder_list) > 1 or all_folders)
+
+    if as_json:
+        click.echo(format_json_output(result))
+    else:
+        for item in result['folders']:
+            skipped = f", {item['skipped']} already exported" if item['skipped'] else ''
+            click.echo(f"{item['folder']} -> {item['path']}: {item['messages']} messages, "
+                       f"{item['bytes'] / 1048576:.1f} MB in {item['seconds']}s{skipped}")
+        if result['error']:
+            click.echo(f"Error: {result['error']} (run the same command again to resume)", err=True)
+
+
+@cli.command(name='import')
+@click.option('--account', '-a', help='Account name from config')
+@click.option('--folder', '-f', required=True, help='Folder to append messages to')
+@click.option('--source', required=True, type=click.Path(exists=True), help='mbox file or Maildir directory')
+@click.option('--format', 'fmt', type=click.Choice(EXPORT_FORMATS), help='Source format (detected by default)')
+@click.option('--batch-size', default=100, type=click.IntRange(min=1), help='Messages per pipelined batch')
+@click.option('--json', 'as_json', is_flag=True, help='Output as JSON')
+def import_mail(account, folder, source, fmt, batch_size, as_json):
+    """Import an mbox file or Maildir into a folder (resumable)."""
+    config = Config()
+    account_config = config.get_account(account)
+    result = import_messages(IMAPClient(account_config), source, folder, fmt=fmt, batch_size=batch_size,
+                             progress=None if as_json else _echo_progress)
+
+    if as_json:
+        click.echo(format_json_output(result))
+    else:
+        skipped = f", {result['skipped']} already imported" if result['skipped'] else ''
+        click.echo(f"{result['path']} -> {folder}: {result['messages']} messages, "
+                   f"{result['bytes'] / 1048576:.1f} MB in {result['seconds']}s{skipped}")
+        if result['error']:
+            click.echo(f"Error: {result['error']} (run the same command again to resume)", err=True)
+
+
+@cli.command()
+@click.option('--account', '-a', help='Account name from config')
+@click.option('--folder', '-f', default='INBOX', help='Folder name')
+@click.option('--output', '-o', required=True, type=click.Path(dir_okay=False),
+              help='JSON Lines file to write, one parsed message per line')
+@click.option('--since-uid', default=0, type=click.IntRange(min=0), help='Only messages with a higher UID')
+@click.option('--workers', '-w', type=click.IntRange(min=1), help='Parsing processes (default: one per CPU)')
+@click.option('--connections', default=2, type=click.IntRange(min=1), help='Parallel IMAP connections')
+@click.option('--batch-size', default=200, type=click.IntRange(min=1), help='Messages per FETCH')
+@click.option('--json', 'as_json', is_flag=True, help='Output as JSON')
+def ingest(account, folder, output, since_uid, workers, connections, batch_size, as_json):
+    """Fetch and parse a whole folder into JSON Lines, in UID order."""
+    config = Config()
+    account_config = config.get_account(account)
+    ingester = Ingester(IMAPClient(account_config), connections=connections, workers=workers,
+                        batch_size=batch_size, progress=None if as_json else _echo_progress)
+
+    with open(output, 'a' if since_uid else 'w', encoding='utf-8') as f:
+        result = ingester.ingest(folder, lambda message: f.write(json.dumps(message) + '\n'), since_uid=since_uid)
+
+    if as_json:
+        click.echo(format_json_output(result))
+    else:
+        click.echo(f"{folder} -> {output}: {result['messages']} messages, {result['bytes'] / 1048576:.1f} MB "
+                   f"in {result['seconds']}s ({result['workers']} workers)")
+        for error in result['errors'][:10]:
+            click.echo(f"  UID {error['uid']}: {error['error']}", err=True)
+        if len(result['errors']) > 10:
+            click.echo(f"  ... and {len(result['errors']) - 10} more failed messages", err=True)
+        if result['error']:
+            click.echo(f"Error: {result['error']} (continue with --since-uid {result['last_uid']})", err=True)
+
+
+@cli.command()
+@click.option('--account', '-a', help='Account name from config (the sender)')
+@click.option('--data', '-d', 'data_file', required=True, type=click.Path(exists=True, dir_okay=False),
+              help='Recipients with their template context (CSV, JSON Lines or JSON)')
+@click.option('--column', default='email', help='Field holding the recipient address')
+@click.option('--subject', '-s', required=True, help='Subject (a template, e.g. "Hi {{ name }}")')
+@click.option('--template', help='Template name (in templates/)')
+@click.option('--html', help='Inline HTML template')
+@click.option('--body', '-b', help='Plain text template (default: derived from the HTML)')
+@click.option('--attach', multiple=True, help='Attachments (can use multiple times)')
+@click.option('--output', '-o', required=True, type=click.Path(), help='Spool directory or .mbox file to write')
+@click.option('--format', 'fmt', type=click.Choice(RENDER_FORMATS), help='Output format (default: by path)')
+@click.option('--workers', '-w', type=click.IntRange(min=1), help='Rendering processes (default: one per CPU)')
+@click.option('--json', 'as_json', is_flag=True, help='Output as JSON')
+def render(account, data_file, column, subject, template, html, body, attach, output, fmt, workers, as_json):
+    """Pre-render a mail merge to ready-to-send messages."""
+    config = Config()
+    account_config = config.get_account(account)
+    if not (template or html or body):
+        click.echo("Error: --template, --html or --body is required", err=True)
+        return
+
+    last = [0.0]
+
+    def echo_progress(progress):
+        # Chunks finish every few milliseconds; report about once a second
+        if time.monotonic() - last[0] >= 1:
+            last[0] = time.monotonic()
+            click.echo(f"{progress['rendered']} rendered, {progress['failed']} failed, "
+                       f"{progress['bytes'] / 1048576:.1f} MB", err=True)
+
+    result = render_spool(account_config, iter_rows(data_file), output, subject, template=template, html=html,
+                          body=body, attachments=list(attach) if attach else None, column=column, fmt=fmt,
+                          workers=workers, progress=None if as_json else echo_progress)
+
+    if as_json:
+        click.echo(format_json_output(result))
+    else:
+        click.echo(f"{result['output']}: {result['rendered']} messages, {result['bytes'] / 1048576:.1f} MB "
+                   f"({result['workers']} workers)")
+        for error in result['errors'][:10]:
+            click.echo(f"  row {error['row']} ({error['to'] or 'no recipient'}): {error['error']}", err=True)
+        if len(result['errors']) > 10:
+            click.echo(f"  ... and {len(result['errors']) - 10} more failed rows", err=True)
+        if result['error']:
+            click.echo(f"Error: {result['error']}", err=True)
+
+
+@cli.command(name='send-spool')
+@click.option('--account', '-a', help='Account name from config')
+@click.option('--path', required=True, type=click.Path(exists=True), help='Spool directory or .mbox file')
+@click.option('--restart', is_flag=True, help='Send everything again instead of resuming')
+@click.option('--timings', is_flag=True, help='Include a per-phase timing breakdown')
+@click.option('--json', 'as_json', is_flag=True, help='Output as JSON')
+def send_spooled(account, path, restart, timings, as_json):
+    """Send the messages of a rendered spool (resumable)."""
+    config = Config()
+    settings = config.get_settings()
+    account_config = config.get_account(account)
+    suppression = SuppressionList.for_sending(settings)
+    sent_copy = SentCopier.for_sending(settings, account_config)
+    smtp = SMTPClient(account_config, suppression=suppression, timings=timings, sent_copy=sent_copy)
+
+    result = send_spool(smtp, path, restart=restart)
+    if suppression is not None:
+        suppression.close()
+    if sent_copy is not None:
+        result['sent_copy'] = sent_copy.close()
+
+    if as_json:
+        click.echo(format_json_output(result))
+    else:
+        skipped = f", {result['skipped']} already sent" if result['skipped'] else ''
+        click.echo(f"{path}: {result['messages']} messages to {result['sent']} recipients, "
+                   f"{result['failed']} refused{skipped}")
+        if result['error']:
+            click.echo(f"Error: {result['error']} (run the same command again to resume)", err=True)
+        if 'timings' in result:
+            click.echo(format_timings(result['timings']))
+
+
 @cli.group()
 def folders():
     """Manage email folders."""
     pass
 
 
-@folders.command()
+@folders.command(name='list')
 @click.option('--account', '-a', help='Account name from config')
 @click.option('--json', 'as_json', is_flag=True, help='Output as JSON')
-def list(account, as_json):
+def list_folders(account, as_json):
     """List all folders."""
     config = Config()
     account_config = config.get_account(account)
@@ -345,15 +696,53 @@ def recipients():
 
 @recipients.command(name='list')
 @click.option('--account', '-a', help='Account name from config')
+@click.option('--group', '-g', help='Show the members of one group')
+@click.option('--page', default=1, type=click.IntRange(min=1), help='Page number (with --group)')
+@click.option('--page-size', default=50, type=click.IntRange(min=1), help='Addresses per page (with --group)')
 @click.option('--json', 'as_json', is_flag=True, help='Output as JSON')
-def list_recipients(account, as_json):
-    """List all recipient groups."""
+def list_recipients(account, group, page, page_size, as_json):
+    """List recipient groups, or page through one group's members."""
     config = Config()
-    recipients = config.config.get('recipients', {})
+
+    if group:
+        source = config.get_recipient_group(group)
+        if source is None:
+            result = {'success': False, 'error': f"Recipient group '{group}' not found"}
+        else:
+            total = source.count()
+            result = {
+                'group': group,
+                'type': source.kind,
+                'total': total,
+                'page': page,
+                'page_size': page_size,
+                'pages': (total + page_size - 1) // page_size,
+                'recipients': source.page(page, page_size)
+            }
+
+        if as_json:
+            click.echo(format_json_output(result))
+        elif 'error' in result:
+            click.echo(format_table_output(result))
+        else:
+            from colorama import Fore, Style
+
+            output = f"\n{Fore.CYAN}{group} ({result['total']} recipients, "
+            output += f"page {page}/{max(result['pages'], 1)}):{Style.RESET_ALL}\n\n"
+            for email in result['recipients']:
+                output += f"  - {email}\n"
+            click.echo(output)
+        return
+
+    groups = [
+        describe_group(name, config.get_recipient_group(name))
+        for name in config.get_all_recipient_groups()
+    ]
 
     result = {
-        'groups': list(recipients.keys()),
-        'total': len(recipients)
+        'groups': [g['name'] for g in groups],
+        'details': groups,
+        'total': len(groups)
     }
 
     if as_json:
@@ -366,14 +755,326 @@ def list_recipients(account, as_json):
             return
 
         output = f"\n{Fore.CYAN}Available Groups:{Style.RESET_ALL}\n\n"
-        for name, group in recipients.items():
-            output += f"  {Fore.GREEN}•{Style.RESET_ALL} {name} ({len(group)} recipients)\n"
-            for email in group:
-                output += f"    - {email}\n"
-            output += "\n"
+        for g in groups:
+            output += f"  {Fore.GREEN}•{Style.RESET_ALL} {g['name']} ({g['count']} recipients, {g['type']})\n"
+        output += "\nUse --group NAME to page through members.\n"
 
         click.echo(output)
 
 
+@cli.group()
+def schedule():
+    """Manage scheduled sends."""
+    pass
+
+
+@schedule.command(name='run')
+@click.option('--once', is_flag=True, help='Send everything already due, then exit')
+@click.option('--concurrency', type=click.IntRange(min=1), help='Sends in flight at once')
+@click.option('--metrics-port', type=int, help='Serve Prometheus metrics on this port')
+@click.option('--json', 'as_json', is_flag=True, help='Output as JSON')
+def run_schedule(once, concurrency, metrics_port, as_json):
+    """Run the scheduler, firing sends as they fall due."""
+    import signal
+
+    config = Config()
+    settings = config.get_settings()
+    store = ScheduleStore.from_settings(settings)
+    scheduler = Scheduler.from_config(config, store)
+    if concurrency:
+        scheduler.concurrency = concurrency
+
+    server = metrics.configure(settings, port=metrics_port)
+    metrics.REGISTRY.gauge('email_cli_scheduler', 'Scheduler state', scheduler.metric_samples)
+
+    # Finish in-flight sends on SIGTERM/SIGINT; the rest stay queued
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda *_: scheduler.stop())
+
+    if not once and not as_json:
+        click.echo(f"Scheduler running ({len(store.pending())} pending, concurrency {scheduler.concurrency})")
+    result = scheduler.run(once=once)
+    store.close()
+    if server is not None:
+        server.shutdown()
+
+    if as_json:
+        click.echo(format_json_output(result))
+    else:
+        click.echo(', '.join(f"{key}: {value}" for key, value in result.items()))
+
+
+@schedule.command(name='list')
+@click.option('--status', default='pending',
+              type=click.Choice(['pending', 'sending', 'sent', 'failed', 'expired', 'canceled', 'all']),
+              help='Only show sends with this status')
+@click.option('--limit', '-l', default=50, help='Number of sends to show')
+@click.option('--json', 'as_json', is_flag=True, help='Output as JSON')
+def list_schedule(status, limit, as_json):
+    """List scheduled sends, soonest first."""
+    store = ScheduleStore.from_settings(Config().get_settings())
+    items = store.list(None if status == 'all' else status, limit)
+    result = {'scheduled': items, 'counts': store.counts(), 'total': len(items)}
+    store.close()
+
+    if as_json:
+        click.echo(format_json_output(result))
+    else:
+        from colorama import Fore, Style
+
+        if not items:
+            click.echo("No scheduled sends")
+            return
+
+        output = f"\n{Fore.CYAN}Scheduled Sends:{Style.RESET_ALL}\n\n"
+        for item in items:
+            via = f"route {item['route']}" if item['route'] else (item['account'] or 'default account')
+            output += f"  {Fore.GREEN}{item['id']}{Style.RESET_ALL} {item['due']} [{item['status']}] "
+            output += f"{item['to']}: {item['subject']} ({via})\n"
+            if item['error']:
+                output += f"      {Fore.RED}{item['error']}{Style.RESET_ALL}\n"
+        click.echo(output)
+
+
+@schedule.command(name='cancel')
+@click.option('--id', 'item_id', required=True, type=int, help='Scheduled send ID')
+@click.option('--json', 'as_json', is_flag=True, help='Output as JSON')
+def cancel_schedule(item_id, as_json):
+    """Cancel a pending scheduled send."""
+    store = ScheduleStore.from_settings(Config().get_settings())
+    canceled = store.cancel(item_id)
+    store.close()
+    result = {'success': canceled, 'id': item_id}
+    if not canceled:
+        result['error'] = f"No pending scheduled send with ID {item_id}"
+
+    if as_json:
+        click.echo(format_json_output(result))
+    elif canceled:
+        click.echo(f"Canceled scheduled send {item_id}")
+    else:
+        click.echo(f"Error: {result['error']}", err=True)
+
+
+@cli.group()
+def routes():
+    """Manage routing groups."""
+    pass
+
+
+@routes.command(name='list')
+@click.option('--json', 'as_json', is_flag=True, help='Output as JSON')
+def list_routes(as_json):
+    """List routing groups and their accounts."""
+    config = Config()
+
+    details = []
+    for name, spec in config.get_all_routes().items():
+        accounts = spec.get('accounts', {})
+        if isinstance(accounts, dict):
+            weights = dict(accounts)
+        else:
+            weights = {
+                entry if isinstance(entry, str) else entry['account']:
+                    1 if isinstance(entry, str) else entry.get('weight', 1)
+                for entry in accounts
+            }
+        details.append({'name': name, 'strategy': spec.get('strategy', 'ewma'), 'accounts': weights})
+
+    result = {
+        'routes': [d['name'] for d in details],
+        'details': details,
+        'total': len(details)
+    }
+
+    if as_json:
+        click.echo(format_json_output(result))
+    else:
+        from colorama import Fore, Style
+
+        if result['total'] == 0:
+            click.echo("No routing groups found in config")
+            return
+
+        output = f"\n{Fore.CYAN}Routing Groups:{Style.RESET_ALL}\n\n"
+        for d in details:
+            accounts = ', '.join(f"{name} (weight {weight})" for name, weight in d['accounts'].items())
+            output += f"  {Fore.GREEN}•{Style.RESET_ALL} {d['name']} [{d['strategy']}]: {accounts}\n"
+        click.echo(output)
+
+
+@cli.group()
+def rules():
+    """Apply filing rules to incoming mail."""
+    pass
+
+
+@rules.command(name='run')
+@click.option('--account', '-a', help='Account name from config')
+@click.option('--folder', '-f', default='INBOX', help='Folder to file mail from')
+@click.option('--file', 'rules_file', type=click.Path(exists=True, dir_okay=False),
+              help='Rules file (default: the "rules" list in the config)')
+@click.option('--rescan', is_flag=True, help='Apply to every message, not just mail since the last run')
+@click.option('--dry-run', is_flag=True, help='Show what would be done without changing anything')
+@click.option('--timings', is_flag=True, help='Include a per-phase timing breakdown')
+@click.option('--json', 'as_json', is_flag=True, help='Output as JSON')
+def run_rules(account, folder, rules_file, rescan, dry_run, timings, as_json):
+    """File new mail by the rules: move, copy, flag, delete or forward in bulk."""
+    from .rules import load_rules, run_rules as apply_rules
+
+    config = Config()
+    account = account or config.config.get('default_account', 'primary')
+    account_config = config.get_account(account)
+    try:
+        rule_set = load_rules(config, rules_file)
+    except (OSError, ValueError) as e:
+        click.echo(f"Error: {e}", err=True)
+        return
+
+    smtp = SMTPClient(account_config) if account_config.get('smtp_host') else None
+    result = apply_rules(IMAPClient(account_config), rule_set, StateStore.from_settings(config.get_settings()),
+                         account, folder, smtp=smtp, dry_run=dry_run, rescan=rescan, timings=timings)
+
+    if as_json:
+        click.echo(format_json_output(result))
+    else:
+        from colorama import Fore, Style
+
+        prefix = 'Would apply' if dry_run else 'Applied'
+        output = f"\n{Fore.CYAN}Scanned {result['scanned']} message(s) in {folder}, "
+        output += f"{result['matched']} matched{Style.RESET_ALL}\n"
+        for name, count in result['rules'].items():
+            output += f"  {Fore.GREEN}•{Style.RESET_ALL} {name}: {count}\n"
+        if result['actions']:
+            output += f"\n{prefix}:\n"
+            for action, count in result['actions'].items():
+                output += f"  {action}: {count}\n"
+        for error in result['errors']:
+            output += f"  {Fore.RED}✗{Style.RESET_ALL} {error['action']}: {error['error']}\n"
+        if result['error'] and not result['errors']:
+            output += f"{Fore.RED}Error: {result['error']}{Style.RESET_ALL}\n"
+        click.echo(output)
+        if 'timings' in result:
+            click.echo(format_timings(result['timings']))
+
+
+@rules.command(name='check')
+@click.option('--file', 'rules_file', type=click.Path(exists=True, dir_okay=False),
+              help='Rules file (default: the "rules" list in the config)')
+@click.option('--json', 'as_json', is_flag=True, help='Output as JSON')
+def check_rules(rules_file, as_json):
+    """Validate and compile the rules."""
+    from .rules import load_rules
+
+    try:
+        rule_set = load_rules(Config(), rules_file)
+        result = {
+            'success': True,
+            'rules': [rule.name for rule in rule_set.rules],
+            'header_fields': rule_set.header_fields,
+            'error': None
+        }
+    except (OSError, ValueError) as e:
+        result = {'success': False, 'rules': [], 'error': str(e)}
+
+    if as_json:
+        click.echo(format_json_output(result))
+    elif result['success']:
+        click.echo(f"{len(result['rules'])} rule(s) OK: {', '.join(result['rules'])}")
+    else:
+        click.echo(f"Error: {result['error']}", err=True)
+
+
+@cli.group()
+def bounces():
+    """Process bounces and manage the suppression list."""
+    pass
+
+
+@bounces.command(name='process')
+@click.option('--account', '-a', help='Account name from config')
+@click.option('--folder', '-f', default='INBOX', help='Folder to scan for bounces')
+@click.option('--json', 'as_json', is_flag=True, help='Output as JSON')
+def process_bounces(account, folder, as_json):
+    """Scan new mail for DSN bounces and suppress dead addresses."""
+    from .bounces import process_bounces as run_bounce_scan
+
+    config = Config()
+    account = account or config.config.get('default_account', 'primary')
+    settings = config.get_settings()
+    imap = IMAPClient(config.get_account(account))
+    suppression = SuppressionList.from_settings(settings)
+
+    try:
+        result = run_bounce_scan(imap, suppression, StateStore.from_settings(settings), account, folder)
+        result['total_suppressed'] = suppression.count()
+    finally:
+        suppression.close()
+
+    if as_json:
+        click.echo(format_json_output(result))
+    else:
+        from colorama import Fore, Style
+
+        if not result['success']:
+            click.echo(format_table_output(result))
+            return
+
+        output = f"\n{Fore.CYAN}Scanned {result['scanned']} report(s) in {folder}, "
+        output += f"{result['bounces']} bounce(s){Style.RESET_ALL}\n"
+        for address in result['suppressed']:
+            output += f"  {Fore.RED}✗{Style.RESET_ALL} {address}\n"
+        output += f"\nSuppression list: {result['total_suppressed']} address(es)\n"
+        click.echo(output)
+
+
+@bounces.command(name='check')
+@click.option('--address', required=True, help='Email address')
+@click.option('--json', 'as_json', is_flag=True, help='Output as JSON')
+def check_bounce(address, as_json):
+    """Show whether an address is suppressed."""
+    config = Config()
+    suppression = SuppressionList.from_settings(config.get_settings())
+    try:
+        record = suppression.get(address)
+    finally:
+        suppression.close()
+
+    result = {'address': address, 'suppressed': record is not None, 'record': record}
+
+    if as_json:
+        click.echo(format_json_output(result))
+    else:
+        from colorama import Fore, Style
+
+        if record is None:
+            click.echo(f"{Fore.GREEN}{address} is not suppressed{Style.RESET_ALL}")
+        else:
+            click.echo(
+                f"{Fore.RED}{address} is suppressed{Style.RESET_ALL} "
+                f"(status {record['status']}, seen {record['hits']} time(s))\n{record['reason'] or ''}"
+            )
+
+
+@bounces.command(name='remove')
+@click.option('--address', required=True, help='Email address')
+@click.option('--json', 'as_json', is_flag=True, help='Output as JSON')
+def remove_bounce(address, as_json):
+    """Remove an address from the suppression list."""
+    config = Config()
+    suppression = SuppressionList.from_settings(config.get_settings())
+    try:
+        removed = suppression.remove(address)
+    finally:
+        suppression.close()
+
+    result = {'address': address, 'success': removed, 'error': None if removed else 'Address not suppressed'}
+
+    if as_json:
+        click.echo(format_json_output(result))
+    else:
+        click.echo(format_table_output(result))
+
+
 if __name__ == '__main__':
     cli()
@@ -0,0 +1,302 @@
+"""Per-phase timings and a Prometheus-compatible metrics registry."""
+
+import os
+import time
+import bisect
+import tempfile
+import threading
+from contextlib import contextmanager, nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Any, Iterable, List, Optional, Tuple
+
+# Latency buckets in seconds, from sub-millisecond parsing to slow logins
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ''
+    body = ','.join(
+        '{}="{}"'.format(key, value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in items
+    )
+    return '{' + body + '}'
+
+
+class Counter:
+    """Monotonic counter with labels."""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = _labels(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_labels(labels), 0)
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield f'{self.name}_total{_format_labels(labels)} {value}'
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels."""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = buckets
+        self._values: Dict[Labels, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _labels(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            # Per-bucket counts, then sum and count
+            data = self._values.setdefault(key, [0] * (len(self.buckets) + 1) + [0.0, 0])
+            data[index] += 1
+            data[-2] += value
+            data[-1] += 1
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = [(labels, list(data)) for labels, data in self._values.items()]
+        for labels, data in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), data):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                yield f'{self.name}_bucket{_format_labels(labels, ("le", le))} {cumulative}'
+            yield f'{self.name}_sum{_format_labels(labels)} {data[-2]}'
+            yield f'{self.name}_count{_format_labels(labels)} {data[-1]}'
+
+
+class Gauge:
+    """Gauge whose samples are read from a callback at export time."""
+
+    kind = 'gauge'
+
+    def __init__(self, name: str, help_text: str, callback: Callable[[], Iterable[Tuple[Dict[str, Any], float]]]):
+        self.name = name
+        self.help = help_text
+        self.callback = callback
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in self.callback():
+            yield f'{self.name}{_format_labels(_labels(labels))} {value}'
+
+
+class MetricsRegistry:
+    """Process-wide collection of metrics.
+
+    Disabled by default: instrumentation checks ``enabled`` before doing any
+    work, so an idle registry costs one attribute lookup per call site.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name: str, *args):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = cls(name, *args)
+                self._metrics[name] = metric
+            return metric
+
+    def counter(self, name: str, help_text: str = '') -> Counter:
+        return self._get(Counter, name, help_text)
+
+    def histogram(self, name: str, help_text: str = '', buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help_text, buckets)
+
+    def gauge(self, name: str, help_text: str, callback) -> Gauge:
+        return self._get(Gauge, name, help_text, callback)
+
+    def render(self, openmetrics: bool = False) -> str:
+        """Render all metrics in the Prometheus text (or OpenMetrics) format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+        if openmetrics:
+            lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, path: str):
+        """Atomically write metrics for node_exporter's textfile collector."""
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.metrics-')
+        with os.fdopen(fd, 'w') as f:
+            f.write(self.render())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+
+    def serve(self, port: int, host: str = '0.0.0.0') -> ThreadingHTTPServer:
+        """Serve ``/metrics`` over HTTP from a background thread.
+
+        Scrapers that accept ``application/openmetrics-text`` get OpenMetrics;
+        everything else gets the Prometheus text format.
+        """
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                openmetrics = 'application/openmetrics-text' in self.headers.get('Accept', '')
+                body = registry.render(openmetrics).encode()
+                self.send_response(200)
+                if openmetrics:
+                    self.send_header('Content-Type', 'application/openmetrics-text; version=1.0.0; charset=utf-8')
+                else:
+                    self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+        return server
+
+
+REGISTRY = MetricsRegistry()
+
+PHASE_SECONDS = REGISTRY.histogram('email_cli_phase_seconds', 'Time spent per operation phase')
+OPERATION_SECONDS = REGISTRY.histogram('email_cli_operation_seconds', 'End-to-end operation time')
+OPERATIONS = REGISTRY.counter('email_cli_operations', 'Operations by outcome')
+BYTES_SENT = REGISTRY.counter('email_cli_bytes_sent', 'Bytes written to mail servers')
+BYTES_RECEIVED = REGISTRY.counter('email_cli_bytes_received', 'Bytes read from mail servers')
+ROUND_TRIPS = REGISTRY.counter('email_cli_round_trips', 'Protocol commands awaiting a server reply')
+CACHE_HITS = REGISTRY.counter('email_cli_cache_hits', 'Work skipped thanks to a cache or watermark')
+
+
+def _limiter_samples():
+    from .ratelimit import all_limiters
+
+    for key, limiter in all_limiters().items():
+        snapshot = limiter.snapshot()
+        for field in ('rate', 'acquired', 'throttled', 'waited_seconds'):
+            yield {'limiter': key, 'field': field}, snapshot[field]
+
+
+REGISTRY.gauge('email_cli_rate_limiter', 'Send rate limiter state', _limiter_samples)
+
+
+_NULL_PHASE = nullcontext()
+
+
+class Timings:
+    """Phase timer for one operation.
+
+    Phases may repeat (e.g. one ``fetch`` per message); durations add up.
+    A disabled timer hands out a shared no-op context manager, so
+    instrumented code pays almost nothing when timings are off.
+    """
+
+    def __init__(self, op: str, report: bool = False, record: bool = False):
+        self.op = op
+        self.report = report
+        self.record = record
+        self.enabled = report or record
+        self.phases: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+        self._start = time.perf_counter() if self.enabled else 0.0
+
+    def phase(self, name: str, round_trips: int = 0):
+        """Time a block as phase ``name``."""
+        if not self.enabled:
+            return _NULL_PHASE
+        if round_trips:
+            self.count('round_trips', round_trips)
+        return self._timed(name)
+
+    @contextmanager
+    def _timed(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def count(self, name: str, amount: int = 1):
+        """Add to a per-operation counter (bytes, round trips, cache hits)."""
+        if self.enabled:
+            self.counts[name] = self.counts.get(name, 0) + amount
+
+    def finish(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Attach timings to ``result`` and/or record them in the registry."""
+        if not self.enabled:
+            return result
+
+        total = time.perf_counter() - self._start
+        if self.report:
+            result['timings'] = {
+                'total_ms': round(total * 1000, 3),
+                'phases_ms': {name: round(value * 1000, 3) for name, value in self.phases.items()},
+                **self.counts
+            }
+        if self.record:
+            outcome = 'error' if result.get('error') or result.get('success') is False else 'ok'
+            OPERATIONS.inc(op=self.op, outcome=outcome)
+            OPERATION_SECONDS.observe(total, op=self.op)
+            for name, value in self.phases.items():
+                PHASE_SECONDS.observe(value, op=self.op, phase=name)
+            for name, counter in (('bytes_sent', BYTES_SENT), ('bytes_received', BYTES_RECEIVED),
+                                  ('round_trips', ROUND_TRIPS), ('cache_hits', CACHE_HITS)):
+                if name in self.counts:
+                    counter.inc(self.counts[name], op=self.op)
+        return result
+
+
+# Shared disabled timer for code paths called without one
+NO_TIMINGS = Timings('none')
+
+
+def start_timings(op: str, report: bool = False) -> Timings:
+    """Create the timer for an operation."""
+    return Timings(op, report=report, record=REGISTRY.enabled)
+
+
+def configure(settings: Dict[str, Any], textfile: Optional[str] = None, port: Optional[int] = None):
+    """Enable the registry from CLI options or ``settings.metrics``.
+
+    Returns the HTTP server when an endpoint was started.
+    """
+    conf = settings.get('metrics', {}) or {}
+    textfile = textfile or conf.get('textfile')
+    port = port or conf.get('port')
+    if textfile or port or conf.get('enabled'):
+        REGISTRY.enabled = True
+    if port:
+        return REGISTRY.serve(int(port), conf.get('host', '0.0.0.0'))
+    return None
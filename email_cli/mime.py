@@ -0,0 +1,123 @@
+"""MIME part construction with wire-size-aware transfer encodings."""
+
+import os
+import base64
+import binascii
+import mimetypes
+from email.message import Message
+from email.mime.base import MIMEBase
+from email.mime.nonmultipart import MIMENonMultipart
+from email.policy import compat32
+from typing import Iterable, Optional
+
+# RFC 5322 line limit, excluding CRLF
+MAX_LINE_LENGTH = 998
+
+# Non-text/* types that are text on the wire
+TEXT_APPLICATION_TYPES = {
+    'application/json', 'application/xml', 'application/javascript', 'application/x-yaml',
+    'application/yaml', 'application/x-sh', 'application/sql', 'application/csv'
+}
+
+
+def _base64_size(length: int) -> int:
+    """Encoded size of base64 with 76-character lines."""
+    encoded = (length + 2) // 3 * 4
+    return encoded + (encoded + 75) // 76 * 2
+
+
+def _line_safe(data: bytes) -> bool:
+    """Whether data can go unencoded: no NULs, bare CRs or overlong lines."""
+    if b'\0' in data or b'\r' in data:
+        return False
+    return max(map(len, data.split(b'\n'))) <= MAX_LINE_LENGTH
+
+
+def choose_transfer_encoding(data: bytes, text: bool = True, eight_bit: bool = False) -> str:
+    """Pick the smallest valid Content-Transfer-Encoding for a part.
+
+    Text that is already line-safe goes as ``7bit`` (ASCII) or, when the
+    server announced 8BITMIME, ``8bit``. Otherwise text goes as
+    quoted-printable or base64, whichever is smaller. Binary always goes
+    as base64. ``data`` must use LF line endings.
+    """
+    if not text:
+        return 'base64'
+    if _line_safe(data):
+        if data.isascii():
+            return '7bit'
+        if eight_bit:
+            return '8bit'
+    # Compare wire sizes: every line ends in CRLF once serialized
+    encoded = binascii.b2a_qp(data, istext=True)
+    qp_size = len(encoded) + encoded.count(b'\n')
+    return 'quoted-printable' if qp_size <= _base64_size(len(data)) else 'base64'
+
+
+def _encode(data: bytes, encoding: str) -> str:
+    """Encode data as a message payload string."""
+    if encoding == 'base64':
+        return base64.encodebytes(data).decode('ascii')
+    if encoding == 'quoted-printable':
+        return binascii.b2a_qp(data, istext=True).decode('ascii')
+    # 7bit/8bit: raw bytes, carried through the generator via surrogateescape
+    return data.decode('ascii', 'surrogateescape')
+
+
+def text_part(
+    text: str,
+    subtype: str = 'plain',
+    eight_bit: bool = False,
+    policy=compat32
+) -> Message:
+    """Build a text/* part with the smallest transfer encoding."""
+    data = text.encode('utf-8').replace(b'\r\n', b'\n')
+    charset = 'us-ascii' if data.isascii() else 'utf-8'
+    encoding = choose_transfer_encoding(data, text=True, eight_bit=eight_bit)
+
+    part = MIMENonMultipart('text', subtype, charset=charset, policy=policy)
+    part.set_payload(_encode(data, encoding))
+    part['Content-Transfer-Encoding'] = encoding
+    return part
+
+
+def is_text_type(content_type: str) -> bool:
+    """Whether a content type is text, even if not under text/*."""
+    return content_type.startswith('text/') or content_type in TEXT_APPLICATION_TYPES
+
+
+def attachment_part(file_path: str, eight_bit: bool = False, policy=compat32) -> Message:
+    """Build an attachment part; text files get text encodings, the rest base64."""
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"Attachment not found: {file_path}")
+
+    with open(file_path, 'rb') as f:
+        data = f.read()
+
+    content_type, _ = mimetypes.guess_type(file_path)
+    content_type = content_type or 'application/octet-stream'
+    maintype, subtype = content_type.split('/', 1)
+
+    params = {}
+    text = False
+    if is_text_type(content_type):
+        try:
+            data.decode('utf-8')
+        except UnicodeDecodeError:
+            pass
+        else:
+            text = True
+            data = data.replace(b'\r\n', b'\n')
+            params['charset'] = 'us-ascii' if data.isascii() else 'utf-8'
+
+    encoding = choose_transfer_encoding(data, text=text, eight_bit=eight_bit)
+    part = MIMEBase(maintype, subtype, policy=policy, **params)
+    part.set_payload(_encode(data, encoding))
+    part['Content-Transfer-Encoding'] = encoding
+    part.add_header('Content-Disposition', 'attachment', filename=os.path.basename(file_path))
+    return part
+
+
+def is_international(addresses: Iterable[Optional[str]]) -> bool:
+    """Whether any address needs SMTPUTF8 (non-ASCII local part or domain)."""
+    return any(address and not address.isascii() for address in addresses)
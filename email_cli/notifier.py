@@ -0,0 +1,343 @@
+"""Batched new-mail notifications to Discord and Telegram."""
+
+import json
+import time
+import threading
+import http.client
+from collections import Counter
+from urllib.parse import urlsplit
+from typing import List, Dict, Any, Optional
+
+
+class Channel:
+    """A chat channel reached over one persistent HTTP connection."""
+
+    name = 'channel'
+    # Hard per-message size limit imposed by the service
+    max_length = 2000
+    # Default minimum seconds between two posts to the same channel
+    default_min_interval = 1.0
+
+    def __init__(
+        self,
+        url: str,
+        min_interval: Optional[float] = None,
+        max_retries: int = 3,
+        backoff: float = 1.0,
+        timeout: float = 10.0
+    ):
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            raise ValueError(f"Invalid {self.name} URL: {url}")
+
+        self.url = url
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.path = parts.path + (f'?{parts.query}' if parts.query else '')
+        self.min_interval = self.default_min_interval if min_interval is None else min_interval
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self._conn: Optional[http.client.HTTPConnection] = None
+        self._next_allowed = 0.0
+        self._lock = threading.Lock()
+
+    def _payload(self, text: str) -> Dict[str, Any]:
+        """Build the JSON body for a message."""
+        raise NotImplementedError
+
+    def _retry_after(self, status: int, headers: Dict[str, str], body: bytes) -> Optional[float]:
+        """Extract a server-requested retry delay, if any."""
+        value = headers.get('retry-after')
+        try:
+            return float(value) if value is not None else None
+        except ValueError:
+            return None
+
+    def _connection(self) -> http.client.HTTPConnection:
+        """Get the pooled connection, opening it on first use."""
+        if self._conn is None:
+            cls = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+            self._conn = cls(self.host, self.port, timeout=self.timeout)
+        return self._conn
+
+    def close(self):
+        """Close the pooled connection."""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def post(self, text: str) -> Dict[str, Any]:
+        """Post one message, honouring the channel's rate limit and retrying."""
+        result = {
+            'channel': self.name,
+            'success': False,
+            'attempts': 0,
+            'error': None
+        }
+        body = json.dumps(self._payload(text[:self.max_length])).encode('utf-8')
+
+        with self._lock:
+            for attempt in range(self.max_retries + 1):
+                delay = self._next_allowed - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+
+                result['attempts'] = attempt + 1
+                retry_after = None
+                try:
+                    conn = self._connection()
+                    conn.request('POST', self.path, body=body, headers={
+                        'Content-Type': 'application/json',
+                        'User-Agent': 'clawdbot-smtp'
+                    })
+                    response = conn.getresponse()
+                    response_body = response.read()
+                    headers = {k.lower(): v for k, v in response.getheaders()}
+                    self._next_allowed = time.monotonic() + self.min_interval
+
+                    if 200 <= response.status < 300:
+                        result['success'] = True
+                        result['error'] = None
+                        return result
+
+                    result['error'] = f"HTTP {response.status}: {response_body[:200].decode(errors='ignore')}"
+                    if response.status != 429 and response.status < 500:
+                        # Client errors other than rate limiting will not improve on retry
+                        return result
+                    retry_after = self._retry_after(response.status, headers, response_body)
+
+                except (OSError, http.client.HTTPException) as e:
+                    result['error'] = str(e)
+                    self.close()
+
+                if attempt < self.max_retries:
+                    wait = retry_after if retry_after is not None else self.backoff * (2 ** attempt)
+                    self._next_allowed = max(self._next_allowed, time.monotonic() + wait)
+
+        return result
+
+
+class DiscordChannel(Channel):
+    """Discord webhook channel."""
+
+    name = 'discord'
+    max_length = 2000
+    # Webhooks allow roughly 30 posts per minute per channel
+    default_min_interval = 2.0
+
+    def _payload(self, text: str) -> Dict[str, Any]:
+        return {'content': text}
+
+    def _retry_after(self, status, headers, body):
+        try:
+            return float(json.loads(body)['retry_after'])
+        except (ValueError, KeyError, TypeError):
+            return super()._retry_after(status, headers, body)
+
+
+class TelegramChannel(Channel):
+    """Telegram Bot API channel."""
+
+    name = 'telegram'
+    max_length = 4096
+    # Bots may post about 20 messages per minute to a group
+    default_min_interval = 3.0
+
+    def __init__(self, url: str, chat_id: str, **kwargs):
+        super().__init__(url, **kwargs)
+        self.chat_id = chat_id
+
+    def _payload(self, text: str) -> Dict[str, Any]:
+        # Digests use Discord-style **bold**, which plain Telegram text would show literally
+        return {'chat_id': self.chat_id, 'text': text.replace('**', ''), 'disable_web_page_preview': True}
+
+    def _retry_after(self, status, headers, body):
+        try:
+            return float(json.loads(body)['parameters']['retry_after'])
+        except (ValueError, KeyError, TypeError):
+            return super()._retry_after(status, headers, body)
+
+
+class DigestNotifier:
+    """Coalesce new-mail events over a window into one digest per channel.
+
+    Events are buffered with bounded memory: only the first ``max_listed``
+    emails per window are kept verbatim, the rest are tallied by sender, so a
+    burst of hundreds of mails still becomes one short post per channel.
+    """
+
+    def __init__(self, channels: List[Channel], window: float = 60.0, max_listed: int = 10):
+        self.channels = channels
+        self.window = window
+        self.max_listed = max_listed
+        self._listed: List[Dict[str, Any]] = []
+        self._folders: Counter = Counter()
+        self._senders: Counter = Counter()
+        self._total = 0
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+    def add(self, folder: str, emails: List[Dict[str, Any]], total: Optional[int] = None):
+        """Queue new emails for the next digest.
+
+        ``total`` may exceed ``len(emails)`` when only a sample was fetched.
+        """
+        total = len(emails) if total is None else total
+        if total <= 0:
+            return
+
+        with self._cond:
+            self._total += total
+            self._folders[folder] += total
+            for email_data in emails:
+                if len(self._listed) < self.max_listed:
+                    self._listed.append(dict(email_data, folder=folder))
+                else:
+                    self._senders[_sender_name(email_data)] += 1
+            self._cond.notify()
+
+    def build_digest(self, max_length: int) -> Optional[str]:
+        """Render and clear the pending digest, or None if nothing is pending."""
+        with self._cond:
+            if self._total == 0:
+                return None
+            listed, folders, senders, total = self._listed, self._folders, self._senders, self._total
+            self._listed, self._folders, self._senders, self._total = [], Counter(), Counter(), 0
+
+        return format_digest(listed, folders, senders, total, max_length)
+
+    def flush(self) -> List[Dict[str, Any]]:
+        """Post the pending digest to every channel now."""
+        if not self.channels:
+            self.build_digest(0)
+            return []
+
+        text = self.build_digest(min(channel.max_length for channel in self.channels))
+        if text is None:
+            return []
+        return [channel.post(text) for channel in self.channels]
+
+    def start(self):
+        """Flush in a background thread once per window while events arrive."""
+        if self._thread is not None:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name='digest-notifier', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._total == 0 and not self._stopping:
+                    self._cond.wait()
+                if self._stopping:
+                    return
+                # Collect everything arriving within one window of the first
+                # event; add() notifies, so wait out the rest after each wake-up
+                deadline = time.monotonic() + self.window
+                while not self._stopping and time.monotonic() < deadline:
+                    self._cond.wait(deadline - time.monotonic())
+                if self._stopping:
+                    return
+            self.flush()
+
+    def close(self) -> List[Dict[str, Any]]:
+        """Stop the background thread, flush what is left and close connections."""
+        if self._thread is not None:
+            with self._cond:
+                self._stopping = True
+                self._cond.notify()
+            self._thread.join()
+            self._thread = None
+        results = self.flush()
+        for channel in self.channels:
+            channel.close()
+        return results
+
+
+def _sender_name(email_data: Dict[str, Any]) -> str:
+    """Short display name of a sender."""
+    return (email_data.get('from') or 'Unknown').split('<')[0].strip().strip('"') or 'Unknown'
+
+
+def format_digest(
+    listed: List[Dict[str, Any]],
+    folders: Counter,
+    senders: Counter,
+    total: int,
+    max_length: int
+) -> str:
+    """Format a digest that fits in ``max_length`` characters."""
+    if len(folders) == 1:
+        where = next(iter(folders))
+    else:
+        where = ', '.join(f"{folder} ({count})" for folder, count in folders.most_common())
+    header = f"📬 {total} new email(s) in {where}:\n\n"
+
+    lines = []
+    for idx, email_data in enumerate(listed, 1):
+        subject = email_data.get('subject') or 'No Subject'
+        if len(subject) > 60:
+            subject = subject[:57] + '...'
+        lines.append(f"{idx}. **{_sender_name(email_data)}**: {subject}\n")
+
+    remaining = total - len(listed)
+    footer = ''
+    if remaining > 0:
+        footer = f"\n...and {remaining} more"
+        if senders:
+            top = ', '.join(f"{name} ({count})" for name, count in senders.most_common(5))
+            footer += f" (top senders: {top})"
+        footer += '\n'
+
+    text = header
+    for idx, line in enumerate(lines):
+        if len(text) + len(line) + len(footer) + 40 > max_length:
+            footer = f"\n...and {total - idx} more\n"
+            break
+        text += line
+    return (text + footer)[:max_length]
+
+
+def build_notifier(settings: Dict[str, Any]) -> Optional[DigestNotifier]:
+    """Build a notifier from ``settings.notification_channel``.
+
+    ``discord`` is a webhook URL. ``telegram`` is an object with ``bot_token``
+    and ``chat_id`` (plus optional ``api_base`` for a proxy or test server).
+    Either may also be an object with ``min_interval``/``max_retries``.
+    Returns None when no channel is configured.
+    """
+    conf = settings.get('notification_channel', {}) or {}
+    channels: List[Channel] = []
+
+    discord = conf.get('discord')
+    if isinstance(discord, str):
+        discord = {'webhook_url': discord}
+    if discord and discord.get('webhook_url'):
+        channels.append(DiscordChannel(
+            discord['webhook_url'],
+            min_interval=discord.get('min_interval'),
+            max_retries=discord.get('max_retries', 3)
+        ))
+
+    telegram = conf.get('telegram')
+    if telegram and isinstance(telegram, dict) and telegram.get('bot_token') and telegram.get('chat_id'):
+        api_base = telegram.get('api_base', 'https://api.telegram.org').rstrip('/')
+        channels.append(TelegramChannel(
+            f"{api_base}/bot{telegram['bot_token']}/sendMessage",
+            chat_id=str(telegram['chat_id']),
+            min_interval=telegram.get('min_interval'),
+            max_retries=telegram.get('max_retries', 3)
+        ))
+
+    if not channels:
+        return None
+
+    return DigestNotifier(
+        channels,
+        window=conf.get('digest_window', 60),
+        max_listed=conf.get('digest_max_listed', 10)
+    )
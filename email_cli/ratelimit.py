@@ -0,0 +1,181 @@
+"""Adaptive per-provider send rate limiting."""
+
+import re
+import time
+import socket
+import smtplib
+import threading
+from typing import Dict, Any, Optional, Iterator
+
+# SMTP replies providers use to say "slow down"
+THROTTLE_CODES = (421, 450, 451)
+
+# Back-off hints in reply text: "try again in 30 seconds", "retry after 2 min"
+_RETRY_AFTER_RE = re.compile(
+    rb'(?:try again|retry)(?: later)?[ -]?(?:in|after)?:?\s*(\d+(?:\.\d+)?)\s*(m(?:in(?:ute)?s?)?\b)?', re.I
+)
+
+
+class AdaptiveRateLimiter:
+    """Token bucket whose rate adapts AIMD-style to throttle responses.
+
+    Every send takes one token. Successful sends raise the rate additively
+    towards ``max_rate``; a throttle reply cuts it multiplicatively and pauses
+    the bucket, so a sender settles just under the provider's real ceiling.
+    Callers reserve tokens under a lock and sleep outside it, so one limiter
+    can be shared safely by many threads.
+    """
+
+    def __init__(
+        self,
+        max_rate: float,
+        burst: Optional[float] = None,
+        min_rate: Optional[float] = None,
+        increase: Optional[float] = None,
+        decrease: float = 0.5,
+        backoff: float = 5.0
+    ):
+        self.max_rate = max_rate
+        self.min_rate = min_rate if min_rate is not None else max_rate / 50
+        self.increase = increase if increase is not None else max_rate / 20
+        self.decrease = decrease
+        self.backoff = backoff
+        self.burst = burst if burst is not None else max(1.0, max_rate)
+        self.rate = max_rate
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self.stats = {
+            'acquired': 0,
+            'throttled': 0,
+            'waited_seconds': 0.0
+        }
+
+    def _refill(self, now: float):
+        elapsed = now - self._last
+        if elapsed > 0:
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+            self._last = now
+
+    def acquire(self) -> float:
+        """Block until a send is allowed; returns the seconds waited."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait = max(0.0, self._paused_until - now)
+            if self._tokens < 1:
+                wait += (1 - self._tokens) / self.rate
+            # Reserve the token now; the deficit is repaid by later refills
+            self._tokens -= 1
+            self.stats['acquired'] += 1
+            self.stats['waited_seconds'] += wait
+
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def on_success(self):
+        """Additive increase after a message was accepted."""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self, retry_after: Optional[float] = None):
+        """Multiplicative decrease and a pause after a throttle reply."""
+        with self._lock:
+            now = time.monotonic()
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            pause = retry_after if retry_after is not None else self.backoff
+            self._paused_until = max(self._paused_until, now + pause)
+            # Drop the burst allowance so the pause is not followed by a spike
+            self._tokens = min(self._tokens, 0.0)
+            self._last = max(self._last, self._paused_until)
+            self.stats['throttled'] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current limiter state for reporting."""
+        with self._lock:
+            return dict(
+                self.stats,
+                rate=round(self.rate, 4),
+                max_rate=self.max_rate,
+                paused_for=round(max(0.0, self._paused_until - time.monotonic()), 3)
+            )
+
+
+_limiters: Dict[str, AdaptiveRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(key: str, settings: Optional[Dict[str, Any]]) -> Optional[AdaptiveRateLimiter]:
+    """Get the process-wide limiter for an account/host, creating it once.
+
+    ``settings`` is the account's ``rate_limit`` block; without
+    ``messages_per_second`` no limiter is used.
+    """
+    if not settings or not settings.get('messages_per_second'):
+        return None
+
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = AdaptiveRateLimiter(
+                max_rate=float(settings['messages_per_second']),
+                burst=settings.get('burst'),
+                min_rate=settings.get('min_messages_per_second'),
+                increase=settings.get('increase'),
+                decrease=settings.get('decrease', 0.5),
+                backoff=settings.get('backoff_seconds', 5.0)
+            )
+            _limiters[key] = limiter
+        return limiter
+
+
+def all_limiters() -> Dict[str, AdaptiveRateLimiter]:
+    """All limiters created in this process, by key."""
+    with _limiters_lock:
+        return dict(_limiters)
+
+
+def is_throttle(error: Exception) -> bool:
+    """Whether an smtplib error means the provider is throttling us."""
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        codes = [code for code, _ in error.recipients.values()]
+        return bool(codes) and all(code in THROTTLE_CODES for code in codes)
+    code = getattr(error, 'smtp_code', None)
+    return code in THROTTLE_CODES
+
+
+def _replies(error: Exception) -> Iterator[bytes]:
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        replies = [reply for _, reply in error.recipients.values()]
+    else:
+        replies = [getattr(error, 'smtp_error', None) or str(error)]
+    for reply in replies:
+        yield reply if isinstance(reply, bytes) else str(reply).encode(errors='ignore')
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Seconds a throttle reply asks us to wait, if its text says."""
+    for reply in _replies(error):
+        match = _RETRY_AFTER_RE.search(reply)
+        if match:
+            return float(match.group(1)) * (60 if match.group(2) else 1)
+    return None
+
+
+def is_transient(error: Exception) -> bool:
+    """Whether a send failure is temporary: connection trouble or a 4xx reply.
+
+    Such failures are worth retrying through another account or relay.
+    """
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        codes = [code for code, _ in error.recipients.values()]
+        return bool(codes) and all(400 <= code < 500 for code in codes)
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    if isinstance(error, smtplib.SMTPException):
+        return isinstance(error, smtplib.SMTPServerDisconnected)
+    return isinstance(error, (ConnectionError, TimeoutError, socket.gaierror))
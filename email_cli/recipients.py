@@ -0,0 +1,207 @@
+"""Recipient groups backed by inline lists, CSV files or SQLite databases."""
+
+import os
+import csv
+import sqlite3
+from itertools import chain, islice
+from typing import Iterable, Iterator, List, Dict, Any, Optional, Tuple
+
+
+class RecipientSource:
+    """A lazily iterated recipient group."""
+
+    kind = 'inline'
+
+    def __iter__(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def count(self) -> int:
+        """Count addresses (before de-duplication)."""
+        return sum(1 for _ in self)
+
+    def page(self, page: int, page_size: int) -> List[str]:
+        """Get one 1-based page of addresses."""
+        start = (page - 1) * page_size
+        return list(islice(self, start, start + page_size))
+
+    def unique(self, skip: Optional[Iterable[str]] = None) -> Iterator[str]:
+        """Iterate addresses once each, case-insensitively, in source order."""
+        return unique(self, skip)
+
+
+class InlineSource(RecipientSource):
+    """Group defined as a JSON array in config."""
+
+    kind = 'inline'
+
+    def __init__(self, addresses: List[str]):
+        self.addresses = addresses
+
+    def __iter__(self) -> Iterator[str]:
+        for address in self.addresses:
+            address = address.strip()
+            if address:
+                yield address
+
+    def count(self) -> int:
+        return len(self.addresses)
+
+
+class CSVSource(RecipientSource):
+    """Group streamed from a CSV file, one row at a time."""
+
+    kind = 'csv'
+
+    def __init__(self, path: str, column: str = 'email', delimiter: str = ','):
+        self.path = path
+        self.column = column
+        self.delimiter = delimiter
+
+    def __iter__(self) -> Iterator[str]:
+        with open(self.path, 'r', newline='', encoding='utf-8-sig') as f:
+            reader = csv.DictReader(f, delimiter=self.delimiter)
+            if reader.fieldnames is None or self.column not in reader.fieldnames:
+                raise ValueError(f"Column '{self.column}' not found in {self.path}")
+            for row in reader:
+                address = (row.get(self.column) or '').strip()
+                if address:
+                    yield address
+
+
+class SQLiteSource(RecipientSource):
+    """Group read from a SQLite table with a server-side cursor."""
+
+    kind = 'sqlite'
+
+    def __init__(self, path: str, table: str = 'recipients', column: str = 'email', where: Optional[str] = None):
+        self.path = path
+        self.table = table
+        self.column = column
+        self.where = where
+
+    def _query(self, select: str, suffix: str = '') -> str:
+        query = f'SELECT {select} FROM "{self.table}"'
+        if self.where:
+            query += f' WHERE {self.where}'
+        return query + suffix
+
+    def _connect(self) -> sqlite3.Connection:
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f"Recipient database not found: {self.path}")
+        return sqlite3.connect(f'file:{self.path}?mode=ro', uri=True)
+
+    def __iter__(self) -> Iterator[str]:
+        conn = self._connect()
+        try:
+            cursor = conn.execute(self._query(f'"{self.column}"', ' ORDER BY rowid'))
+            while True:
+                rows = cursor.fetchmany(1000)
+                if not rows:
+                    break
+                for (address,) in rows:
+                    if address and address.strip():
+                        yield address.strip()
+        finally:
+            conn.close()
+
+    def count(self) -> int:
+        conn = self._connect()
+        try:
+            return conn.execute(self._query('COUNT(*)')).fetchone()[0]
+        finally:
+            conn.close()
+
+    def page(self, page: int, page_size: int) -> List[str]:
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                self._query(f'"{self.column}"', ' ORDER BY rowid LIMIT ? OFFSET ?'),
+                (page_size, (page - 1) * page_size)
+            ).fetchall()
+            return [address for (address,) in rows if address]
+        finally:
+            conn.close()
+
+
+def open_group(spec: Any, base_dir: str = '.') -> RecipientSource:
+    """Open a recipient group from its config entry.
+
+    An entry is either a list of addresses, ``{"csv": path, "column": ...}``
+    or ``{"sqlite": path, "table": ..., "column": ..., "where": ...}``.
+    Relative paths are resolved against the config file's directory.
+    """
+    if isinstance(spec, (list, tuple)):
+        return InlineSource(list(spec))
+
+    if isinstance(spec, dict):
+        if 'csv' in spec:
+            return CSVSource(
+                os.path.join(base_dir, os.path.expanduser(spec['csv'])),
+                column=spec.get('column', 'email'),
+                delimiter=spec.get('delimiter', ',')
+            )
+        if 'sqlite' in spec:
+            return SQLiteSource(
+                os.path.join(base_dir, os.path.expanduser(spec['sqlite'])),
+                table=spec.get('table', 'recipients'),
+                column=spec.get('column', 'email'),
+                where=spec.get('where')
+            )
+
+    raise ValueError(f"Unsupported recipient group definition: {spec!r}")
+
+
+def unique(addresses: Iterable[str], skip: Optional[Iterable[str]] = None) -> Iterator[str]:
+    """De-duplicate an address stream case-insensitively, keeping order.
+
+    The index only holds one lowercased string per distinct address, so
+    memory grows with the number of unique recipients, not with the file.
+    """
+    seen = {address.lower() for address in skip or ()}
+    for address in addresses:
+        key = address.lower()
+        if key not in seen:
+            seen.add(key)
+            yield address
+
+
+def chunked(addresses: Iterable[str], size: int) -> Iterator[List[str]]:
+    """Split an address stream into lists of at most ``size`` addresses."""
+    iterator = iter(addresses)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def address_group(
+    to: str,
+    group: RecipientSource,
+    cc: List[str],
+    bcc: List[str],
+    max_recipients: int,
+    per_recipient: bool = False
+) -> Tuple[str, List[str], Optional[Iterator[str]]]:
+    """Address a message to a group; returns ``(to, cc, bulk)``.
+
+    A large group (or ``per_recipient``) becomes ``bulk``, one lazy stream
+    of the group, CC and BCC for ``send_bulk``. Otherwise the first member
+    is the To address and the rest join CC; an empty group leaves ``to``
+    as it is.
+    """
+    if per_recipient or group.count() > max_recipients:
+        return to, cc, unique(chain(group, cc, bcc))
+    recipients = list(group.unique())
+    if recipients:
+        return recipients[0], cc + recipients[1:], None
+    return to, cc, None
+
+
+def describe_group(name: str, source: RecipientSource) -> Dict[str, Any]:
+    """Summary of a group for listings."""
+    return {
+        'name': name,
+        'type': source.kind,
+        'count': source.count()
+    }
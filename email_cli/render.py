@@ -0,0 +1,297 @@
+"""Mail merge: pre-render personalised messages to a spool across processes."""
+
+import os
+import csv
+import json
+import collections
+import concurrent.futures
+from email.parser import BytesHeaderParser
+from email.policy import compat32
+from email.utils import getaddresses
+from typing import Dict, Any, Callable, Iterator, List, Optional, Tuple
+
+from .export import MboxWriter, iter_mbox
+from .mime import attachment_part, is_international
+from .recipients import chunked
+from .smtp_client import SMTPClient, serialize_message
+from .state import StateStore
+
+FORMATS = ('spool', 'mbox')
+
+Progress = Callable[[Dict[str, Any]], None]
+
+
+def iter_rows(path: str) -> Iterator[Dict[str, Any]]:
+    """Yield one context dict per recipient from CSV, JSON Lines or JSON."""
+    if path.endswith('.jsonl') or path.endswith('.ndjson'):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    elif path.endswith('.json'):
+        with open(path, 'r', encoding='utf-8') as f:
+            yield from json.load(f)
+    else:
+        with open(path, 'r', newline='', encoding='utf-8-sig') as f:
+            yield from csv.DictReader(f)
+
+
+def spool_format(path: str, fmt: Optional[str] = None) -> str:
+    """The spool format for a path: given, or mbox for ``*.mbox`` files."""
+    if fmt:
+        return fmt
+    return 'mbox' if path.endswith('.mbox') or os.path.isfile(path) else 'spool'
+
+
+class _Renderer:
+    """Per-process state: compiled templates and a message builder."""
+
+    def __init__(
+        self,
+        account: Dict[str, Any],
+        subject: str,
+        template: Optional[str],
+        html: Optional[str],
+        body: Optional[str],
+        attachments: Optional[List[str]],
+        column: str,
+        spool_dir: Optional[str]
+    ):
+        from jinja2 import Environment
+        from .utils import env as template_env
+
+        self.smtp = SMTPClient(account)
+        strings = Environment()
+        self.subject = strings.from_string(subject or '')
+        self.body = strings.from_string(body) if body else None
+        self.html = None
+        if template:
+            try:
+                self.html = template_env.get_template(template)
+            except Exception:
+                self.html = template_env.get_template(f'{template}.html')
+        elif html:
+            self.html = template_env.from_string(html)
+        self.column = column
+        self.spool_dir = spool_dir
+        # Attachments are read once per process and shared by every message
+        self.attachments = [attachment_part(file_path) for file_path in attachments or []]
+
+    def render(self, index: int, row: Dict[str, Any]) -> Tuple[int, Optional[str], Any, Optional[str]]:
+        """Render one row to ``(index, to, bytes or spool size, error)``."""
+        to = None
+        try:
+            to = (row.get(self.column) or '').strip()
+            if not to:
+                raise ValueError(f"No '{self.column}' value")
+            html = self.html.render(**row) if self.html is not None else None
+            if self.body is not None:
+                body = self.body.render(**row)
+            else:
+                body = self.smtp._html_to_plain_text(html or '')
+
+            msg = self.smtp.build_message(
+                to, self.subject.render(**row), body, html,
+                utf8=is_international([self.smtp.username, to])
+            )
+            for part in self.attachments:
+                msg.attach(part)
+            data = serialize_message(msg)
+
+            if self.spool_dir is None:
+                return index, to, data, None
+            # Each worker writes its own files; only the size goes back
+            path = os.path.join(self.spool_dir, f'{index:08d}.eml')
+            with open(path + '.tmp', 'wb') as f:
+                f.write(data)
+            os.replace(path + '.tmp', path)
+            return index, to, len(data), None
+        except Exception as e:
+            return index, to, None, str(e)
+
+
+_renderer: Optional[_Renderer] = None
+
+
+def _init_worker(*args):
+    global _renderer
+    _renderer = _Renderer(*args)
+
+
+def _render_chunk(start: int, rows: List[Dict[str, Any]]) -> List[Tuple[int, Optional[str], Any, Optional[str]]]:
+    return [_renderer.render(start + offset, row) for offset, row in enumerate(rows)]
+
+
+def render_spool(
+    account: Dict[str, Any],
+    rows: Iterator[Dict[str, Any]],
+    output: str,
+    subject: str,
+    template: Optional[str] = None,
+    html: Optional[str] = None,
+    body: Optional[str] = None,
+    attachments: Optional[List[str]] = None,
+    column: str = 'email',
+    fmt: Optional[str] = None,
+    workers: Optional[int] = None,
+    chunk_size: int = 200,
+    progress: Optional[Progress] = None
+) -> Dict[str, Any]:
+    """Render one message per row into a spool directory or an mbox file.
+
+    Rows are rendered in chunks across a process pool, and results are
+    collected in row order with a bounded number of chunks in flight, so
+    progress is reported in order and memory stays flat. A spool holds
+    ``<row>.eml`` files written by the workers themselves; an mbox is
+    appended by this process. A row that fails to render is listed in
+    ``errors`` and left out without affecting the others.
+    """
+    fmt = spool_format(output, fmt)
+    workers = max(1, workers or os.cpu_count() or 1)
+    result = {
+        'success': False,
+        'output': output,
+        'format': fmt,
+        'workers': workers,
+        'rendered': 0,
+        'failed': 0,
+        'bytes': 0,
+        'errors': [],
+        'error': None
+    }
+    writer = None
+    pool = None
+
+    try:
+        if template and html:
+            raise ValueError("Cannot use both a template and inline HTML")
+        for file_path in attachments or []:
+            if not os.path.exists(file_path):
+                raise FileNotFoundError(f"Attachment not found: {file_path}")
+
+        spool_dir = None
+        if fmt == 'spool':
+            os.makedirs(output, exist_ok=True)
+            if any(name.endswith('.eml') for name in os.listdir(output)):
+                raise ValueError(f"Spool directory {output} already holds messages")
+            spool_dir = output
+        else:
+            if os.path.exists(output) and os.path.getsize(output):
+                raise ValueError(f"Spool file {output} already exists")
+            writer = MboxWriter(output)
+
+        args = (account, subject, template, html, body, attachments, column, spool_dir)
+        if workers > 1:
+            pool = concurrent.futures.ProcessPoolExecutor(workers, initializer=_init_worker, initargs=args)
+        else:
+            _init_worker(*args)
+
+        def collect(outcomes):
+            items = []
+            for index, to, data, error in outcomes:
+                if error is not None:
+                    result['failed'] += 1
+                    result['errors'].append({'row': index + 1, 'to': to, 'error': error})
+                    continue
+                result['rendered'] += 1
+                if writer is not None:
+                    items.append({'literal': data, 'internaldate': None})
+                    result['bytes'] += len(data)
+                else:
+                    result['bytes'] += data
+            if items:
+                writer.write(items)
+            if progress is not None:
+                progress({'rendered': result['rendered'], 'failed': result['failed'], 'bytes': result['bytes']})
+
+        pending = collections.deque()
+        start = 0
+        for chunk in chunked(rows, chunk_size):
+            if pool is None:
+                collect(_render_chunk(start, chunk))
+            else:
+                pending.append(pool.submit(_render_chunk, start, chunk))
+                # Keep a couple of chunks per worker queued, collecting oldest first
+                while len(pending) > workers * 2:
+                    collect(pending.popleft().result())
+            start += len(chunk)
+        while pending:
+            collect(pending.popleft().result())
+
+        result['success'] = result['rendered'] > 0 or result['failed'] == 0
+
+    except Exception as e:
+        result['error'] = str(e)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        if writer is not None:
+            writer.close()
+
+    return result
+
+
+def iter_spool(path: str) -> Iterator[Tuple[int, List[str], bytes]]:
+    """Yield ``(index, recipients, data)`` for each message of a spool.
+
+    Recipients are taken from the To and Cc headers. Data uses CRLF
+    line endings, ready to send.
+    """
+    parser = BytesHeaderParser(policy=compat32)
+
+    def envelope(data: bytes) -> List[str]:
+        headers = parser.parsebytes(data)
+        return [address for _, address in getaddresses(headers.get_all('To', []) + headers.get_all('Cc', []))
+                if address]
+
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            if not name.endswith('.eml'):
+                continue
+            with open(os.path.join(path, name), 'rb') as f:
+                data = f.read()
+            yield int(name[:-4]), envelope(data), data
+    else:
+        for index, (data, _, _) in enumerate(iter_mbox(path)):
+            data = data.replace(b'\r\n', b'\n').replace(b'\n', b'\r\n')
+            yield index, envelope(data), data
+
+
+def send_spool(
+    smtp: SMTPClient,
+    path: str,
+    restart: bool = False,
+    checkpoint_every: int = 100
+) -> Dict[str, Any]:
+    """Send every message of a spool, resuming where the last run stopped.
+
+    Progress is checkpointed next to the spool, so an interrupted run
+    picks up after the last message the server accepted or refused.
+    """
+    checkpoint = StateStore(os.path.join(path, '.send-state.json') if os.path.isdir(path)
+                            else f'{path}.send-state.json')
+    if restart:
+        checkpoint.set('done', None)
+    done = checkpoint.get('done')
+    skipped = 0
+
+    def messages():
+        nonlocal skipped
+        handled = 0
+        for index, recipients, data in iter_spool(path):
+            if done is not None and index <= done:
+                skipped += 1
+                continue
+            yield recipients, data
+            # Asked for the next message, so this one was accepted or refused;
+            # one that failed mid-send is never marked and goes out next run
+            checkpoint.set('done', index)
+            handled += 1
+            if handled % checkpoint_every == 0:
+                checkpoint.save()
+
+    result = smtp.send_prepared(messages())
+    checkpoint.save()
+    result['path'] = path
+    result['skipped'] = skipped
+    return result
@@ -0,0 +1,290 @@
+"""Spread sends across several accounts or relays, with failover."""
+
+import time
+import threading
+from typing import Dict, Any, Iterable, List, Optional
+
+from .smtp_client import SMTPClient
+from .recipients import chunked
+
+STRATEGIES = ('ewma', 'least_outstanding', 'weighted')
+
+
+class Route:
+    """One account in a routing group, with its health and latency state."""
+
+    def __init__(self, name: str, client: SMTPClient, weight: float = 1.0, sent_copy=None):
+        self.name = name
+        self.client = client
+        self.weight = max(float(weight), 0.001)
+        self.sent_copy = sent_copy
+        self.outstanding = 0
+        self.ewma: Optional[float] = None
+        self.failures = 0
+        self.down_until = 0.0
+        # Smooth weighted round-robin counter, used to break ties
+        self.current = 0.0
+        self.stats = {'sent': 0, 'failed': 0, 'failovers': 0}
+
+    def snapshot(self) -> Dict[str, Any]:
+        return dict(
+            self.stats,
+            account=self.name,
+            weight=self.weight,
+            outstanding=self.outstanding,
+            ewma_ms=round(self.ewma * 1000, 3) if self.ewma is not None else None,
+            down_for=round(max(0.0, self.down_until - time.monotonic()), 3)
+        )
+
+
+class Router:
+    """Send through the healthiest, fastest account of a routing group.
+
+    ``ewma`` prefers the lowest smoothed latency scaled by in-flight sends,
+    ``least_outstanding`` the fewest in-flight sends per unit of weight, and
+    ``weighted`` plain smooth weighted round-robin. Ties are broken by
+    weighted round-robin, so equal routes share the load in proportion to
+    their weights. A connection error or 4xx reply takes the route out of
+    rotation for a cooldown that doubles with each consecutive failure, and
+    the message is retried on the next route.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        routes: List[Route],
+        strategy: str = 'ewma',
+        alpha: float = 0.3,
+        cooldown: float = 30.0,
+        max_cooldown: float = 300.0,
+        max_attempts: Optional[int] = None,
+        slice_size: int = 1000
+    ):
+        if not routes:
+            raise ValueError(f"Route '{name}' has no accounts")
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown routing strategy '{strategy}' (expected one of {', '.join(STRATEGIES)})")
+        self.name = name
+        self.routes = routes
+        self.strategy = strategy
+        self.alpha = alpha
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.max_attempts = max_attempts or len(routes)
+        # Recipients handed to one account at a time during bulk sends
+        self.slice_size = slice_size
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config, name: str, suppression=None, timings: bool = False) -> 'Router':
+        """Build a router for ``routes.<name>`` in the config.
+
+        A route lists accounts either as ``{"primary": 3, "work": 1}``
+        (account to weight) or as a list of names or
+        ``{"account": ..., "weight": ...}`` objects.
+        """
+        from .sent_copy import SentCopier
+
+        spec = config.get_route(name)
+        if spec is None:
+            raise ValueError(f"Route '{name}' not found in configuration")
+
+        accounts = spec.get('accounts', {})
+        if isinstance(accounts, dict):
+            entries = list(accounts.items())
+        else:
+            entries = [
+                (entry, 1) if isinstance(entry, str) else (entry['account'], entry.get('weight', 1))
+                for entry in accounts
+            ]
+
+        settings = config.get_settings()
+        all_accounts = config.get_all_accounts()
+        routes = []
+        for account_name, weight in entries:
+            if account_name not in all_accounts:
+                raise ValueError(f"Route '{name}' uses unknown account '{account_name}'")
+            account = all_accounts[account_name]
+            sent_copy = SentCopier.for_sending(settings, account)
+            client = SMTPClient(account, suppression=suppression, timings=timings, sent_copy=sent_copy)
+            routes.append(Route(account_name, client, weight, sent_copy))
+
+        return cls(
+            name,
+            routes,
+            strategy=spec.get('strategy', 'ewma'),
+            alpha=spec.get('ewma_alpha', 0.3),
+            cooldown=spec.get('cooldown_seconds', 30.0),
+            max_attempts=spec.get('max_attempts'),
+            slice_size=spec.get('slice_size', 1000)
+        )
+
+    def _score(self, route: Route) -> float:
+        if self.strategy == 'ewma':
+            # Untried routes score 0, so each gets probed once
+            return (route.ewma or 0.0) * (route.outstanding + 1) / route.weight
+        if self.strategy == 'least_outstanding':
+            return route.outstanding / route.weight
+        return 0.0
+
+    def acquire(self, exclude: Iterable[str] = ()) -> Optional[Route]:
+        """Pick a route and count the send as in flight."""
+        with self._lock:
+            now = time.monotonic()
+            candidates = [route for route in self.routes if route.name not in exclude]
+            if not candidates:
+                return None
+            healthy = [route for route in candidates if route.down_until <= now]
+            if not healthy:
+                # Everything is cooling down: try whichever recovers first
+                healthy = [min(candidates, key=lambda route: route.down_until)]
+
+            best = min(self._score(route) for route in healthy)
+            tied = [route for route in healthy if self._score(route) <= best]
+
+            total = sum(route.weight for route in tied)
+            for route in tied:
+                route.current += route.weight
+            chosen = max(tied, key=lambda route: route.current)
+            chosen.current -= total
+
+            chosen.outstanding += 1
+            return chosen
+
+    def release(self, route: Route, elapsed: float, ok: bool, transient: bool):
+        """Record the outcome of a send on ``route``."""
+        with self._lock:
+            route.outstanding -= 1
+            if ok:
+                route.failures = 0
+                route.down_until = 0.0
+                route.ewma = elapsed if route.ewma is None else \
+                    self.alpha * elapsed + (1 - self.alpha) * route.ewma
+                route.stats['sent'] += 1
+            else:
+                route.stats['failed'] += 1
+                if transient:
+                    route.failures += 1
+                    route.stats['failovers'] += 1
+                    pause = min(self.max_cooldown, self.cooldown * 2 ** (route.failures - 1))
+                    route.down_until = time.monotonic() + pause
+
+    def _send(self, send, can_retry=lambda result: True) -> Dict[str, Any]:
+        """Run ``send(route)`` on routes until one succeeds or fails for good."""
+        attempts = []
+        result: Dict[str, Any] = {'success': False, 'error': f"Route '{self.name}' has no usable account"}
+        while len(attempts) < self.max_attempts:
+            route = self.acquire(exclude=[attempt['account'] for attempt in attempts])
+            if route is None:
+                break
+
+            start = time.perf_counter()
+            result = send(route)
+            ok = not result.get('error') and result.get('success', True) is not False
+            transient = bool(result.get('transient'))
+            self.release(route, time.perf_counter() - start, ok, transient)
+
+            attempts.append({'account': route.name, 'error': result.get('error')})
+            if ok or not transient or not can_retry(result):
+                break
+
+        result['route'] = {
+            'group': self.name,
+            'account': attempts[-1]['account'] if attempts else None,
+            'attempts': attempts
+        }
+        return result
+
+    def send_email(self, to: str, subject: str, body: str, **kwargs) -> Dict[str, Any]:
+        """Send an email through the group, failing over between accounts."""
+        return self._send(lambda route: route.client.send_email(to, subject, body, **kwargs))
+
+    def send_template_email(
+        self,
+        to: str,
+        subject: str,
+        template_name: str,
+        context: Dict[str, Any],
+        **kwargs
+    ) -> Dict[str, Any]:
+        """Render a template once and send it through the group."""
+        from .utils import render_template
+
+        html = render_template(template_name, context)
+        plain_text = self.routes[0].client._html_to_plain_text(html)
+        return self.send_email(to, subject, plain_text, html=html, **kwargs)
+
+    def send_bulk(
+        self,
+        recipients: Iterable[str],
+        subject: str,
+        body: Optional[str],
+        per_recipient: bool = False,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """Send to a recipient stream, spreading slices of it across accounts.
+
+        When a send fails partway through a slice, only the addresses it
+        never attempted are retried on another account, so no recipient
+        is mailed twice. Addresses no account got to are counted as
+        failed, with the error in ``refused``.
+        """
+        result = {
+            'success': False,
+            'subject': subject,
+            'messages': 0,
+            'sent': 0,
+            'failed': 0,
+            'refused': {},
+            'suppressed': 0,
+            'connections': 0,
+            'throttled': 0,
+            'routes': {},
+            'errors': [],
+            'error': None
+        }
+        saved: set = set()
+
+        def send_slice(route: Route, addresses: List[str], pending: List[str]) -> Dict[str, Any]:
+            # A shared message is saved to each account's Sent folder once
+            save_sent = per_recipient or route.name not in saved
+            stream = iter(addresses)
+            outcome = route.client.send_bulk(stream, subject, body, per_recipient=per_recipient,
+                                             save_sent=save_sent, **kwargs)
+            if outcome['messages']:
+                saved.add(route.name)
+
+            # Every attempt's deliveries count, even when a retry follows
+            for key in ('messages', 'sent', 'failed', 'suppressed', 'connections', 'throttled'):
+                result[key] += outcome.get(key, 0)
+            result['refused'].update(outcome.get('refused', {}))
+            pending[:] = outcome.get('unsent', []) + list(stream) if outcome.get('error') else []
+            attempted = len(addresses) - len(pending)
+            if attempted:
+                result['routes'][route.name] = result['routes'].get(route.name, 0) + attempted
+            return outcome
+
+        for addresses in chunked(recipients, self.slice_size):
+            pending = list(addresses)
+            outcome = self._send(lambda route: send_slice(route, list(pending), pending),
+                                 can_retry=lambda outcome: bool(pending))
+            if outcome.get('error'):
+                account = outcome['route']['account']
+                result['errors'].append({'account': account, 'recipients': len(pending), 'error': outcome['error']})
+                result['failed'] += len(pending)
+                for address in pending:
+                    result['refused'][address] = f"Not sent: {outcome['error']}"
+
+        if result['errors']:
+            result['error'] = result['errors'][-1]['error']
+        result['success'] = not result['errors'] and (result['sent'] > 0 or result['failed'] == 0)
+        return result
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Current state of every route."""
+        with self._lock:
+            return [route.snapshot() for route in self.routes]
+
+    def close(self) -> Dict[str, Any]:
+        """Flush Sent copies; returns their stats by account."""
+        return {route.name: route.sent_copy.close() for route in self.routes if route.sent_copy is not None}
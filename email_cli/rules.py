@@ -0,0 +1,412 @@
+"""Declarative rules for filing incoming mail in bulk."""
+
+import re
+import json
+import email
+from email.mime.message import MIMEMessage
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email.parser import BytesHeaderParser
+from email.policy import compat32
+from typing import Dict, Any, Iterable, List, Optional, Set, Tuple
+
+from .imap_client import IMAPClient, parse_fetch_response, quote_folder, uid_set
+from .metrics import start_timings
+from .state import StateStore, watermark_key
+
+# Header fields every rule set fetches; rules may add more
+BASE_FIELDS = ('FROM', 'TO', 'CC', 'SUBJECT')
+CONDITIONS = ('from', 'to', 'subject', 'header', 'size_over', 'size_under')
+ACTIONS = ('move', 'copy', 'flag', 'mark_read', 'delete', 'forward')
+
+_REGEX_RE = re.compile(r'^/(.*)/([imsx]*)$', re.S)
+
+
+def compile_pattern(value: str) -> Tuple[str, int]:
+    """Turn a rule value into ``(regex source, flags)``.
+
+    ``/regex/flags`` is a regular expression; anything else is a
+    case-insensitive substring.
+    """
+    match = _REGEX_RE.match(value)
+    if not match:
+        return re.escape(value), re.IGNORECASE
+    flags = 0
+    for letter in match.group(2):
+        flags |= {'i': re.IGNORECASE, 'm': re.MULTILINE, 's': re.DOTALL, 'x': re.VERBOSE}[letter]
+    return match.group(1), flags
+
+
+def _scoped(source: str, flags: int) -> str:
+    letters = ''.join(letter for flag, letter in ((re.IGNORECASE, 'i'), (re.MULTILINE, 'm'),
+                                                   (re.DOTALL, 's'), (re.VERBOSE, 'x')) if flags & flag)
+    return f'(?{letters}:{source})' if letters else f'(?:{source})'
+
+
+def _inline_flags(pattern: re.Pattern) -> int:
+    """Flags a pattern sets in its own source, such as ``(?i)``."""
+    return re.compile(pattern.pattern).flags & ~re.UNICODE
+
+
+class FieldMatcher:
+    """Every pattern used on one header field, matched together.
+
+    The patterns are also joined into one alternation. A message whose
+    field the combined regex does not match skips every pattern of the
+    field in one search, which is the common case; only on a hit are the
+    individual patterns checked to tell which rules matched. Some patterns
+    stay out of the alternation and are searched on their own:
+    - patterns with groups, which could hold backreferences;
+    - verbose ones, whose ``#`` comments would swallow the alternatives
+      after them;
+    - ones with inline global flags like ``(?x)``, which are only
+      allowed at the start of a whole regex.
+    """
+
+    def __init__(self):
+        self.patterns: List[re.Pattern] = []
+        self._index: Dict[Tuple[str, int], int] = {}
+        self.combined: Optional[re.Pattern] = None
+        self._always: List[int] = []
+
+    def add(self, value: str) -> int:
+        """Register a pattern; identical patterns share one id."""
+        key = compile_pattern(value)
+        if key not in self._index:
+            try:
+                self.patterns.append(re.compile(*key))
+            except re.error as e:
+                raise ValueError(f"Invalid pattern {value!r}: {e}")
+            self._index[key] = len(self.patterns) - 1
+        return self._index[key]
+
+    def build(self):
+        grouped = []
+        for pid, pattern in enumerate(self.patterns):
+            if pattern.groups or pattern.flags & re.VERBOSE or _inline_flags(pattern):
+                self._always.append(pid)
+            else:
+                grouped.append(pid)
+        self._grouped = grouped
+        if grouped:
+            self.combined = re.compile('|'.join(
+                _scoped(self.patterns[pid].pattern, self.patterns[pid].flags & ~re.UNICODE) for pid in grouped
+            ))
+
+    def matches(self, value: str) -> Set[int]:
+        """Ids of the patterns that match ``value``."""
+        hits = {pid for pid in self._always if self.patterns[pid].search(value)}
+        if self.combined is not None and self.combined.search(value):
+            hits.update(pid for pid in self._grouped if self.patterns[pid].search(value))
+        return hits
+
+
+class Rule:
+    """One rule: conditions on header fields and size, plus actions."""
+
+    def __init__(self, spec: Dict[str, Any], fields: Dict[str, FieldMatcher], index: int):
+        self.name = spec.get('name') or f'rule {index + 1}'
+        self.match_any = spec.get('match_any', False)
+        self.stop = spec.get('stop', True)
+        # (field, pattern ids): the condition holds if any of the ids matched
+        self.conditions: List[Tuple[str, Set[int]]] = []
+        self.size_over = self.size_under = None
+
+        match = spec.get('match', {})
+        unknown = set(match) - set(CONDITIONS)
+        if unknown:
+            raise ValueError(f"{self.name}: unknown condition(s) {', '.join(sorted(unknown))}")
+        for field in ('from', 'to', 'subject'):
+            if field in match:
+                self._add_condition(field, match[field], fields)
+        for header, value in match.get('header', {}).items():
+            self._add_condition(header.lower(), value, fields)
+        self.size_over = match.get('size_over')
+        self.size_under = match.get('size_under')
+
+        self.actions = spec.get('actions', [])
+        if isinstance(self.actions, dict):
+            self.actions = [{key: value} for key, value in self.actions.items()]
+        if not self.actions:
+            raise ValueError(f"{self.name}: no actions")
+        for action in self.actions:
+            if len(action) != 1 or next(iter(action)) not in ACTIONS:
+                raise ValueError(f"{self.name}: invalid action {action!r} (expected one of {', '.join(ACTIONS)})")
+
+    def _add_condition(self, field: str, value, fields: Dict[str, FieldMatcher]):
+        values = value if isinstance(value, list) else [value]
+        matcher = fields.setdefault(field, FieldMatcher())
+        self.conditions.append((field, {matcher.add(str(item)) for item in values}))
+
+    def applies(self, hits: Dict[str, Set[int]], size: int) -> bool:
+        results = [bool(ids & hits.get(field, set())) for field, ids in self.conditions]
+        if self.size_over is not None:
+            results.append(size > self.size_over)
+        if self.size_under is not None:
+            results.append(size < self.size_under)
+        if not results:
+            # No conditions: a catch-all
+            return True
+        return any(results) if self.match_any else all(results)
+
+
+class RuleSet:
+    """Rules compiled for matching many messages in one pass each.
+
+    A rules file is a JSON list of rules (or ``{"rules": [...]}``)::
+
+        {"name": "alerts",
+         "match": {"from": "alerts@example.com", "subject": "/^\\\\[(ALERT|CRIT)\\\\]/i",
+                   "header": {"List-Id": "ops"}, "size_over": 1000000},
+         "actions": [{"move": "Alerts"}, {"flag": "\\\\Flagged"}]}
+
+    Conditions must all hold unless ``match_any`` is set. Rules apply in
+    order and the first match wins unless it sets ``"stop": false``.
+    """
+
+    def __init__(self, specs: List[Dict[str, Any]]):
+        self.fields: Dict[str, FieldMatcher] = {}
+        self.rules = [Rule(spec, self.fields, index) for index, spec in enumerate(specs)]
+        for matcher in self.fields.values():
+            matcher.build()
+
+    @classmethod
+    def from_file(cls, path: str) -> 'RuleSet':
+        with open(path, 'r') as f:
+            data = json.load(f)
+        return cls(data.get('rules', []) if isinstance(data, dict) else data)
+
+    @property
+    def header_fields(self) -> List[str]:
+        """Header fields to fetch: the base set plus any rule uses."""
+        extra = {field.upper() for field in self.fields if field not in ('from', 'to', 'subject')}
+        return list(BASE_FIELDS) + sorted(extra - set(BASE_FIELDS))
+
+    def evaluate(self, headers: Dict[str, str], size: int) -> List[Tuple['Rule', Dict[str, Any]]]:
+        """Rules that match a message, with the actions to take, in order."""
+        hits = {field: matcher.matches(headers.get(field, '')) for field, matcher in self.fields.items()}
+        matched = []
+        for rule in self.rules:
+            if rule.applies(hits, size):
+                matched.append(rule)
+                if rule.stop:
+                    break
+        return matched
+
+    def run(
+        self,
+        imap: IMAPClient,
+        folder: str = 'INBOX',
+        since_uid: Optional[int] = None,
+        uidvalidity: Optional[int] = None,
+        smtp=None,
+        dry_run: bool = False,
+        batch_size: int = 500,
+        timings: bool = False
+    ) -> Dict[str, Any]:
+        """Apply the rules to a folder.
+
+        Only messages above ``since_uid`` are looked at (all of them when it
+        is None or UIDVALIDITY changed). Headers are fetched without the
+        body, and the actions are grouped so each target folder or flag
+        costs one UID MOVE/COPY/STORE per thousand messages.
+        """
+        t = start_timings('rules', timings)
+        result = {
+            'folder': folder,
+            'scanned': 0,
+            'matched': 0,
+            'rules': {},
+            'actions': {},
+            'uidvalidity': uidvalidity,
+            'last_uid': since_uid,
+            'dry_run': dry_run,
+            'errors': [],
+            'error': None
+        }
+        parser = BytesHeaderParser(policy=compat32)
+        fields = ' '.join(self.header_fields)
+
+        try:
+            with imap.connect(t) as server:
+                with t.phase('select'):
+                    status, data = server.select(quote_folder(folder), readonly=dry_run)
+                    if status != 'OK':
+                        raise ValueError(f"Cannot open folder {folder}: {data}")
+                    current = int(server.untagged_responses.get('UIDVALIDITY', [b'0'])[-1])
+                    if current != uidvalidity:
+                        since_uid = None
+                    criteria = f'UID {since_uid + 1}:*' if since_uid is not None else 'ALL'
+                    uids = [uid for uid in imap.uid_search(server, criteria) if since_uid is None or uid > since_uid]
+
+                # Target -> UIDs, filled while matching and applied in bulk afterwards
+                moves: Dict[str, List[int]] = {}
+                copies: Dict[str, List[int]] = {}
+                flags: Dict[str, List[int]] = {}
+                deletes: List[int] = []
+                forwards: Dict[str, List[int]] = {}
+                summaries: Dict[int, Dict[str, str]] = {}
+
+                for start in range(0, len(uids), batch_size):
+                    batch = uids[start:start + batch_size]
+                    with t.phase('fetch'):
+                        status, data = server.uid(
+                            'FETCH', uid_set(batch), f'(UID RFC822.SIZE BODY.PEEK[HEADER.FIELDS ({fields})])'
+                        )
+                    if status != 'OK':
+                        raise ValueError(f"Fetch failed: {status}")
+
+                    with t.phase('match'):
+                        for item in parse_fetch_response(data):
+                            if item['uid'] is None:
+                                continue
+                            result['scanned'] += 1
+                            headers = parser.parsebytes(item['literal'] or b'')
+                            values = {
+                                'from': imap._decode_header(headers['From']),
+                                'to': ', '.join(imap._decode_header(headers[name]) for name in ('To', 'Cc')
+                                                if headers[name]),
+                                'subject': imap._decode_header(headers['Subject'])
+                            }
+                            for field in self.fields:
+                                if field not in values:
+                                    values[field] = imap._decode_header(headers[field])
+                            matched = self.evaluate(values, item['size'] or 0)
+                            if not matched:
+                                continue
+
+                            result['matched'] += 1
+                            moved = False
+                            for rule in matched:
+                                result['rules'][rule.name] = result['rules'].get(rule.name, 0) + 1
+                                for action in rule.actions:
+                                    (kind, target), = action.items()
+                                    if kind == 'move' and not moved:
+                                        moves.setdefault(target, []).append(item['uid'])
+                                        moved = True
+                                    elif kind == 'delete' and target and not moved:
+                                        deletes.append(item['uid'])
+                                        moved = True
+                                    elif kind == 'copy':
+                                        copies.setdefault(target, []).append(item['uid'])
+                                    elif kind in ('flag', 'mark_read') and target:
+                                        flag = '\\Seen' if kind == 'mark_read' else target
+                                        flags.setdefault(flag, []).append(item['uid'])
+                                    elif kind == 'forward':
+                                        forwards.setdefault(target, []).append(item['uid'])
+                                        summaries[item['uid']] = values
+
+                # The mark only moves once every message has been matched
+                result['uidvalidity'] = current
+                result['last_uid'] = max(uids) if uids else since_uid
+
+                def tally(kind: str, target: str, uids: List[int]):
+                    result['actions'][f'{kind}:{target}' if target else kind] = len(uids)
+
+                for target, group in forwards.items():
+                    tally('forward', target, group)
+                for flag, group in flags.items():
+                    tally('flag', flag, group)
+                for target, group in copies.items():
+                    tally('copy', target, group)
+                for target, group in moves.items():
+                    tally('move', target, group)
+                if deletes:
+                    tally('delete', '', deletes)
+
+                if not dry_run:
+                    with t.phase('apply'):
+                        capabilities = imap.server_capabilities(server)
+                        # Forward while the messages are still here, move them last
+                        for target, group in forwards.items():
+                            self._guard(result, f'forward:{target}',
+                                        lambda: self._forward(imap, server, smtp, target, group))
+                        for flag, group in flags.items():
+                            self._guard(result, f'flag:{flag}',
+                                        lambda: imap.store_flags(server, group, f'({flag})'))
+                        for target, group in copies.items():
+                            self._guard(result, f'copy:{target}', lambda: imap.copy_messages(server, group, target))
+                        for target, group in moves.items():
+                            self._guard(result, f'move:{target}',
+                                        lambda: imap.move_messages(server, group, target, capabilities))
+                        if deletes:
+                            def delete():
+                                imap.store_flags(server, deletes, '(\\Deleted)')
+                                imap.expunge_uids(server, deletes, capabilities)
+                            self._guard(result, 'delete', delete)
+
+        except Exception as e:
+            result['error'] = str(e)
+
+        if result['errors'] and not result['error']:
+            result['error'] = result['errors'][0]['error']
+        result['success'] = result['error'] is None
+        return t.finish(result)
+
+    @staticmethod
+    def _guard(result: Dict[str, Any], action: str, apply):
+        """Run one bulk action, recording a failure without stopping the rest."""
+        try:
+            apply()
+        except Exception as e:
+            result['errors'].append({'action': action, 'error': str(e)})
+
+    def _forward(self, imap: IMAPClient, server, smtp, target: str, uids: List[int]):
+        """Forward messages as attachments over one SMTP connection."""
+        from .smtp_client import serialize_message
+
+        if smtp is None:
+            raise ValueError('Forwarding needs an SMTP account')
+        connection = smtp.connect()
+        try:
+            for uid, raw in imap.uid_fetch_raw(server, uids):
+                original = email.message_from_bytes(raw)
+                msg = MIMEMultipart()
+                msg['From'] = smtp.username
+                msg['To'] = target
+                msg['Subject'] = f"Fwd: {imap._decode_header(original['Subject'])}"
+                msg.attach(MIMEText(f"Forwarded by rule from {imap._decode_header(original['From'])}.", 'plain'))
+                msg.attach(MIMEMessage(original))
+                if smtp.limiter is not None:
+                    smtp.limiter.acquire()
+                connection.sendmail(smtp.username, [target], serialize_message(msg))
+        finally:
+            smtp._close(connection)
+
+
+def load_rules(config, path: Optional[str] = None) -> RuleSet:
+    """Rules from a file, or the ``rules`` list in the config."""
+    if path:
+        return RuleSet.from_file(path)
+    specs = config.config.get('rules')
+    if not specs:
+        raise ValueError("No rules: pass --file or add a 'rules' list to the config")
+    return RuleSet(specs)
+
+
+def run_rules(
+    imap: IMAPClient,
+    rules: RuleSet,
+    state: StateStore,
+    account: str,
+    folder: str = 'INBOX',
+    smtp=None,
+    dry_run: bool = False,
+    rescan: bool = False,
+    timings: bool = False
+) -> Dict[str, Any]:
+    """Apply rules to mail that arrived in a folder since the last run.
+
+    The first run (or ``rescan``) covers the whole folder. The watermark
+    advances once every new message was matched, even if a bulk action
+    failed; those messages stay where they are and the failure is listed
+    in ``errors``.
+    """
+    key = f'rules:{watermark_key(account, folder)}'
+    mark = {} if rescan else state.get(key, {})
+    result = rules.run(imap, folder, since_uid=mark.get('last_uid'), uidvalidity=mark.get('uidvalidity'),
+                       smtp=smtp, dry_run=dry_run, timings=timings)
+    if not dry_run and result['last_uid'] is not None:
+        state.set(key, {'uidvalidity': result['uidvalidity'], 'last_uid': result['last_uid']})
+        state.save()
+    return result
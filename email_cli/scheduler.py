@@ -0,0 +1,529 @@
+"""Scheduled sends: a persistent queue and the daemon that fires it."""
+
+import os
+import re
+import json
+import heapq
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from collections import deque
+from typing import Dict, Any, Deque, Iterable, List, Optional, Tuple
+
+from .state import get_state_dir
+from .metrics import REGISTRY
+
+_RELATIVE_RE = re.compile(r'^\+(\d+)\s*([smhd])$')
+_TIME_RE = re.compile(r'^(\d{1,2}):(\d{2})$')
+_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+SCHEDULED = REGISTRY.counter('email_cli_scheduled', 'Scheduled sends by outcome')
+
+
+def get_timezone(name: Optional[str]):
+    """Resolve an IANA time zone name; None means the local zone."""
+    if not name:
+        return None
+    from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Unknown time zone '{name}'")
+
+
+def parse_send_time(value: str, tz_name: Optional[str] = None, now: Optional[float] = None) -> float:
+    """Turn a ``--at`` value into a UTC timestamp.
+
+    Accepts ``+30m``/``+2h``/``+1d`` offsets, ``HH:MM`` (the next such time
+    in the zone) or an ISO date and time. Times without an offset are read
+    in ``tz_name``, or the local zone when none is given.
+    """
+    now = time.time() if now is None else now
+    value = value.strip()
+    tz = get_timezone(tz_name)
+
+    match = _RELATIVE_RE.match(value)
+    if match:
+        return now + int(match.group(1)) * _UNITS[match.group(2)]
+
+    match = _TIME_RE.match(value)
+    if match:
+        hour, minute = int(match.group(1)), int(match.group(2))
+        if hour > 23 or minute > 59:
+            raise ValueError(f"Invalid time '{value}'")
+        current = datetime.fromtimestamp(now, tz)
+        target = current.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if target.timestamp() <= now:
+            # Same wall-clock time tomorrow, across DST changes
+            target = (current + timedelta(days=1)).replace(hour=hour, minute=minute, second=0, microsecond=0)
+        return target.timestamp()
+
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid send time '{value}' (use HH:MM, an ISO date/time or +30m)")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=tz) if tz is not None else parsed.astimezone()
+    return parsed.timestamp()
+
+
+def format_send_time(timestamp: float, tz_name: Optional[str] = None) -> str:
+    """Show a timestamp in the zone it was scheduled in."""
+    try:
+        tz = get_timezone(tz_name)
+    except ValueError:
+        tz = None
+    return datetime.fromtimestamp(timestamp, tz or timezone.utc).isoformat(timespec='seconds')
+
+
+class ScheduleStore:
+    """Scheduled sends in SQLite.
+
+    Pending rows are indexed by ``(status, due)`` so the daemon reads due
+    work and new arrivals as index range scans, never full table scans.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript('''
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            CREATE TABLE IF NOT EXISTS scheduled (
+                id INTEGER PRIMARY KEY,
+                due REAL NOT NULL,
+                tz TEXT,
+                status TEXT NOT NULL DEFAULT 'pending',
+                account TEXT,
+                route TEXT,
+                payload TEXT NOT NULL,
+                created REAL,
+                attempts INTEGER DEFAULT 0,
+                sent_at REAL,
+                error TEXT
+            );
+            CREATE INDEX IF NOT EXISTS scheduled_status_due ON scheduled (status, due);
+        ''')
+        self._conn.commit()
+
+    @classmethod
+    def from_settings(cls, settings: Dict[str, Any]) -> 'ScheduleStore':
+        """Open the schedule database configured in settings."""
+        conf = settings.get('schedule', {}) or {}
+        path = conf.get('db') or os.path.join(get_state_dir(settings), 'schedule.db')
+        return cls(os.path.expanduser(path))
+
+    def add(
+        self,
+        due: float,
+        payload: Dict[str, Any],
+        account: Optional[str] = None,
+        route: Optional[str] = None,
+        tz: Optional[str] = None
+    ) -> int:
+        """Queue a send; returns its id."""
+        cursor = self._conn.execute(
+            'INSERT INTO scheduled (due, tz, account, route, payload, created) VALUES (?, ?, ?, ?, ?, ?)',
+            (due, tz, account, route, json.dumps(payload), time.time())
+        )
+        self._conn.commit()
+        return cursor.lastrowid
+
+    def cancel(self, item_id: int) -> bool:
+        """Cancel a pending send."""
+        cursor = self._conn.execute(
+            "UPDATE scheduled SET status = 'canceled' WHERE id = ? AND status = 'pending'", (item_id,)
+        )
+        self._conn.commit()
+        return cursor.rowcount > 0
+
+    def pending(self, after_id: int = 0) -> List[Tuple[float, int]]:
+        """``(due, id)`` of pending sends with an id above ``after_id``."""
+        return [tuple(row) for row in self._conn.execute(
+            # +status keeps this a rowid range scan rather than an index scan
+            "SELECT due, id FROM scheduled WHERE +status = 'pending' AND id > ?", (after_id,)
+        )]
+
+    def claim(self, ids: Iterable[int], now: float) -> List[sqlite3.Row]:
+        """Mark due pending sends as in progress and return them.
+
+        Rows canceled or already claimed since they were queued are skipped.
+        """
+        claimed = []
+        with self._conn:
+            for item_id in ids:
+                cursor = self._conn.execute(
+                    "UPDATE scheduled SET status = 'sending', attempts = attempts + 1 "
+                    "WHERE id = ? AND status = 'pending' AND due <= ?",
+                    (item_id, now)
+                )
+                if cursor.rowcount:
+                    claimed.append(self._conn.execute('SELECT * FROM scheduled WHERE id = ?', (item_id,)).fetchone())
+        return claimed
+
+    def finish(self, outcomes: Iterable[Tuple[int, str, Optional[str], Optional[float]]]):
+        """Record ``(id, status, error, due)`` outcomes in one transaction.
+
+        A ``due`` time puts the send back in the queue as pending.
+        """
+        now = time.time()
+        with self._conn:
+            for item_id, status, error, due in outcomes:
+                if due is not None:
+                    self._conn.execute(
+                        "UPDATE scheduled SET status = 'pending', due = ?, error = ? WHERE id = ?",
+                        (due, error, item_id)
+                    )
+                else:
+                    self._conn.execute(
+                        'UPDATE scheduled SET status = ?, error = ?, sent_at = ? WHERE id = ?',
+                        (status, error, now if status == 'sent' else None, item_id)
+                    )
+
+    def release(self, ids: Iterable[int]):
+        """Return claimed sends that never started to the queue."""
+        with self._conn:
+            self._conn.executemany(
+                "UPDATE scheduled SET status = 'pending', attempts = attempts - 1 WHERE id = ? AND status = 'sending'",
+                [(item_id,) for item_id in ids]
+            )
+
+    def recover(self) -> int:
+        """Requeue sends left in progress by a daemon that stopped mid-send."""
+        cursor = self._conn.execute("UPDATE scheduled SET status = 'pending' WHERE status = 'sending'")
+        self._conn.commit()
+        return cursor.rowcount
+
+    def list(self, status: Optional[str] = 'pending', limit: int = 50) -> List[Dict[str, Any]]:
+        """Scheduled sends, soonest first."""
+        if status:
+            rows = self._conn.execute(
+                'SELECT * FROM scheduled WHERE status = ? ORDER BY due LIMIT ?', (status, limit)
+            )
+        else:
+            rows = self._conn.execute('SELECT * FROM scheduled ORDER BY due LIMIT ?', (limit,))
+        items = []
+        for row in rows:
+            payload = json.loads(row['payload'])
+            items.append({
+                'id': row['id'],
+                'due': format_send_time(row['due'], row['tz']),
+                'status': row['status'],
+                'account': row['account'],
+                'route': row['route'],
+                'to': payload.get('to'),
+                'subject': payload.get('subject'),
+                'attempts': row['attempts'],
+                'error': row['error']
+            })
+        return items
+
+    def counts(self) -> Dict[str, int]:
+        """Number of scheduled sends by status."""
+        return {status: count for status, count in self._conn.execute(
+            'SELECT status, COUNT(*) FROM scheduled GROUP BY status'
+        )}
+
+    def close(self):
+        self._conn.close()
+
+
+def deliver(client, config, settings: Dict[str, Any], payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Send a stored payload the way ``send`` would have sent it."""
+    from .recipients import address_group
+    from .utils import render_template
+
+    to = payload.get('to')
+    cc = list(payload.get('cc') or [])
+    bcc = list(payload.get('bcc') or [])
+    per_recipient = payload.get('per_recipient', False)
+    max_recipients = settings.get('max_recipients_per_message', 100)
+
+    # Groups are resolved now, so membership changes since scheduling apply
+    bulk = None
+    if to and '@' not in to:
+        group = config.get_recipient_group(to)
+        if group is None:
+            return {'success': False, 'error': f"Recipient group '{to}' not found"}
+        to, cc, bulk = address_group(to, group, cc, bcc, max_recipients, per_recipient)
+
+    html = payload.get('html')
+    if payload.get('template'):
+        if bulk is None:
+            return client.send_template_email(
+                to=to,
+                subject=payload.get('subject'),
+                template_name=payload['template'],
+                context=payload.get('context') or {},
+                cc=cc,
+                bcc=bcc,
+                attachments=payload.get('attachments')
+            )
+        html = render_template(payload['template'], payload.get('context') or {})
+
+    if bulk is not None:
+        return client.send_bulk(
+            bulk,
+            subject=payload.get('subject'),
+            body=None if payload.get('template') else payload.get('body'),
+            html=html,
+            attachments=payload.get('attachments'),
+            max_recipients=max_recipients,
+            per_recipient=per_recipient
+        )
+    return client.send_email(
+        to=to,
+        subject=payload.get('subject'),
+        body=payload.get('body') or '',
+        html=html,
+        cc=cc,
+        bcc=bcc,
+        attachments=payload.get('attachments')
+    )
+
+
+class Scheduler:
+    """Fire scheduled sends when they fall due.
+
+    Pending ``(due, id)`` pairs live in a min-heap, so each insert and pop is
+    O(log n) and only the next due time is ever looked at. New rows written
+    by ``send --at`` are picked up by id. After downtime everything overdue
+    fires at once, oldest first, through at most ``concurrency`` sends in
+    flight; sends later than ``max_lateness`` are expired instead. Temporary
+    failures are retried with exponential backoff up to ``max_attempts``.
+    """
+
+    def __init__(
+        self,
+        store: ScheduleStore,
+        send,
+        concurrency: int = 4,
+        batch_size: int = 100,
+        poll_interval: float = 5.0,
+        max_lateness: Optional[float] = None,
+        max_attempts: int = 5,
+        retry_delay: float = 60.0,
+        close=None
+    ):
+        self.store = store
+        # send(row, payload) -> result dict
+        self.send = send
+        # close() releases what send holds open, once run() returns
+        self.close = close
+        self.concurrency = max(1, concurrency)
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_lateness = max_lateness
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.heap: List[Tuple[float, int]] = []
+        self.last_id = 0
+        self.inflight = 0
+        self.stats = {'sent': 0, 'failed': 0, 'retried': 0, 'expired': 0, 'recovered': 0}
+        self._ready: Deque[sqlite3.Row] = deque()
+        self._outcomes: List[Tuple[int, str, Optional[str], Optional[float]]] = []
+        self._flushed = time.monotonic()
+        self._done: 'queue.Queue[Tuple[sqlite3.Row, Dict[str, Any]]]' = queue.Queue()
+        self._stop = threading.Event()
+
+    @classmethod
+    def from_config(cls, config, store: ScheduleStore, timings: bool = False) -> 'Scheduler':
+        """Build a scheduler that sends through the configured accounts and routes."""
+        from .smtp_client import SMTPClient
+        from .routing import Router
+        from .suppression import SuppressionList
+        from .sent_copy import SentCopier
+
+        settings = config.get_settings()
+        conf = settings.get('schedule', {}) or {}
+        suppression = SuppressionList.for_sending(settings)
+        clients: Dict[Tuple[str, str], Any] = {}
+        lock = threading.Lock()
+
+        def client_for(row):
+            key = (row['account'] or '', row['route'] or '')
+            with lock:
+                if key not in clients:
+                    if row['route']:
+                        clients[key] = Router.from_config(config, row['route'], suppression=suppression,
+                                                          timings=timings)
+                    else:
+                        account = config.get_account(row['account'])
+                        clients[key] = SMTPClient(account, suppression=suppression, timings=timings,
+                                                  sent_copy=SentCopier.for_sending(settings, account))
+                return clients[key]
+
+        def send(row, payload):
+            return deliver(client_for(row), config, settings, payload)
+
+        def close():
+            # Wait for queued Sent copies, then save the suppression list
+            with lock:
+                for client in clients.values():
+                    if isinstance(client, Router):
+                        client.close()
+                    elif client.sent_copy is not None:
+                        client.sent_copy.close()
+                clients.clear()
+            if suppression is not None:
+                suppression.close()
+
+        return cls(
+            store,
+            send,
+            concurrency=conf.get('concurrency', 4),
+            batch_size=conf.get('batch_size', 100),
+            poll_interval=conf.get('poll_interval', 5.0),
+            max_lateness=conf.get('max_lateness_seconds'),
+            max_attempts=conf.get('max_attempts', 5),
+            retry_delay=conf.get('retry_delay', 60.0),
+            close=close
+        )
+
+    def load(self) -> int:
+        """Add pending sends not seen yet to the heap."""
+        rows = self.store.pending(self.last_id)
+        for due, item_id in rows:
+            heapq.heappush(self.heap, (due, item_id))
+            self.last_id = max(self.last_id, item_id)
+        return len(rows)
+
+    def _claim(self, now: float):
+        """Move the next batch of due sends from the heap to the ready queue."""
+        batch = []
+        while self.heap and self.heap[0][0] <= now and len(batch) < self.batch_size:
+            batch.append(heapq.heappop(self.heap)[1])
+        if not batch:
+            return
+        # Retries are only claimable once their new due time is written
+        self._flush(force=True)
+        expired = []
+        for row in self.store.claim(batch, now):
+            if self.max_lateness is not None and now - row['due'] > self.max_lateness:
+                expired.append((row['id'], 'expired', f"Missed by {now - row['due']:.0f}s", None))
+            else:
+                self._ready.append(row)
+        if expired:
+            self.store.finish(expired)
+            self.stats['expired'] += len(expired)
+            SCHEDULED.inc(len(expired), outcome='expired')
+
+    def _dispatch(self, executor: ThreadPoolExecutor, now: float):
+        """Start ready sends until the concurrency limit is reached."""
+        while self.inflight < self.concurrency:
+            if not self._ready:
+                if not (self.heap and self.heap[0][0] <= now):
+                    return
+                self._claim(now)
+                continue
+            self.inflight += 1
+            executor.submit(self._run_one, self._ready.popleft())
+
+    def _run_one(self, row: sqlite3.Row):
+        try:
+            result = self.send(row, json.loads(row['payload']))
+        except Exception as e:
+            result = {'success': False, 'error': str(e)}
+        self._done.put((row, result))
+
+    def _complete(self, finished: List[Tuple[sqlite3.Row, Dict[str, Any]]]):
+        """Record finished sends, requeueing temporary failures."""
+        for row, result in finished:
+            self.inflight -= 1
+            due = None
+            if result.get('success'):
+                status = 'sent'
+            elif result.get('transient') and row['attempts'] < self.max_attempts:
+                status = 'retried'
+                due = time.time() + self.retry_delay * 2 ** (row['attempts'] - 1)
+                heapq.heappush(self.heap, (due, row['id']))
+            else:
+                status = 'failed'
+            self._outcomes.append((row['id'], status, result.get('error'), due))
+            self.stats[status] += 1
+            SCHEDULED.inc(outcome=status)
+
+    def _flush(self, force: bool = False):
+        """Write recorded outcomes, a batch or a second's worth at a time."""
+        if self._outcomes and (force or len(self._outcomes) >= self.batch_size
+                               or time.monotonic() - self._flushed >= 1.0):
+            self.store.finish(self._outcomes)
+            self._outcomes = []
+            self._flushed = time.monotonic()
+
+    def stop(self):
+        self._stop.set()
+
+    def run(self, once: bool = False) -> Dict[str, Any]:
+        """Fire sends as they fall due until stopped.
+
+        With ``once``, fire everything already due and return.
+        """
+        try:
+            return self._run(once)
+        finally:
+            if self.close is not None:
+                self.close()
+
+    def _run(self, once: bool) -> Dict[str, Any]:
+        self.stats['recovered'] = self.store.recover()
+        self.load()
+        last_poll = time.monotonic()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            while True:
+                if not self._stop.is_set():
+                    self._dispatch(executor, time.time())
+
+                idle = self.inflight == 0
+                if idle and (self._stop.is_set() or once and not self._ready
+                             and not (self.heap and self.heap[0][0] <= time.time())):
+                    break
+
+                if self.inflight >= self.concurrency or self._stop.is_set() or not self.heap:
+                    timeout = self.poll_interval
+                else:
+                    timeout = min(self.poll_interval, max(0.0, self.heap[0][0] - time.time()))
+                if self._outcomes:
+                    timeout = min(timeout, 1.0)
+                finished = []
+                try:
+                    finished.append(self._done.get(timeout=timeout))
+                    # Drain everything else that finished meanwhile
+                    while True:
+                        finished.append(self._done.get_nowait())
+                except queue.Empty:
+                    pass
+                self._complete(finished)
+                self._flush()
+
+                if not once and time.monotonic() - last_poll >= self.poll_interval:
+                    self.load()
+                    last_poll = time.monotonic()
+
+        self._flush(force=True)
+        # Claimed but never started: back to the queue for the next run
+        self.store.release([row['id'] for row in self._ready])
+        self._ready.clear()
+        return dict(self.stats, pending=len(self.heap))
+
+    def metric_samples(self):
+        """Gauge samples for the metrics registry."""
+        for field, value in self.snapshot().items():
+            if value is not None:
+                yield {'field': field}, value
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Daemon state for metrics and status output."""
+        return dict(
+            self.stats,
+            queued=len(self.heap),
+            ready=len(self._ready),
+            inflight=self.inflight,
+            next_due_seconds=round(self.heap[0][0] - time.time(), 3) if self.heap else None
+        )
@@ -0,0 +1,118 @@
+"""Save copies of sent mail to the IMAP Sent folder in the background."""
+
+import queue
+import threading
+from typing import Dict, Any, List, Optional
+
+from .imap_client import IMAPClient
+
+# Sentinel telling the worker to finish
+_STOP = object()
+
+
+class SentCopier:
+    """Append sent messages to the account's Sent folder off the send path.
+
+    ``add`` queues the exact bytes handed to SMTP and returns at once. A
+    worker thread keeps a single IMAP login open, drains whatever has queued
+    up and appends it in one batch, so a bulk send costs a handful of
+    MULTIAPPEND round trips rather than one login per message. The queue is
+    bounded, so a slow IMAP server eventually slows the sender instead of
+    buffering without limit.
+    """
+
+    def __init__(self, account: Dict[str, Any], folder: Optional[str] = None, batch_size: int = 50):
+        self.imap = IMAPClient(account)
+        self.folder = folder or account.get('sent_folder')
+        self.batch_size = batch_size
+        self.stats = {
+            'queued': 0,
+            'appended': 0,
+            'failed': 0,
+            'batches': 0,
+            'error': None
+        }
+        self._queue: queue.Queue = queue.Queue(maxsize=batch_size * 4)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_sending(cls, settings: Dict[str, Any], account: Dict[str, Any]) -> Optional['SentCopier']:
+        """Copier for a send, or None when ``settings.save_sent_copy`` is off."""
+        if not settings.get('save_sent_copy', False) or not account.get('imap_host'):
+            return None
+        return cls(account)
+
+    def add(self, data: bytes):
+        """Queue one transmitted message for the Sent folder."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='sent-copier', daemon=True)
+                self._thread.start()
+            self.stats['queued'] += 1
+        self._queue.put(data)
+
+    def close(self) -> Dict[str, Any]:
+        """Wait for queued copies to be appended and log out; returns stats."""
+        with self._lock:
+            thread = self._thread
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join()
+        return dict(self.stats, folder=self.folder)
+
+    def _next_batch(self) -> List[Any]:
+        """Block for one item, then take whatever else is already queued."""
+        batch = [self._queue.get()]
+        while len(batch) < self.batch_size and batch[-1] is not _STOP:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _connect(self):
+        server = self.imap.connect()
+        if self.folder is None:
+            self.folder = self.imap.find_special_folder(server)
+            if self.folder is None:
+                server.logout()
+                raise RuntimeError("No Sent folder found; set sent_folder on the account")
+        return server
+
+    def _run(self):
+        server = None
+        stopping = False
+        while not stopping:
+            batch = self._next_batch()
+            if batch[-1] is _STOP:
+                stopping = True
+                batch.pop()
+            if not batch:
+                continue
+
+            # Retry once on a fresh connection if the old one went stale
+            for attempt in range(2):
+                try:
+                    if server is None:
+                        server = self._connect()
+                    self.imap.append_messages(server, self.folder, batch)
+                    self.stats['appended'] += len(batch)
+                    self.stats['batches'] += 1
+                    break
+                except Exception as e:
+                    self._logout(server)
+                    server = None
+                    if attempt == 1:
+                        self.stats['failed'] += len(batch)
+                        self.stats['error'] = str(e)
+
+        self._logout(server)
+
+    def _logout(self, server):
+        if server is None:
+            return
+        try:
+            server.logout()
+        except Exception:
+            pass
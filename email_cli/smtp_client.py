@@ -1,23 +1,260 @@
 """SMTP client for sending emails."""
 
+import io
+import os
+import copy
 import smtplib
-from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from email.mime.base import MIMEBase
-from email import encoders
-from typing import List, Optional, Dict, Any
+from email.generator import BytesGenerator
+from email.policy import SMTPUTF8, compat32
+from email.utils import formatdate, make_msgid
+from typing import Iterable, List, Optional, Dict, Any, Tuple
 import json
 
+from .recipients import chunked
+from .ratelimit import get_limiter, is_throttle, is_transient, retry_after
+from .metrics import NO_TIMINGS, Timings, start_timings
+from .mime import text_part, attachment_part, is_international
+from .htmltext import html_to_text
+
+
+def serialize_message(msg: MIMEMultipart) -> bytes:
+    """Serialize a message exactly as it goes on the wire (Bcc stripped, CRLF)."""
+    if msg['Bcc'] is not None:
+        msg = copy.copy(msg)
+        del msg['Bcc']
+    with io.BytesIO() as buffer:
+        BytesGenerator(buffer, mangle_from_=False).flatten(msg, linesep='\r\n')
+        return buffer.getvalue()
+
+
+class _PipeliningSMTP(smtplib.SMTP):
+    """SMTP connection that pipelines the envelope and sends bodies with BDAT.
+
+    With PIPELINING (RFC 2920) MAIL FROM, every RCPT TO and DATA go out
+    in one write and their replies are read together, so a transaction
+    costs two round trips whatever the number of recipients. With
+    CHUNKING (RFC 3030) the body is sent as BDAT chunks instead of DATA,
+    without dot-stuffing. ``sendmail`` keeps smtplib's contract: it
+    returns the refused recipients and raises the same exceptions, and
+    falls back to smtplib when the server offers neither extension.
+    """
+
+    bdat_chunk_size = 1024 * 1024
+
+    def sendmail(self, from_addr, to_addrs, msg, mail_options=(), rcpt_options=()):
+        self.ehlo_or_helo_if_needed()
+        if not (self.does_esmtp and self.has_extn('pipelining')):
+            return super().sendmail(from_addr, to_addrs, msg, mail_options, rcpt_options)
+
+        if isinstance(msg, str):
+            msg = smtplib._fix_eols(msg).encode('ascii')
+        if isinstance(to_addrs, str):
+            to_addrs = [to_addrs]
+        mail_options = list(mail_options)
+        if self.has_extn('size'):
+            mail_options.insert(0, f'size={len(msg)}')
+        if any(option.lower() == 'smtputf8' for option in mail_options):
+            if not self.has_extn('smtputf8'):
+                raise smtplib.SMTPNotSupportedError('SMTPUTF8 not supported by server')
+            self.command_encoding = 'utf-8'
+        chunking = self.has_extn('chunking')
+
+        commands = [self._command('MAIL', f'FROM:{smtplib.quoteaddr(from_addr)}', mail_options)]
+        commands += [self._command('RCPT', f'TO:{smtplib.quoteaddr(address)}', rcpt_options)
+                     for address in to_addrs]
+        if not chunking:
+            commands.append(b'DATA\r\n')
+        self.send(b''.join(commands))
+
+        # The server answers every pipelined command, in order
+        code, resp = self.getreply()
+        if code == 421:
+            self.close()
+            raise smtplib.SMTPSenderRefused(code, resp, from_addr)
+        sender_refused = None if code == 250 else (code, resp)
+
+        refused = {}
+        for address in to_addrs:
+            code, resp = self.getreply()
+            if code not in (250, 251):
+                refused[address] = (code, resp)
+            if code == 421:
+                self.close()
+                raise smtplib.SMTPRecipientsRefused(refused)
+
+        envelope_ok = sender_refused is None and len(refused) < len(to_addrs)
+        if not chunking:
+            data_code, data_resp = self.getreply()
+            if data_code == 354 and not envelope_ok:
+                # DATA was accepted without a valid envelope; end it empty
+                self.send(b'.\r\n')
+                self.getreply()
+
+        if sender_refused is not None:
+            self._fail(smtplib.SMTPSenderRefused(*sender_refused, from_addr), sender_refused[0])
+        if not envelope_ok:
+            self._rset()
+            raise smtplib.SMTPRecipientsRefused(refused)
+        if not chunking and data_code != 354:
+            self._fail(smtplib.SMTPDataError(data_code, data_resp), data_code)
+
+        if chunking:
+            code, resp = self._bdat(msg)
+        else:
+            data = smtplib._quote_periods(msg)
+            if data[-2:] != b'\r\n':
+                data += b'\r\n'
+            self.send(data + b'.\r\n')
+            code, resp = self.getreply()
+        if code != 250:
+            self._fail(smtplib.SMTPDataError(code, resp), code)
+        return refused
+
+    def _command(self, verb: str, args: str, options: Iterable[str]) -> bytes:
+        """One encoded command line, rejecting embedded line breaks like smtplib."""
+        line = ' '.join([verb, args, *options])
+        if '\r' in line or '\n' in line:
+            raise ValueError(f'command and arguments contain prohibited newline characters: {line!r}')
+        return f'{line}\r\n'.encode(self.command_encoding)
+
+    def _bdat(self, msg: bytes) -> Tuple[int, bytes]:
+        """Send a body as pipelined BDAT chunks; return the first failure or the last reply."""
+        view = memoryview(msg)
+        size = self.bdat_chunk_size
+        offsets = range(0, len(msg), size) if msg else [0]
+        for offset in offsets:
+            chunk = view[offset:offset + size]
+            last = ' LAST' if offset + size >= len(msg) else ''
+            self.send(f'BDAT {len(chunk)}{last}\r\n'.encode('ascii') + chunk)
+        failure = None
+        for _ in offsets:
+            code, resp = self.getreply()
+            if code == 421:
+                self.close()
+                return code, resp
+            if code != 250 and failure is None:
+                failure = (code, resp)
+        return failure or (code, resp)
+
+    def _fail(self, error: smtplib.SMTPResponseException, code: int):
+        """Close or reset the session after a failed transaction, then raise."""
+        if code == 421:
+            self.close()
+        else:
+            self._rset()
+        raise error
+
+
+class _InstrumentedSMTP(_PipeliningSMTP):
+    """SMTP connection that counts bytes sent and round trips."""
+
+    def __init__(self, timings: Timings, *args, **kwargs):
+        self.timings = timings
+        # The greeting is the first reply waited for
+        self._awaiting = True
+        super().__init__(*args, **kwargs)
+
+    def send(self, s):
+        self.timings.count('bytes_sent', len(s))
+        self._awaiting = True
+        super().send(s)
+
+    def getreply(self):
+        # Replies to pipelined commands arrive together: one round trip per batch
+        if self._awaiting:
+            self.timings.count('round_trips')
+            self._awaiting = False
+        return super().getreply()
+
 
 class SMTPClient:
     """SMTP client for sending emails."""
 
-    def __init__(self, account: Dict[str, Any]):
+    def __init__(self, account: Dict[str, Any], suppression=None, timings: bool = False, sent_copy=None):
         self.host = account['smtp_host']
         self.port = account['smtp_port']
         self.username = account['username']
         self.password = account['password']
         self.use_ssl = account.get('use_ssl', True)
+        # Optional SuppressionList; suppressed addresses are never sent to
+        self.suppression = suppression
+        # Add a per-phase breakdown to each result
+        self.timings = timings
+        # Optional SentCopier; every transmitted message is queued for the Sent folder
+        self.sent_copy = sent_copy
+
+        rate_limit = account.get('rate_limit') or {}
+        self.limiter = get_limiter(f"{self.username}@{self.host}:{self.port}", rate_limit)
+        self.messages_per_connection = rate_limit.get('messages_per_connection')
+        self.max_retries = rate_limit.get('max_retries', 3)
+
+    def connect(self, timings: Timings = NO_TIMINGS) -> smtplib.SMTP:
+        """Connect and log in to the SMTP server."""
+        with timings.phase('connect'):
+            if timings.enabled:
+                server = _InstrumentedSMTP(timings, self.host, self.port)
+            else:
+                server = _PipeliningSMTP(self.host, self.port)
+        try:
+            if self.use_ssl:
+                with timings.phase('tls'):
+                    server.starttls()
+
+            with timings.phase('login'):
+                server.login(self.username, self.password)
+        except Exception:
+            server.close()
+            raise
+        return server
+
+    def build_message(
+        self,
+        to: str,
+        subject: str,
+        body: str,
+        html: Optional[str] = None,
+        cc: Optional[List[str]] = None,
+        bcc: Optional[List[str]] = None,
+        attachments: Optional[List[str]] = None,
+        eight_bit: bool = False,
+        utf8: bool = False
+    ) -> MIMEMultipart:
+        """Build the MIME message for an email.
+
+        Each part gets the smallest transfer encoding that is valid for the
+        connection: ``eight_bit`` when the server announced 8BITMIME, and
+        ``utf8`` for raw UTF-8 headers once SMTPUTF8 is in use.
+        """
+        policy = SMTPUTF8 if utf8 else compat32
+        msg = MIMEMultipart('alternative', policy=policy)
+
+        msg['From'] = self.username
+        msg['To'] = to
+        msg['Subject'] = subject
+        msg['Date'] = formatdate(localtime=True)
+        msg['Message-ID'] = self._new_message_id()
+
+        if cc:
+            msg['Cc'] = ', '.join(cc)
+        if bcc:
+            msg['Bcc'] = ', '.join(bcc)
+
+        # Add plain text body
+        part1 = text_part(body, 'plain', eight_bit, policy)
+        msg.attach(part1)
+
+        # Add HTML body if provided
+        if html:
+            part2 = text_part(html, 'html', eight_bit, policy)
+            msg.attach(part2)
+
+        # Add attachments
+        if attachments:
+            for attachment_path in attachments:
+                self._add_attachment(msg, attachment_path, eight_bit)
+
+        return msg
 
     def send_email(
         self,
@@ -27,9 +264,11 @@ class SMTPClient:
         html: Optional[str] = None,
         cc: Optional[List[str]] = None,
         bcc: Optional[List[str]] = None,
-        attachments: Optional[List[str]] = None
+        attachments: Optional[List[str]] = None,
+        timings: Optional[Timings] = None
     ) -> Dict[str, Any]:
         """Send an email."""
+        t = timings or start_timings('send_email', self.timings)
         result = {
             'success': False,
             'to': to,
@@ -39,74 +278,365 @@ class SMTPClient:
         }
 
         try:
-            # Create message
-            msg = MIMEMultipart('alternative')
-
-            msg['From'] = self.username
-            msg['To'] = to
-            msg['Subject'] = subject
+            self._check_attachments(attachments)
 
+            recipients = [to]
             if cc:
-                msg['Cc'] = ', '.join(cc)
+                recipients.extend(cc)
             if bcc:
-                msg['Bcc'] = ', '.join(bcc)
+                recipients.extend(bcc)
 
-            # Add plain text body
-            part1 = MIMEText(body, 'plain')
-            msg.attach(part1)
+            if self.suppression is not None:
+                with t.phase('suppression'):
+                    recipients, result['suppressed'] = self.suppression.filter(recipients)
+                if not recipients:
+                    raise ValueError("All recipients are on the suppression list")
+            international = is_international([self.username] + recipients)
 
-            # Add HTML body if provided
-            if html:
-                part2 = MIMEText(html, 'html')
-                msg.attach(part2)
+            # Send email, backing off and retrying while the provider throttles
+            msg = data = None
+            attempt = 0
+            while True:
+                if self.limiter is not None:
+                    with t.phase('rate_limit'):
+                        self.limiter.acquire()
+                try:
+                    with self.connect(t) as server:
+                        if data is None:
+                            # Encodings depend on what the server announced in EHLO
+                            with t.phase('build'):
+                                msg = self.build_message(
+                                    to, subject, body, html, cc, bcc, attachments,
+                                    eight_bit=server.has_extn('8bitmime'), utf8=international
+                                )
+                                data = serialize_message(msg)
+                        with t.phase('send'):
+                            server.sendmail(self.username, recipients, data,
+                                            self._mail_options(server, data, international))
+                    break
+                except Exception as e:
+                    if not self._should_retry(e, attempt):
+                        raise
+                    attempt += 1
+                    result['throttled'] = attempt
 
-            # Add attachments
-            if attachments:
-                for attachment_path in attachments:
-                    self._add_attachment(msg, attachment_path)
+            if self.limiter is not None:
+                self.limiter.on_success()
 
-            # Send email
-            with smtplib.SMTP(self.host, self.port) as server:
-                if self.use_ssl:
-                    server.starttls()
+            result['success'] = True
+            result['message_id'] = msg['Message-ID']
+            if self.sent_copy is not None:
+                self.sent_copy.add(data)
 
-                server.login(self.username, self.password)
+        except Exception as e:
+            result['error'] = str(e)
+            result['transient'] = is_transient(e)
 
-                recipients = [to]
-                if cc:
-                    recipients.extend(cc)
-                if bcc:
-                    recipients.extend(bcc)
+        return t.finish(result)
 
-                server.send_message(msg, from_addr=self.username, to_addrs=recipients)
+    def send_bulk(
+        self,
+        recipients: Iterable[str],
+        subject: str,
+        body: Optional[str],
+        html: Optional[str] = None,
+        attachments: Optional[List[str]] = None,
+        max_recipients: int = 100,
+        per_recipient: bool = False,
+        to_header: str = 'undisclosed-recipients:;',
+        save_sent: bool = True
+    ) -> Dict[str, Any]:
+        """Send one email to a large recipient stream over a single connection.
 
-            result['success'] = True
-            result['message_id'] = str(hash(f"{to}{subject}"))
+        With ``per_recipient`` every address gets its own message with its own
+        To header. Otherwise the stream is split into envelopes of at most
+        ``max_recipients`` RCPT TO commands, all sharing ``to_header`` so
+        addresses are not disclosed to each other. Recipients are consumed
+        lazily, so the stream may come straight from a CSV or SQLite group.
+        If ``body`` is None it is derived from ``html``. With a Sent copier,
+        a shared message is saved once (unless ``save_sent`` is False);
+        per-recipient messages each are. If sending stops on an error,
+        ``unsent`` lists the addresses of the envelope in flight, and the
+        rest of the stream is left unconsumed.
+        """
+        t = start_timings('send_bulk', self.timings)
+        result = {
+            'success': False,
+            'subject': subject,
+            'messages': 0,
+            'sent': 0,
+            'failed': 0,
+            'refused': {},
+            'suppressed': 0,
+            'connections': 0,
+            'throttled': 0,
+            'error': None
+        }
+        if self.suppression is not None:
+            recipients = self._skip_suppressed(recipients, result)
+        chunk_size = 1 if per_recipient else max(1, max_recipients)
+
+        try:
+            self._check_attachments(attachments)
+            if body is None:
+                body = self._html_to_plain_text(html or '')
+            international = is_international([self.username, to_header])
+            built = {'msg': None, 'data': None, 'to': None}
+
+            def prepare(server: smtplib.SMTP, chunk: List[str]) -> bytes:
+                with t.phase('build'):
+                    if built['msg'] is None:
+                        # Built once the first EHLO told us what encodings are allowed
+                        built['msg'] = self.build_message(
+                            to_header, subject, body, html, attachments=attachments,
+                            eight_bit=server.has_extn('8bitmime'), utf8=international
+                        )
+                        if not per_recipient:
+                            built['data'] = serialize_message(built['msg'])
+                    if per_recipient and built['to'] != chunk[0]:
+                        built['msg'].replace_header('To', chunk[0])
+                        built['msg'].replace_header('Message-ID', self._new_message_id())
+                        built['data'] = serialize_message(built['msg'])
+                        built['to'] = chunk[0]
+                return built['data']
+
+            envelopes = ((chunk, lambda server, chunk=chunk: prepare(server, chunk))
+                         for chunk in chunked(recipients, chunk_size))
+            # Chunks of one shared message are saved to Sent once
+            self._send_each(envelopes, result, t, international, save_sent=save_sent, save_once=not per_recipient)
+
+            result['success'] = result['sent'] > 0 or result['failed'] == 0
+            if self.limiter is not None:
+                result['rate_limit'] = self.limiter.snapshot()
 
         except Exception as e:
             result['error'] = str(e)
+            result['transient'] = is_transient(e)
 
-        return result
+        return t.finish(result)
 
-    def _add_attachment(self, msg: MIMEMultipart, file_path: str):
-        """Add attachment to email."""
-        import os
+    def send_prepared(self, messages: Iterable[Tuple[List[str], bytes]]) -> Dict[str, Any]:
+        """Send ready-made messages, such as a rendered spool, over one connection.
 
-        if not os.path.exists(file_path):
-            raise FileNotFoundError(f"Attachment not found: {file_path}")
+        ``messages`` yields ``(recipients, data)`` with ``data`` serialized
+        for the wire. It is consumed one message at a time, so asking for the
+        next message means the previous one was accepted or refused. Rate
+        limiting, connection rotation, throttle retries and suppression work
+        as in ``send_bulk``.
+        """
+        t = start_timings('send_prepared', self.timings)
+        result = {
+            'success': False,
+            'messages': 0,
+            'sent': 0,
+            'failed': 0,
+            'refused': {},
+            'suppressed': 0,
+            'connections': 0,
+            'throttled': 0,
+            'error': None
+        }
 
-        with open(file_path, 'rb') as f:
-            part = MIMEBase('application', 'octet-stream')
-            part.set_payload(f.read())
+        def unsuppressed():
+            for recipients, data in messages:
+                if self.suppression is not None:
+                    recipients = list(self._skip_suppressed(recipients, result))
+                if recipients:
+                    yield recipients, data
 
-        encoders.encode_base64(part)
-        filename = os.path.basename(file_path)
-        part.add_header(
-            'Content-Disposition',
-            f'attachment; filename= {filename}'
-        )
+        try:
+            self._send_each(unsuppressed(), result, t, is_international([self.username]))
+
+            result['success'] = result['sent'] > 0 or result['failed'] == 0
+            if self.limiter is not None:
+                result['rate_limit'] = self.limiter.snapshot()
+
+        except Exception as e:
+            result['error'] = str(e)
+            result['transient'] = is_transient(e)
+
+        return t.finish(result)
+
+    def _send_each(
+        self,
+        messages: Iterable[Tuple[List[str], Any]],
+        result: Dict[str, Any],
+        t,
+        international: bool = False,
+        save_sent: bool = True,
+        save_once: bool = False
+    ):
+        """Send ``(recipients, data)`` pairs over one rotating connection.
+
+        ``data`` is the serialized message, or a callable building it for
+        the connected server. Counts go into ``result``. Rate limiting,
+        connection rotation and throttle retries happen here. So do
+        per-address refusals and handing accepted messages to the Sent
+        copier (only the first one with ``save_once``). A dropped
+        connection that is not retried is raised, with the recipients of
+        the message in flight in ``result['unsent']``.
+        """
+        server = None
+        sent_on_connection = 0
+        pending: List[str] = []
+        try:
+            for recipients, data in messages:
+                pending = recipients
+                attempt = 0
+                while True:
+                    if self.limiter is not None:
+                        with t.phase('rate_limit'):
+                            self.limiter.acquire()
+                    unsupported = {}
+                    try:
+                        # Rotate connections so no session exceeds the provider's per-connection cap
+                        if server is None or (
+                            self.messages_per_connection and sent_on_connection >= self.messages_per_connection
+                        ):
+                            self._close(server)
+                            server = None
+                            server = self.connect(t)
+                            sent_on_connection = 0
+                            result['connections'] += 1
+                        payload = data(server) if callable(data) else data
+
+                        # Without SMTPUTF8, internationalized addresses are refused individually
+                        if not server.has_extn('smtputf8'):
+                            unsupported = {
+                                address: (553, '5.6.7 Server does not support SMTPUTF8')
+                                for address in recipients if not address.isascii()
+                            }
+                        targets = [address for address in recipients if address not in unsupported]
+                        refused = {}
+                        if targets:
+                            with t.phase('send'):
+                                try:
+                                    refused = server.sendmail(
+                                        self.username, targets, payload,
+                                        self._mail_options(server, payload,
+                                                           international or is_international(targets))
+                                    )
+                                except smtplib.SMTPNotSupportedError as e:
+                                    # The message needs SMTPUTF8 and the server lacks it
+                                    refused = {address: (553, str(e)) for address in targets}
+                        refused.update(unsupported)
+                    except (smtplib.SMTPRecipientsRefused, smtplib.SMTPServerDisconnected,
+                            smtplib.SMTPResponseException) as e:
+                        # A session ended mid-transaction delivered nothing, whatever was refused so far
+                        e = self._session_lost(server, e) or e
+                        if self._should_retry(e, attempt):
+                            attempt += 1
+                            result['throttled'] += 1
+                            self._close(server)
+                            server = None
+                            continue
+                        if isinstance(e, smtplib.SMTPRecipientsRefused):
+                            refused = {**e.recipients, **unsupported}
+                        elif isinstance(e, smtplib.SMTPServerDisconnected):
+                            raise e
+                        else:
+                            refused = {address: (e.smtp_code, e.smtp_error) for address in recipients}
+                    break
+
+                sent_on_connection += 1
+                if len(refused) < len(recipients):
+                    if self.sent_copy is not None and save_sent and not (save_once and result['messages']):
+                        self.sent_copy.add(payload)
+                    result['messages'] += 1
+                    if self.limiter is not None:
+                        self.limiter.on_success()
+                result['sent'] += len(recipients) - len(refused)
+                result['failed'] += len(refused)
+                for address, (code, error) in refused.items():
+                    result['refused'][address] = f"{code} {error.decode(errors='ignore') if isinstance(error, bytes) else error}"
+                pending = []
+        except Exception:
+            result['unsent'] = list(pending)
+            raise
+        finally:
+            self._close(server)
 
-        msg.attach(part)
+    def _mail_options(self, server: smtplib.SMTP, data: bytes, international: bool) -> List[str]:
+        """MAIL FROM parameters for a serialized message."""
+        options = []
+        if international:
+            if not server.has_extn('smtputf8'):
+                raise smtplib.SMTPNotSupportedError(
+                    "Internationalized address but the server does not support SMTPUTF8"
+                )
+            options.append('SMTPUTF8')
+        if not data.isascii() and server.has_extn('8bitmime'):
+            options.append('BODY=8BITMIME')
+        return options
+
+    def _check_attachments(self, attachments: Optional[List[str]]):
+        """Fail before connecting if an attachment is missing."""
+        for file_path in attachments or []:
+            if not os.path.exists(file_path):
+                raise FileNotFoundError(f"Attachment not found: {file_path}")
+
+    def _new_message_id(self) -> str:
+        """Generate a Message-ID on the sender's domain."""
+        return make_msgid(domain=self.username.rpartition('@')[2] or None)
+
+    def _should_retry(self, error: Exception, attempt: int) -> bool:
+        """Decide whether a failed send is a throttle worth retrying.
+
+        With a rate limiter configured, throttle replies slow the limiter down
+        and pause it (for as long as the reply asks, when it says) and are
+        retried up to ``max_retries`` times. Without one, only a dropped
+        connection is retried, once.
+        """
+        if not is_throttle(error):
+            return False
+        if self.limiter is None:
+            return attempt == 0 and isinstance(error, smtplib.SMTPServerDisconnected)
+        if attempt >= self.max_retries:
+            return False
+        self.limiter.on_throttle(retry_after(error))
+        return True
+
+    def _session_lost(self, server: Optional[smtplib.SMTP],
+                      error: Exception) -> Optional[smtplib.SMTPServerDisconnected]:
+        """A disconnect error if the server ended the session during a transaction.
+
+        After a 421 reply, or once the connection is closed, the message
+        was not accepted, even though a recipients refusal may only list
+        the addresses seen before it.
+        """
+        if server is None or isinstance(error, smtplib.SMTPServerDisconnected):
+            return None
+        if isinstance(error, smtplib.SMTPRecipientsRefused):
+            replies = list(error.recipients.values())
+        else:
+            replies = [(error.smtp_code, error.smtp_error)]
+        reply = next((reply for code, reply in replies if code == 421), None)
+        if reply is None and server.sock is not None:
+            return None
+        if isinstance(reply, bytes):
+            reply = reply.decode(errors='ignore')
+        return smtplib.SMTPServerDisconnected(f"421 {reply}" if reply else 'Connection closed during the transaction')
+
+    def _close(self, server: Optional[smtplib.SMTP]):
+        """Politely close a connection, ignoring errors."""
+        if server is None:
+            return
+        try:
+            server.quit()
+        except (smtplib.SMTPException, OSError):
+            server.close()
+
+    def _skip_suppressed(self, recipients: Iterable[str], result: Dict[str, Any]) -> Iterable[str]:
+        """Filter suppressed addresses out of a recipient stream, counting them."""
+        for address in recipients:
+            if address in self.suppression:
+                result['suppressed'] += 1
+            else:
+                yield address
+
+    def _add_attachment(self, msg: MIMEMultipart, file_path: str, eight_bit: bool = False):
+        """Add attachment to email."""
+        msg.attach(attachment_part(file_path, eight_bit, msg.policy))
 
     def send_template_email(
         self,
@@ -121,8 +651,10 @@ class SMTPClient:
         """Send email from template."""
         from .utils import render_template
 
-        html = render_template(template_name, context)
-        plain_text = self._html_to_plain_text(html)
+        t = start_timings('send_template_email', self.timings)
+        with t.phase('render'):
+            html = render_template(template_name, context)
+            plain_text = self._html_to_plain_text(html)
 
         return self.send_email(
             to=to,
@@ -131,13 +663,10 @@ class SMTPClient:
             html=html,
             cc=cc,
             bcc=bcc,
-            attachments=attachments
+            attachments=attachments,
+            timings=t
         )
 
     def _html_to_plain_text(self, html: str) -> str:
-        """Convert HTML to plain text (simple version)."""
-        # Very basic HTML to text conversion
-        import re
-        text = re.sub('<[^<]+?>', '', html)
-        text = text.replace('&nbsp;', ' ')
-        return text.strip()
+        """Convert HTML to plain text."""
+        return html_to_text(html)
@@ -0,0 +1,68 @@
+"""Persistent state for incremental email_cli operations."""
+
+import os
+import json
+import tempfile
+from typing import Dict, Any, Optional
+
+
+def get_state_dir(settings: Optional[Dict[str, Any]] = None) -> str:
+    """Get the directory used for persistent state files."""
+    settings = settings or {}
+    state_dir = (
+        settings.get('state_dir')
+        or os.environ.get('EMAIL_STATE_DIR')
+        or os.path.join(
+            os.environ.get('XDG_STATE_HOME', os.path.expanduser('~/.local/state')),
+            'clawdbot-smtp'
+        )
+    )
+    os.makedirs(state_dir, exist_ok=True)
+    return state_dir
+
+
+class StateStore:
+    """Small JSON key/value store that survives between runs."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.data: Dict[str, Any] = self._load()
+
+    @classmethod
+    def from_settings(cls, settings: Dict[str, Any], name: str = 'state.json') -> 'StateStore':
+        """Open a state file inside the configured state directory."""
+        return cls(os.path.join(get_state_dir(settings), name))
+
+    def _load(self) -> Dict[str, Any]:
+        """Load state from disk, starting empty if missing or corrupt."""
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Get a stored value."""
+        return self.data.get(key, default)
+
+    def set(self, key: str, value: Any):
+        """Set a value (call save() to persist)."""
+        self.data[key] = value
+
+    def save(self):
+        """Atomically write state to disk."""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.state-')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(self.data, f, indent=2)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+
+def watermark_key(account: str, folder: str) -> str:
+    """Build the state key for a per-account, per-folder UID high-water mark."""
+    return f"watermark:{account}:{folder}"
@@ -0,0 +1,244 @@
+"""Suppression list of dead addresses, checked on every send."""
+
+import os
+import math
+import time
+import struct
+import sqlite3
+import hashlib
+import threading
+from typing import Iterable, Iterator, List, Dict, Any, Optional, Tuple
+
+from .state import get_state_dir
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings.
+
+    Lookups cost ``k`` bit tests regardless of how many items were added,
+    and a negative answer is always exact.
+    """
+
+    MAGIC = b'CBF1'
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        self.capacity = max(1, capacity)
+        self.error_rate = error_rate
+        self.size = max(8, math.ceil(-self.capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str) -> Iterator[int]:
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, key: str):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key: str) -> bool:
+        bits = self.bits
+        for pos in self._positions(key):
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+    def dump(self, path: str, version: int):
+        """Write the filter to disk, tagged with the store version it reflects."""
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(self.MAGIC)
+            f.write(struct.pack('<QQQd', version, self.capacity, self.hashes, self.error_rate))
+            f.write(struct.pack('<Q', self.size))
+            f.write(self.bits)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Tuple[Optional['BloomFilter'], int]:
+        """Load a filter and its version, or (None, -1) if unusable."""
+        try:
+            with open(path, 'rb') as f:
+                if f.read(4) != cls.MAGIC:
+                    return None, -1
+                version, capacity, hashes, error_rate = struct.unpack('<QQQd', f.read(32))
+                (size,) = struct.unpack('<Q', f.read(8))
+                bits = bytearray(f.read())
+        except (OSError, struct.error):
+            return None, -1
+
+        if len(bits) != (size + 7) // 8:
+            return None, -1
+
+        bloom = cls.__new__(cls)
+        bloom.capacity, bloom.error_rate = capacity, error_rate
+        bloom.size, bloom.hashes, bloom.bits = size, hashes, bits
+        return bloom, version
+
+
+class SuppressionList:
+    """Persistent set of suppressed addresses.
+
+    The exact set lives in SQLite; an in-memory Bloom filter in front of it
+    answers the common "not suppressed" case without touching disk. The
+    filter is cached next to the database and rebuilt only when stale.
+    """
+
+    def __init__(self, path: str, error_rate: float = 0.001):
+        self.path = path
+        self.bloom_path = f'{path}.bloom'
+        self.error_rate = error_rate
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS suppressed (
+                address TEXT PRIMARY KEY,
+                status TEXT,
+                reason TEXT,
+                source TEXT,
+                first_seen REAL,
+                last_seen REAL,
+                hits INTEGER DEFAULT 1
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER);
+        ''')
+        self._conn.commit()
+        self._size = self.count()
+        self.bloom = self._load_bloom()
+
+    @classmethod
+    def from_settings(cls, settings: Dict[str, Any]) -> 'SuppressionList':
+        """Open the suppression list configured in settings."""
+        path = settings.get('suppression_db') or os.path.join(get_state_dir(settings), 'suppression.db')
+        return cls(os.path.expanduser(path))
+
+    @classmethod
+    def for_sending(cls, settings: Dict[str, Any]) -> Optional['SuppressionList']:
+        """Open the suppression list for send-time checks, if one exists."""
+        if not settings.get('suppress_bounced', True):
+            return None
+        path = settings.get('suppression_db') or os.path.join(get_state_dir(settings), 'suppression.db')
+        if not os.path.exists(os.path.expanduser(path)):
+            return None
+        return cls(os.path.expanduser(path))
+
+    def _version(self) -> int:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        return row[0] if row else 0
+
+    def _bump_version(self):
+        self._conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('version', 1) "
+            "ON CONFLICT(key) DO UPDATE SET value = value + 1"
+        )
+
+    def _load_bloom(self) -> BloomFilter:
+        bloom, version = BloomFilter.load(self.bloom_path)
+        if bloom is not None and version == self._version():
+            return bloom
+        return self._rebuild_bloom()
+
+    def _rebuild_bloom(self) -> BloomFilter:
+        bloom = BloomFilter(max(self._size * 2, 100_000), self.error_rate)
+        cursor = self._conn.execute('SELECT address FROM suppressed')
+        while True:
+            rows = cursor.fetchmany(10_000)
+            if not rows:
+                break
+            for (address,) in rows:
+                bloom.add(address)
+        self._dirty = True
+        return bloom
+
+    def count(self) -> int:
+        """Number of suppressed addresses."""
+        return self._conn.execute('SELECT COUNT(*) FROM suppressed').fetchone()[0]
+
+    def __contains__(self, address: str) -> bool:
+        key = address.strip().lower()
+        if key not in self.bloom:
+            return False
+        with self._lock:
+            row = self._conn.execute('SELECT 1 FROM suppressed WHERE address = ?', (key,)).fetchone()
+        return row is not None
+
+    def filter(self, addresses: Iterable[str]) -> Tuple[List[str], List[str]]:
+        """Split addresses into (allowed, suppressed)."""
+        allowed, suppressed = [], []
+        for address in addresses:
+            (suppressed if address in self else allowed).append(address)
+        return allowed, suppressed
+
+    def add_many(self, entries: Iterable[Dict[str, Any]]) -> int:
+        """Suppress addresses from dicts with address/status/reason/source."""
+        now = time.time()
+        added = 0
+        with self._lock:
+            for entry in entries:
+                key = entry['address'].strip().lower()
+                values = (entry.get('status'), entry.get('reason'))
+                cursor = self._conn.execute(
+                    'INSERT OR IGNORE INTO suppressed (address, status, reason, source, first_seen, last_seen) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    (key, *values, entry.get('source'), now, now)
+                )
+                if cursor.rowcount:
+                    self._size += 1
+                    self.bloom.add(key)
+                else:
+                    self._conn.execute(
+                        'UPDATE suppressed SET status = ?, reason = ?, last_seen = ?, hits = hits + 1 '
+                        'WHERE address = ?',
+                        (*values, now, key)
+                    )
+                added += 1
+            if added:
+                self._bump_version()
+                self._conn.commit()
+                self._dirty = True
+
+            if self._size > self.bloom.capacity:
+                self.bloom = self._rebuild_bloom()
+        return added
+
+    def add(self, address: str, status: Optional[str] = None, reason: Optional[str] = None,
+            source: Optional[str] = None) -> int:
+        """Suppress a single address."""
+        return self.add_many([{'address': address, 'status': status, 'reason': reason, 'source': source}])
+
+    def remove(self, address: str) -> bool:
+        """Stop suppressing an address.
+
+        The Bloom filter cannot forget the key; it just costs one extra exact
+        lookup for that address until the filter is next rebuilt.
+        """
+        with self._lock:
+            cursor = self._conn.execute('DELETE FROM suppressed WHERE address = ?', (address.strip().lower(),))
+            if cursor.rowcount:
+                self._size -= 1
+                self._bump_version()
+                self._dirty = True
+            self._conn.commit()
+        return cursor.rowcount > 0
+
+    def get(self, address: str) -> Optional[Dict[str, Any]]:
+        """Get the stored record for an address."""
+        row = self._conn.execute(
+            'SELECT address, status, reason, source, first_seen, last_seen, hits FROM suppressed WHERE address = ?',
+            (address.strip().lower(),)
+        ).fetchone()
+        if row is None:
+            return None
+        keys = ('address', 'status', 'reason', 'source', 'first_seen', 'last_seen', 'hits')
+        return dict(zip(keys, row))
+
+    def close(self):
+        """Persist the Bloom filter if it changed and close the database."""
+        if self._dirty:
+            self.bloom.dump(self.bloom_path, self._version())
+            self._dirty = False
+        self._conn.close()
@@ -0,0 +1,465 @@
+"""Conversation threading: a local JWZ-style index over Message-ID/References."""
+
+import os
+import re
+import sqlite3
+from email.parser import BytesHeaderParser
+from email.policy import compat32
+from email.header import decode_header, make_header
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+from .imap_client import IMAPClient, parse_fetch_response, quote_folder, uid_set
+from .metrics import NO_TIMINGS, start_timings
+from .state import get_state_dir
+
+THREAD_HEADERS = 'MESSAGE-ID IN-REPLY-TO REFERENCES FROM SUBJECT DATE'
+
+_MSGID_RE = re.compile(r'<[^<>\s]+>')
+
+
+def normalize_message_id(value: str) -> str:
+    """``<id@host>`` form of a Message-ID given with or without brackets."""
+    value = value.strip()
+    return value if value.startswith('<') else f'<{value}>'
+
+
+def _decode(value: Optional[str]) -> str:
+    if not value:
+        return ''
+    try:
+        return str(make_header(decode_header(value)))
+    except (LookupError, ValueError, UnicodeDecodeError):
+        return value
+
+
+def _timestamp(date: Optional[str]) -> Optional[float]:
+    try:
+        return parsedate_to_datetime(date).timestamp() if date else None
+    except (TypeError, ValueError):
+        return None
+
+
+class ThreadIndex:
+    """Threads of every indexed message, in SQLite.
+
+    Every Message-ID seen, including ones only known from a References
+    header, is a node (JWZ's containers). Each node belongs to one thread,
+    and a message joining nodes of several threads merges them, so a
+    conversation is one indexed lookup by thread id. Parent links follow
+    References order and then In-Reply-To, skipping any link that would form
+    a loop. Threads are built from references only; unlike THREAD=REFERENCES,
+    messages are not grouped by subject.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript('''
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            CREATE TABLE IF NOT EXISTS nodes (
+                message_id TEXT PRIMARY KEY,
+                thread INTEGER NOT NULL,
+                parent TEXT
+            );
+            CREATE INDEX IF NOT EXISTS nodes_thread ON nodes (thread);
+            CREATE TABLE IF NOT EXISTS messages (
+                account TEXT NOT NULL,
+                folder TEXT NOT NULL,
+                uid INTEGER NOT NULL,
+                message_id TEXT NOT NULL,
+                sender TEXT,
+                subject TEXT,
+                date TEXT,
+                timestamp REAL,
+                PRIMARY KEY (account, folder, uid)
+            );
+            CREATE INDEX IF NOT EXISTS messages_message_id ON messages (message_id);
+            CREATE TABLE IF NOT EXISTS folders (
+                account TEXT NOT NULL,
+                folder TEXT NOT NULL,
+                uidvalidity INTEGER,
+                last_uid INTEGER,
+                PRIMARY KEY (account, folder)
+            );
+        ''')
+        self._conn.commit()
+        self._next_thread = (self._conn.execute('SELECT MAX(thread) FROM nodes').fetchone()[0] or 0) + 1
+
+    @classmethod
+    def from_settings(cls, settings: Dict[str, Any]) -> 'ThreadIndex':
+        """Open the thread index configured in settings."""
+        conf = settings.get('threads', {}) or {}
+        path = conf.get('db') or os.path.join(get_state_dir(settings), 'threads.db')
+        return cls(os.path.expanduser(path))
+
+    def watermark(self, account: str, folder: str) -> Optional[Tuple[int, int]]:
+        """``(uidvalidity, last_uid)`` of an indexed folder, or None."""
+        row = self._conn.execute(
+            'SELECT uidvalidity, last_uid FROM folders WHERE account = ? AND folder = ?', (account, folder)
+        ).fetchone()
+        return (row['uidvalidity'], row['last_uid']) if row else None
+
+    def _node(self, message_id: str) -> Optional[sqlite3.Row]:
+        return self._conn.execute('SELECT thread, parent FROM nodes WHERE message_id = ?', (message_id,)).fetchone()
+
+    def _is_ancestor(self, candidate: str, message_id: str) -> bool:
+        """Whether ``candidate`` is ``message_id`` or one of its ancestors."""
+        seen = set()
+        while message_id is not None and message_id not in seen:
+            if message_id == candidate:
+                return True
+            seen.add(message_id)
+            row = self._node(message_id)
+            message_id = row['parent'] if row else None
+        return False
+
+    def _link(self, message_id: str, references: List[str]):
+        """Add a message's node and references, merging their threads."""
+        chain = references + [message_id]
+        rows = {mid: self._node(mid) for mid in chain}
+        threads = sorted({row['thread'] for row in rows.values() if row is not None})
+        if threads:
+            thread = threads[0]
+            if len(threads) > 1:
+                marks = ','.join('?' * (len(threads) - 1))
+                self._conn.execute(f'UPDATE nodes SET thread = ? WHERE thread IN ({marks})', [thread] + threads[1:])
+        else:
+            thread = self._next_thread
+            self._next_thread += 1
+
+        self._conn.executemany(
+            'INSERT OR IGNORE INTO nodes (message_id, thread) VALUES (?, ?)',
+            [(mid, thread) for mid, row in rows.items() if row is None]
+        )
+        # Each reference is the parent of the next, unless already linked
+        for parent, child in zip(references, references[1:]):
+            row = self._node(child)
+            if row['parent'] is None and not self._is_ancestor(child, parent):
+                self._conn.execute('UPDATE nodes SET parent = ? WHERE message_id = ?', (parent, child))
+        # The message's own headers name its parent authoritatively
+        if references and not self._is_ancestor(message_id, references[-1]):
+            self._conn.execute('UPDATE nodes SET parent = ? WHERE message_id = ?', (references[-1], message_id))
+
+    def add(self, account: str, folder: str, uid: int, headers) -> str:
+        """Index one message from its parsed headers; returns its Message-ID."""
+        found = _MSGID_RE.findall(headers['Message-ID'] or '')
+        # Without a Message-ID the message can only be a thread of its own
+        message_id = found[0] if found else f'<{uid}.{folder}.{account}@email-cli.invalid>'
+        references = [mid for mid in _MSGID_RE.findall(headers['References'] or '') if mid != message_id]
+        for mid in _MSGID_RE.findall(headers['In-Reply-To'] or '')[:1]:
+            if mid != message_id and (not references or references[-1] != mid):
+                references.append(mid)
+        # A reference listed twice would otherwise be its own ancestor
+        references = list(dict.fromkeys(references))
+
+        self._link(message_id, references)
+        date = headers['Date']
+        self._conn.execute(
+            'INSERT OR REPLACE INTO messages (account, folder, uid, message_id, sender, subject, date, timestamp) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (account, folder, uid, message_id, _decode(headers['From']), _decode(headers['Subject']), date,
+             _timestamp(date))
+        )
+        return message_id
+
+    def sync(
+        self,
+        imap: IMAPClient,
+        server,
+        account: str,
+        folder: str,
+        batch_size: int = 1000,
+        timings=None
+    ) -> Dict[str, Any]:
+        """Index mail that arrived in a folder since the last sync.
+
+        STATUS answers an unchanged folder in one round trip; otherwise only
+        the headers of new UIDs are fetched. A UIDVALIDITY change drops the
+        folder's entries and indexes it again.
+        """
+        t = timings or NO_TIMINGS
+        result = {'folder': folder, 'indexed': 0}
+        mark = self.watermark(account, folder)
+        with t.phase('status'):
+            status = imap.folder_status(server, folder)
+        uidvalidity, uidnext = status.get('uidvalidity'), status.get('uidnext', 1)
+
+        if mark is not None and mark[0] == uidvalidity and uidnext - 1 <= mark[1]:
+            return result
+        last_uid = mark[1] if mark is not None and mark[0] == uidvalidity else 0
+        if mark is not None and mark[0] != uidvalidity:
+            self._conn.execute('DELETE FROM messages WHERE account = ? AND folder = ?', (account, folder))
+
+        with t.phase('select'):
+            server.select(quote_folder(folder), readonly=True)
+        with t.phase('search'):
+            uids = [uid for uid in imap.uid_search(server, f'UID {last_uid + 1}:*') if uid > last_uid]
+
+        parser = BytesHeaderParser(policy=compat32)
+        for start in range(0, len(uids), batch_size):
+            batch = uids[start:start + batch_size]
+            with t.phase('fetch'):
+                status, data = server.uid('FETCH', uid_set(batch), f'(UID BODY.PEEK[HEADER.FIELDS ({THREAD_HEADERS})])')
+            if status != 'OK':
+                raise ValueError(f"Fetch failed: {status}")
+            with t.phase('index'):
+                for item in parse_fetch_response(data):
+                    if item['uid'] is None:
+                        continue
+                    self.add(account, folder, item['uid'], parser.parsebytes(item['literal'] or b''))
+                    result['indexed'] += 1
+                # Each batch is committed with the mark, so an interrupted sync resumes
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO folders (account, folder, uidvalidity, last_uid) VALUES (?, ?, ?, ?)',
+                    (account, folder, uidvalidity, batch[-1])
+                )
+                self._conn.commit()
+
+        self._conn.execute(
+            'INSERT OR REPLACE INTO folders (account, folder, uidvalidity, last_uid) VALUES (?, ?, ?, ?)',
+            (account, folder, uidvalidity, max(uids[-1] if uids else 0, last_uid, uidnext - 1))
+        )
+        self._conn.commit()
+        return result
+
+    def lookup(self, message_id: str, account: Optional[str] = None) -> List[Dict[str, Any]]:
+        """The conversation a Message-ID belongs to, in thread order.
+
+        Messages come depth-first with a ``depth``; siblings are ordered by
+        date. Nodes known only from references are left out and their
+        replies moved up, as in JWZ's pruning of empty containers.
+        """
+        node = self._node(message_id)
+        if node is None:
+            return []
+        nodes = {row['message_id']: row['parent'] for row in self._conn.execute(
+            'SELECT message_id, parent FROM nodes WHERE thread = ?', (node['thread'],)
+        )}
+        # "+" keeps the planner on the thread index rather than scanning the account
+        query = ('SELECT m.* FROM nodes n JOIN messages m ON m.message_id = n.message_id WHERE n.thread = ?'
+                 + (' AND +m.account = ?' if account else '') + ' ORDER BY m.folder, m.uid')
+        messages: Dict[str, List[sqlite3.Row]] = {}
+        for row in self._conn.execute(query, (node['thread'], account) if account else (node['thread'],)):
+            messages.setdefault(row['message_id'], []).append(row)
+
+        children: Dict[Optional[str], List[str]] = {}
+        for mid, parent in nodes.items():
+            children.setdefault(parent if parent in nodes else None, []).append(mid)
+
+        # Siblings sort by their own date, or their earliest reply's; long
+        # chains are common, so this is computed children-first without recursion
+        order, pending = [], list(children.get(None, []))
+        while pending:
+            mid = pending.pop()
+            order.append(mid)
+            pending.extend(children.get(mid, []))
+        earliest: Dict[str, float] = {}
+        for mid in reversed(order):
+            own = [row['timestamp'] for row in messages.get(mid, []) if row['timestamp'] is not None]
+            earliest[mid] = min(own + [earliest[child] for child in children.get(mid, [])], default=float('inf'))
+        first = earliest.__getitem__
+
+        conversation = []
+        stack = [(mid, 0, None) for mid in sorted(children.get(None, []), key=first, reverse=True)]
+        while stack:
+            mid, depth, parent = stack.pop()
+            below = depth
+            if mid in messages:
+                for row in messages[mid]:
+                    conversation.append({
+                        'folder': row['folder'],
+                        'uid': row['uid'],
+                        'message_id': mid,
+                        'parent': parent,
+                        'depth': depth,
+                        'from': row['sender'],
+                        'subject': row['subject'],
+                        'date': row['date']
+                    })
+                parent, below = mid, depth + 1
+            for child in sorted(children.get(mid, []), key=first, reverse=True):
+                stack.append((child, below, parent))
+        return conversation
+
+    def forget(self, account: str, folder: str, uids: Iterable[int]):
+        """Drop index entries for messages that are gone from the server."""
+        self._conn.executemany('DELETE FROM messages WHERE account = ? AND folder = ? AND uid = ?',
+                               [(account, folder, uid) for uid in uids])
+        self._conn.commit()
+
+    def counts(self) -> Dict[str, int]:
+        """Indexed messages, threads and folders."""
+        return {
+            'messages': self._conn.execute('SELECT COUNT(*) FROM messages').fetchone()[0],
+            'threads': self._conn.execute('SELECT COUNT(DISTINCT thread) FROM nodes').fetchone()[0],
+            'folders': self._conn.execute('SELECT COUNT(*) FROM folders').fetchone()[0]
+        }
+
+    def close(self):
+        self._conn.close()
+
+
+def sync_threads(
+    imap: IMAPClient,
+    index: ThreadIndex,
+    account: str,
+    folders: List[str],
+    timings: bool = False
+) -> Dict[str, Any]:
+    """Bring the thread index of several folders up to date."""
+    t = start_timings('thread_sync', timings)
+    result = {'folders': [], 'indexed': 0, 'success': False, 'error': None}
+
+    try:
+        with imap.connect(t) as server:
+            for folder in folders:
+                synced = index.sync(imap, server, account, folder, timings=t)
+                result['folders'].append(synced)
+                result['indexed'] += synced['indexed']
+        result['success'] = True
+    except Exception as e:
+        result['error'] = str(e)
+
+    result['index'] = index.counts()
+    return t.finish(result)
+
+
+def _resolve(imap: IMAPClient, server, ident: str) -> Tuple[Optional[int], Optional[str]]:
+    """``(uid, Message-ID)`` for a Message-ID or a ``list``/``read`` id in the selected folder."""
+    if '@' in ident:
+        message_id = normalize_message_id(ident)
+        uids = imap.uid_search(server, f'HEADER Message-ID "{message_id}"')
+        return (uids[0] if uids else None), message_id
+    status, data = server.fetch(ident, '(UID BODY.PEEK[HEADER.FIELDS (MESSAGE-ID)])')
+    items = [item for item in parse_fetch_response(data) if item['uid'] is not None] if status == 'OK' else []
+    if not items:
+        raise ValueError(f"No message {ident}")
+    found = _MSGID_RE.findall((items[0]['literal'] or b'').decode(errors='ignore'))
+    return items[0]['uid'], found[0] if found else None
+
+
+def get_thread(
+    imap: IMAPClient,
+    index: ThreadIndex,
+    account: str,
+    ident: str,
+    folder: str = 'INBOX',
+    folders: Optional[List[str]] = None,
+    bodies: bool = False,
+    timings: bool = False
+) -> Dict[str, Any]:
+    """Return the conversation a message belongs to.
+
+    ``ident`` is a Message-ID or the id ``list`` shows for ``folder``. The
+    index of each folder in ``folders`` is brought up to date (usually one
+    STATUS each) and the thread is a single local lookup, so only bodies
+    (with ``bodies``) are fetched, in one batch per folder. When only
+    ``folder`` is asked for, it has not been indexed yet and the server
+    supports THREAD=REFERENCES, the server threads it instead of a full
+    header scan.
+    """
+    t = start_timings('thread', timings)
+    folders = list(dict.fromkeys([folder] + list(folders or [])))
+    result = {
+        'message_id': None,
+        'source': 'index',
+        'total': 0,
+        'messages': [],
+        'indexed': 0,
+        'success': False,
+        'error': None
+    }
+
+    try:
+        with imap.connect(t) as server:
+            unindexed = len(folders) == 1 and index.watermark(account, folder) is None
+            if unindexed and 'THREAD=REFERENCES' in imap.server_capabilities(server):
+                result['source'] = 'server'
+                with t.phase('select'):
+                    server.select(quote_folder(folder), readonly=True)
+                with t.phase('search'):
+                    uid, result['message_id'] = _resolve(imap, server, ident)
+                if uid is None:
+                    raise ValueError(f"No message {ident} in {folder}")
+                with t.phase('thread'):
+                    members = next((thread for thread in imap.uid_thread(server)
+                                    if any(member[0] == uid for member in thread)), [(uid, 0, None)])
+                result['messages'] = _fetch_members(imap, server, folder, members, t)
+            else:
+                for name in folders:
+                    result['indexed'] += index.sync(imap, server, account, name, timings=t)['indexed']
+                message_id = normalize_message_id(ident) if '@' in ident else None
+                if message_id is None:
+                    with t.phase('select'):
+                        server.select(quote_folder(folder), readonly=True)
+                    message_id = _resolve(imap, server, ident)[1]
+                result['message_id'] = message_id
+                with t.phase('lookup'):
+                    result['messages'] = index.lookup(message_id, account) if message_id else []
+                if not result['messages']:
+                    raise ValueError(f"Message {ident} is not in the index of {', '.join(folders)}")
+
+            if bodies:
+                _fetch_bodies(imap, server, index, account, result, t)
+            result['total'] = len(result['messages'])
+            result['success'] = True
+
+    except Exception as e:
+        result['error'] = str(e)
+
+    return t.finish(result)
+
+
+def _fetch_members(imap: IMAPClient, server, folder: str, members, t) -> List[Dict[str, Any]]:
+    """Headers of a server-side thread, in one FETCH."""
+    with t.phase('fetch'):
+        status, data = server.uid('FETCH', uid_set([member[0] for member in members]),
+                                  f'(UID BODY.PEEK[HEADER.FIELDS ({THREAD_HEADERS})])')
+    if status != 'OK':
+        raise ValueError(f"Fetch failed: {status}")
+    parser = BytesHeaderParser(policy=compat32)
+    headers = {item['uid']: parser.parsebytes(item['literal'] or b'')
+               for item in parse_fetch_response(data) if item['uid'] is not None}
+
+    def message_id(uid: Optional[int]) -> Optional[str]:
+        found = _MSGID_RE.findall(headers[uid]['Message-ID'] or '') if uid in headers else []
+        return found[0] if found else None
+
+    return [{
+        'folder': folder,
+        'uid': uid,
+        'message_id': message_id(uid),
+        'parent': message_id(parent),
+        'depth': depth,
+        'from': _decode(headers[uid]['From']),
+        'subject': _decode(headers[uid]['Subject']),
+        'date': headers[uid]['Date']
+    } for uid, depth, parent in members if uid in headers]
+
+
+def _fetch_bodies(imap: IMAPClient, server, index: ThreadIndex, account: str, result: Dict[str, Any], t):
+    """Add bodies to a conversation, one batched fetch per folder."""
+    by_folder: Dict[str, List[Dict[str, Any]]] = {}
+    for message in result['messages']:
+        by_folder.setdefault(message['folder'], []).append(message)
+
+    for name, messages in by_folder.items():
+        with t.phase('select'):
+            server.select(quote_folder(name), readonly=True)
+        with t.phase('fetch'):
+            raw = dict(imap.uid_fetch_raw(server, [message['uid'] for message in messages]))
+        with t.phase('parse'):
+            for message in messages:
+                if message['uid'] in raw:
+                    parsed = imap._parse_email(str(message['uid']), raw[message['uid']])
+                    message['body'] = parsed['body']
+                    message['attachments'] = parsed['attachments']
+        gone = [message['uid'] for message in messages if message['uid'] not in raw]
+        if gone:
+            # Expunged since they were indexed
+            index.forget(account, name, gone)
+            result['messages'] = [message for message in result['messages']
+                                  if message['folder'] != name or message['uid'] in raw]
@@ -99,3 +99,16 @@ def format_table_output(data: Any) -> str:
 
     # Default JSON-like pretty print
     return json.dumps(data, indent=2, ensure_ascii=False)
+
+
+def format_timings(timings: Dict[str, Any]) -> str:
+    """Format a per-phase timing breakdown (for human reading)."""
+    from colorama import Fore, Style
+
+    output = f"{Fore.CYAN}Timings:{Style.RESET_ALL} {timings['total_ms']} ms total\n"
+    for phase, ms in sorted(timings['phases_ms'].items(), key=lambda item: -item[1]):
+        output += f"  {phase:12} {ms:>10.3f} ms\n"
+    counts = [f"{key}={value}" for key, value in timings.items() if key not in ('total_ms', 'phases_ms')]
+    if counts:
+        output += f"  {', '.join(counts)}\n"
+    return output